@@ -1,5 +1,20 @@
+import importlib
+
+import pandas as pd
 import streamlit as st
-from modules import dashboard, expenses, cards, stocks, accounts, categories, utils, monthly
+from modules import utils, tracing
+
+# Page -> view module. Modules are imported when their page is first shown,
+# so a new process doesn't load Plotly and every other page up front.
+PAGES = {
+    "儀表板": "dashboard",
+    "支出": "expenses",
+    "每月統計": "monthly",
+    "帳戶": "accounts",
+    "類別": "categories",
+    "信用卡": "cards",
+    "股票": "stocks",
+}
 
 
 st.set_page_config(page_title="個人理財追蹤器", layout="wide", page_icon="💰")
@@ -11,26 +26,51 @@ def main():
     
     page = st.sidebar.radio(
         "導航",
-        ["儀表板", "支出", "每月統計", "帳戶", "類別", "信用卡", "股票"]
+        list(PAGES),
+        key="nav_page"
     )
     
     st.sidebar.markdown("---")
+    show_trace = st.sidebar.checkbox("效能分析", key="trace_panel", help="顯示本次畫面各步驟的耗時與資料筆數")
     st.sidebar.caption("v1.1.0")
     
-    if page == "儀表板":
-        dashboard.view()
-    elif page == "支出":
-        expenses.view()
-    elif page == "每月統計":
-        monthly.view()
-    elif page == "帳戶":
-        accounts.view()
-    elif page == "類別":
-        categories.view()
-    elif page == "信用卡":
-        cards.view()
-    elif page == "股票":
-        stocks.view()
+    with tracing.collect(page, keep=show_trace) as spans:
+        with tracing.span(f"page.{page}"):
+            importlib.import_module(f"modules.{PAGES[page]}").view()
+    
+    sheets_status()
+    if show_trace:
+        trace_panel(spans)
+
+def sheets_status():
+    """Sidebar note of how fresh the Google Sheets data is, in Sheets mode."""
+    import database as db
+
+    if not db.USE_GOOGLE_SHEETS:
+        return
+    from modules import jobs, sheets_sync
+
+    state = db.get_sheet_sync_state('transactions')
+    with st.sidebar:
+        utils.job_status(jobs.status(sheets_sync.SYNC_JOB), "Google Sheets 資料",
+                         updated_at=state['checked_at'] if state else None)
+
+def trace_panel(spans):
+    """Sidebar table of the spans recorded while rendering this page."""
+    table, totals = tracing.summarize(spans)
+    with st.sidebar.expander("效能分析", expanded=True):
+        if table.empty:
+            st.caption("沒有記錄到任何步驟。")
+            return
+        st.caption(f"總耗時 {table.loc[table['depth'] == 0, 'duration_ms'].sum():,.1f} ms")
+        totals = totals.assign(kind=totals['kind'].replace({'other': '其他（pandas / Streamlit）'}))
+        st.dataframe(totals.rename(columns={'kind': '類型', 'duration_ms': '耗時 (ms)', 'count': '次數'}),
+                     hide_index=True, use_container_width=True)
+        st.dataframe(pd.DataFrame({
+            '步驟': table['depth'].map(lambda depth: '　' * depth) + table['name'],
+            '耗時 (ms)': table['duration_ms'].round(1),
+            '筆數': table['rows'].astype('Int64'),
+        }), hide_index=True, use_container_width=True)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,11 @@
+"""
+Performance benchmarks.
+
+``benchmarks.ledger`` writes reproducible synthetic ledgers and
+``benchmarks.run`` times the app's hot paths and cold start against
+them. Run both from the repository root, e.g.::
+
+    python -m benchmarks.ledger 100k
+    python -m benchmarks.run --sizes 10k 100k --output bench.json
+    python -m benchmarks.run --sizes 10k 100k --compare bench.json
+"""
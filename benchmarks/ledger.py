@@ -0,0 +1,243 @@
+"""
+Synthetic ledger generator.
+
+Writes a SQLite database with accounts, transactions, stock lots and daily
+closes, plus a CSV of the same transactions in the Google Sheets tab
+layout. Ledgers are fully determined by (size, seed), so two runs of the
+benchmark on different commits measure the same data. Generated files are
+kept under ``benchmarks/data`` and reused while their parameters match.
+
+    python -m benchmarks.ledger 10k 100k 1m 10m
+"""
+import json
+import os
+from contextlib import contextmanager
+from datetime import date, timedelta
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import database as db
+
+# Bump when the generated data changes, so stale ledgers are rebuilt
+GENERATOR_VERSION = 1
+
+SIZES = {'10k': 10_000, '100k': 100_000, '1m': 1_000_000, '10m': 10_000_000}
+DATA_DIR = Path(__file__).resolve().parent / 'data'
+
+END_DATE = date(2025, 12, 31)
+YEARS = 5
+CHUNK_SIZE = 250_000
+
+ACCOUNT_TYPES = ['Bank', 'Credit Card', 'Cash', 'Investment']
+ACCOUNT_TYPE_WEIGHTS = [0.45, 0.35, 0.1, 0.1]
+
+# category -> (share of expenses, median amount)
+EXPENSE_CATEGORIES = {
+    'Food': (0.38, 180), 'Transport': (0.16, 60), 'Shopping': (0.14, 900),
+    'Entertainment': (0.08, 450), 'Bills': (0.08, 1500), 'Housing': (0.03, 18000),
+    'Health': (0.05, 600), 'Education': (0.03, 2500), 'Other': (0.05, 300),
+}
+INCOME_CATEGORIES = {'Salary': (0.6, 52000), 'Bonus': (0.1, 30000), 'Investment': (0.2, 4000), 'Other': (0.1, 1200)}
+INCOME_SHARE = 0.06
+
+MERCHANTS = [
+    '全聯', '7-11', '全家', '星巴克', '麥當勞', 'Uber', '高鐵', '台電', '中華電信', '誠品',
+    'momo', 'PChome', '好市多', '家樂福', '午餐 便當', '晚餐', '早餐店', '加油', '停車費', '診所',
+    'Netflix', 'Spotify', '房租', '補習費', '電影', 'Amazon', 'IKEA', '藥局', '捷運', '計程車',
+]
+SYMBOLS = [
+    '2330.TW', '2317.TW', '2454.TW', '2412.TW', '0050.TW', '0056.TW', '2882.TW', '2881.TW',
+    '2308.TW', '1301.TW', 'AAPL', 'MSFT', 'NVDA', 'GOOGL', 'AMZN', 'META', 'TSLA', 'VOO', 'QQQ', 'VT',
+]
+
+def ledger_rows(size):
+    """Row count for a size name ('100k') or a plain number."""
+    return SIZES[size] if size in SIZES else int(size)
+
+def ledger_files(size, seed=0):
+    """Paths of the database, CSV and parameter files of a ledger."""
+    stem = DATA_DIR / f"ledger-{size}-seed{seed}"
+    return {'db': Path(f"{stem}.db"), 'csv': Path(f"{stem}.csv"), 'meta': Path(f"{stem}.json")}
+
+def _params(size, seed):
+    return {'version': GENERATOR_VERSION, 'rows': ledger_rows(size), 'seed': seed,
+            'end_date': END_DATE.isoformat(), 'years': YEARS}
+
+def is_current(size, seed=0):
+    """Whether the ledger's files exist and were generated with the current parameters."""
+    files = ledger_files(size, seed)
+    if not all(path.exists() for path in files.values()):
+        return False
+    return json.loads(files['meta'].read_text()) == _params(size, seed)
+
+@contextmanager
+def use_database(db_file):
+    """Point the database module at ``db_file`` for the duration of the block."""
+    previous = db.DB_FILE
+    db.close_connections()
+    db.DB_FILE = str(db_file)
+    try:
+        db.init_db()
+        yield
+    finally:
+        db.close_connections()
+        db.DB_FILE = previous
+
+def _accounts(rng, n):
+    types = rng.choice(ACCOUNT_TYPES, size=n, p=ACCOUNT_TYPE_WEIGHTS)
+    names = [f"{t} {i + 1:02d}" for i, t in enumerate(types)]
+    balances = np.round(rng.lognormal(np.log(50_000), 1.0, size=n), -2)
+    balances[types == 'Credit Card'] = 0
+    return pd.DataFrame({'name': names, 'type': types, 'initial_balance': balances})
+
+def _transaction_chunk(rng, n, account_ids, account_names, account_weights):
+    """n random transactions as a frame with database column names."""
+    days = YEARS * 365
+    dates = pd.Timestamp(END_DATE) - pd.to_timedelta(rng.integers(0, days, size=n), unit='D')
+
+    income = rng.random(n) < INCOME_SHARE
+    categories = np.empty(n, dtype=object)
+    amounts = np.empty(n)
+    for mask, table in ((~income, EXPENSE_CATEGORIES), (income, INCOME_CATEGORIES)):
+        names = list(table)
+        shares = np.array([table[c][0] for c in names])
+        picked = rng.choice(len(names), size=mask.sum(), p=shares / shares.sum())
+        medians = np.array([table[c][1] for c in names])[picked]
+        categories[mask] = np.array(names, dtype=object)[picked]
+        amounts[mask] = medians * rng.lognormal(0, 0.7, size=mask.sum())
+    # Mostly whole amounts; a fifth carry cents (card and foreign purchases)
+    whole = rng.random(n) < 0.8
+    amounts = np.where(whole, np.maximum(np.round(amounts), 1), np.maximum(np.round(amounts, 2), 0.01))
+
+    accounts = rng.choice(len(account_ids), size=n, p=account_weights)
+    merchants = np.array(MERCHANTS, dtype=object)[rng.integers(0, len(MERCHANTS), size=n)]
+    refs = rng.integers(0, 100_000, size=n).astype(str).astype(object)
+    descriptions = merchants + ' #' + refs
+    descriptions[rng.random(n) < 0.1] = None
+
+    return pd.DataFrame({
+        'date': dates.strftime('%Y-%m-%d'),
+        'type': np.where(income, 'Income', 'Expense'),
+        'category': categories,
+        'amount': amounts,
+        'payment_method': account_names[accounts],
+        'description': descriptions,
+        'account_id': account_ids[accounts],
+    })
+
+def _stock_lots(rng, n):
+    days = YEARS * 365
+    buy_dates = pd.Timestamp(END_DATE) - pd.to_timedelta(rng.integers(0, days, size=n), unit='D')
+    symbols = rng.choice(SYMBOLS, size=n)
+    prices = np.round(rng.lognormal(np.log(150), 0.8, size=n), 2)
+    quantities = np.where(np.char.endswith(symbols.astype(str), '.TW'),
+                          rng.integers(1, 20, size=n) * 100, rng.integers(1, 50, size=n))
+    return pd.DataFrame({'symbol': symbols, 'buy_date': buy_dates.strftime('%Y-%m-%d'),
+                         'buy_price': prices, 'quantity': quantities.astype(float),
+                         'broker_fee': np.round(prices * quantities * 0.001425, 0), 'transaction_fee': 0.0})
+
+def _price_history(rng):
+    dates = pd.bdate_range(END_DATE - timedelta(days=YEARS * 365), END_DATE)
+    frames = []
+    for symbol in SYMBOLS:
+        # Geometric random walk with a little drift
+        walk = np.exp(np.cumsum(rng.normal(0.0003, 0.018, size=len(dates))))
+        frames.append(pd.DataFrame({'symbol': symbol, 'date': dates.strftime('%Y-%m-%d'),
+                                    'close': np.round(rng.uniform(20, 600) * walk, 2)}))
+    return pd.concat(frames, ignore_index=True)
+
+def generate(size, seed=0, progress=None):
+    """
+    Write a ledger's database and CSV, replacing any previous files.
+
+    Parameters
+    ----------
+    size : str
+        A key of SIZES or a row count.
+    seed : int
+        Random seed; the same (size, seed) always gives the same ledger.
+    progress : callable, optional
+        Called with the number of transactions written so far.
+
+    Returns
+    -------
+    dict
+        The ledger's files, as from ledger_files.
+    """
+    files = ledger_files(size, seed)
+    rows = ledger_rows(size)
+    DATA_DIR.mkdir(parents=True, exist_ok=True)
+    for path in files.values():
+        for suffix in ('', '-wal', '-shm'):
+            Path(f"{path}{suffix}").unlink(missing_ok=True)
+
+    rng = np.random.default_rng(seed)
+    n_accounts = int(np.clip(rows // 2_000, 8, 200))
+    n_lots = int(np.clip(rows // 500, 20, 20_000))
+
+    with use_database(files['db']):
+        with db.get_connection() as conn:
+            # Start from an empty ledger rather than the default seed accounts
+            conn.execute("DELETE FROM accounts")
+            _accounts(rng, n_accounts).to_sql('accounts', conn, if_exists='append', index=False)
+            _stock_lots(rng, n_lots).to_sql('stocks', conn, if_exists='append', index=False)
+            conn.commit()
+        db.save_price_history(_price_history(rng))
+
+        accounts = db.get_accounts()
+        account_ids = accounts['id'].to_numpy()
+        account_names = accounts['name'].to_numpy(dtype=object)
+        # A few accounts carry most of the activity
+        weights = 1.0 / np.arange(1, len(account_ids) + 1)
+        weights = rng.permutation(weights / weights.sum())
+
+        tmp_csv = files['csv'].with_suffix('.csv.tmp')
+        written = 0
+        while written < rows:
+            n = min(CHUNK_SIZE, rows - written)
+            chunk = _transaction_chunk(rng, n, account_ids, account_names, weights)
+            db.add_transactions(chunk)
+            # Same rows in the Sheets tab layout
+            sheet = chunk.assign(account_name=chunk['payment_method']).rename(columns={
+                'date': 'Date', 'type': 'Type', 'category': 'Category', 'amount': 'Amount',
+                'payment_method': 'Payment Method', 'description': 'Description',
+                'account_name': 'Account', 'account_id': 'Account ID',
+            })
+            sheet.to_csv(tmp_csv, mode='w' if written == 0 else 'a', header=written == 0, index=False)
+            written += n
+            if progress:
+                progress(written)
+        os.replace(tmp_csv, files['csv'])
+
+        with db.get_connection() as conn:
+            conn.execute("PRAGMA optimize")
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    files['meta'].write_text(json.dumps(_params(size, seed)))
+    return files
+
+def ensure(size, seed=0, progress=None):
+    """The ledger's files, generating them first if missing or stale."""
+    if not is_current(size, seed):
+        return generate(size, seed, progress)
+    return ledger_files(size, seed)
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Generate synthetic ledgers for benchmarking")
+    parser.add_argument("sizes", nargs="+", help=f"ledger sizes ({', '.join(SIZES)}) or a row count")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--force", action="store_true", help="regenerate even if an up-to-date ledger exists")
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        if is_current(size, args.seed) and not args.force:
+            print(f"{ledger_files(size, args.seed)['db']} is up to date")
+            continue
+        start = time.perf_counter()
+        files = generate(size, args.seed, lambda n: print(f"\r{size}: {n:,} rows", end="", flush=True))
+        print(f"\r{size}: {ledger_rows(size):,} rows in {time.perf_counter() - start:.1f}s -> {files['db']}")
@@ -0,0 +1,239 @@
+"""
+Benchmark harness.
+
+Times the app's hot paths against synthetic ledgers (see
+``benchmarks.ledger``) and writes the results as JSON. Every timed call
+starts with an empty read cache, so the numbers are what a cold page load
+pays. Pass ``--compare`` with an earlier result file to flag regressions;
+the exit status is 1 when any benchmark got slower than the threshold.
+
+    python -m benchmarks.run --sizes 10k 100k --output base.json
+    python -m benchmarks.run --sizes 10k 100k --compare base.json
+
+The test suite runs it end to end on a tiny ledger (tests/test_benchmarks.py).
+"""
+import json
+import platform
+import sqlite3
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import database as db
+from benchmarks import ledger
+from modules import cache, dashboard, monthly, sheets_sync
+
+RESULTS_VERSION = 1
+DEFAULT_SIZES = ['10k', '100k']
+DEFAULT_REPEAT = 5
+# Slowdowns smaller than this are treated as noise
+REGRESSION_THRESHOLD = 0.2
+NOISE_FLOOR_SECONDS = 0.002
+REPO_DIR = Path(__file__).resolve().parent.parent
+
+def _get_all_transactions(files):
+    return db.get_all_transactions
+
+def _get_account_balances(files):
+    return db.get_account_balances
+
+def _calculate_monthly_assets(files):
+    df_tx = db.load_transactions()
+    accounts_df = db.get_account_balances()
+    df_stocks = db.get_stocks()
+    price_history = db.get_price_history(tuple(df_stocks['symbol'].unique()))
+    return lambda: dashboard.calculate_monthly_assets(df_tx, accounts_df, df_stocks,
+                                                      end_date=ledger.END_DATE, price_history=price_history)
+
+def _monthly_aggregation(files):
+    return lambda: monthly.monthly_totals(db.get_monthly_summary())
+
+def _daily_totals(files):
+    return db.get_daily_totals
+
+def _category_totals(files):
+    return lambda: db.get_category_totals('Expense')
+
+def _parse_sheets_transactions(files):
+    raw = files['csv'].read_bytes()
+    return lambda: sheets_sync.parse_tab('transactions', raw)
+
+def _cold_start(page):
+    # A fresh interpreter per call, so nothing is imported or cached yet
+    def setup(files):
+        command = [sys.executable, '-m', 'benchmarks.startup', page, str(files['db'])]
+        return lambda: subprocess.run(command, cwd=REPO_DIR, check=True, capture_output=True)
+    return setup
+
+# name -> setup(files) returning the callable to time; setup itself is not timed
+BENCHMARKS = {
+    'get_all_transactions': _get_all_transactions,
+    'get_account_balances': _get_account_balances,
+    'calculate_monthly_assets': _calculate_monthly_assets,
+    'monthly_aggregation': _monthly_aggregation,
+    'daily_totals': _daily_totals,
+    'category_totals': _category_totals,
+    'parse_sheets_transactions': _parse_sheets_transactions,
+    'cold_start_dashboard': _cold_start('儀表板'),
+    'cold_start_categories': _cold_start('類別'),
+}
+
+def _result_size(result):
+    return len(result) if hasattr(result, '__len__') else None
+
+def time_call(func, repeat=DEFAULT_REPEAT):
+    """
+    Time ``func`` ``repeat`` times after one warm-up call.
+
+    The read cache is cleared before every call.
+
+    Returns
+    -------
+    dict
+        min, median, mean and stdev in seconds, every run's time and the
+        length of the result.
+    """
+    cache.clear()
+    result = func()
+    times = []
+    for _ in range(repeat):
+        cache.clear()
+        start = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - start)
+    return {
+        'min': min(times),
+        'median': statistics.median(times),
+        'mean': statistics.fmean(times),
+        'stdev': statistics.stdev(times) if len(times) > 1 else 0.0,
+        'runs': times,
+        'result_rows': _result_size(result),
+    }
+
+def _git_revision():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'],
+                                    capture_output=True, text=True, check=True).stdout.strip())
+        return {'commit': commit, 'dirty': dirty}
+    except (OSError, subprocess.CalledProcessError):
+        return {'commit': None, 'dirty': None}
+
+def environment():
+    """Versions and machine details recorded with every result file."""
+    return {
+        **_git_revision(),
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'sqlite': sqlite3.sqlite_version,
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+    }
+
+def run(sizes=DEFAULT_SIZES, names=None, repeat=DEFAULT_REPEAT, seed=0, log=print):
+    """
+    Run benchmarks against each ledger size.
+
+    Parameters
+    ----------
+    sizes : list of str
+        Ledger sizes (keys of ledger.SIZES or row counts).
+    names : list of str, optional
+        Benchmarks to run (defaults to all of BENCHMARKS).
+    repeat : int
+        Timed calls per benchmark.
+    seed : int
+        Ledger seed.
+    log : callable
+        Receives one progress line per benchmark.
+
+    Returns
+    -------
+    dict
+        {'version', 'environment', 'repeat', 'seed', 'results': {size: {name: timing}}}
+    """
+    names = list(names or BENCHMARKS)
+    unknown = set(names) - set(BENCHMARKS)
+    if unknown:
+        raise ValueError(f"Unknown benchmarks: {', '.join(sorted(unknown))}")
+
+    results = {}
+    for size in sizes:
+        files = ledger.ensure(size, seed)
+        results[size] = {}
+        with ledger.use_database(files['db']):
+            for name in names:
+                timing = time_call(BENCHMARKS[name](files), repeat)
+                results[size][name] = timing
+                log(f"{size:>6} {name:<28} {timing['min'] * 1000:10.1f} ms")
+    return {'version': RESULTS_VERSION, 'environment': environment(), 'repeat': repeat,
+            'seed': seed, 'results': results}
+
+def compare(base, current, threshold=REGRESSION_THRESHOLD):
+    """
+    Compare two result sets by their fastest run.
+
+    The minimum is the least noisy statistic on a shared machine: other
+    load can only make a run slower, never faster.
+
+    Returns
+    -------
+    pandas.DataFrame
+        One row per (size, benchmark) present in both: base and current
+        times in seconds, their ratio and whether it counts as a
+        regression (slower by more than ``threshold`` and NOISE_FLOOR_SECONDS).
+    """
+    rows = []
+    for size, benchmarks in current['results'].items():
+        for name, timing in benchmarks.items():
+            before = base['results'].get(size, {}).get(name)
+            if before is None:
+                continue
+            ratio = timing['min'] / before['min'] if before['min'] else float('inf')
+            rows.append({
+                'size': size, 'benchmark': name,
+                'base': before['min'], 'current': timing['min'], 'ratio': ratio,
+                'regression': ratio > 1 + threshold and timing['min'] - before['min'] > NOISE_FLOOR_SECONDS,
+            })
+    return pd.DataFrame(rows, columns=['size', 'benchmark', 'base', 'current', 'ratio', 'regression'])
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Time the app's hot paths against synthetic ledgers")
+    parser.add_argument("--sizes", nargs="+", default=DEFAULT_SIZES, help=f"ledger sizes ({', '.join(ledger.SIZES)})")
+    parser.add_argument("--benchmarks", nargs="+", choices=list(BENCHMARKS), help="benchmarks to run (default: all)")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--data-dir", type=Path, default=ledger.DATA_DIR,
+                        help="where generated ledgers are kept (default: %(default)s)")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--compare", metavar="BASE", help="earlier results to compare against")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD,
+                        help="relative slowdown that counts as a regression (default: %(default)s)")
+    args = parser.parse_args()
+
+    ledger.DATA_DIR = args.data_dir
+    results = run(args.sizes, args.benchmarks, args.repeat, args.seed)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            base = json.load(f)
+        report = compare(base, results, args.threshold)
+        print()
+        for row in report.itertuples():
+            flag = "REGRESSION" if row.regression else ""
+            print(f"{row.size:>6} {row.benchmark:<28} {row.base * 1000:10.1f} -> {row.current * 1000:10.1f} ms "
+                  f"({row.ratio:5.2f}x) {flag}")
+        sys.exit(1 if report['regression'].any() else 0)
@@ -0,0 +1,26 @@
+"""
+Cold-start probe: render one page of app.py in a fresh process.
+
+Run by ``benchmarks.run`` (the ``cold_start_*`` benchmarks), which times
+the whole subprocess: interpreter start, imports, the schema check and the
+first full script run of the page, i.e. what a new server process pays
+before its first paint.
+
+    python -m benchmarks.startup 類別 benchmarks/data/ledger-10k-seed0.db
+"""
+import os
+import sys
+
+import database as db
+
+if __name__ == "__main__":
+    page, db_file = sys.argv[1], sys.argv[2]
+    db.DB_FILE = db_file
+
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(os.path.abspath("app.py"), default_timeout=120)
+    at.session_state["nav_page"] = page
+    at.run()
+    if at.exception:
+        raise SystemExit(f"{page}: {at.exception[0].value}")
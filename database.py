@@ -1,21 +1,185 @@
+import hashlib
+import re
 import sqlite3
+import queue
+import threading
+from contextlib import contextmanager
+import numpy as np
 import pandas as pd
+from collections import Counter
 from datetime import datetime
+from functools import wraps
+from modules import cache, tracing
 
-# Import Google Sheets module
-try:
-    from modules import sheets
-    USE_GOOGLE_SHEETS = False
-except ImportError:
-    USE_GOOGLE_SHEETS = False
-    print("Warning: Google Sheets module not available, falling back to SQLite")
+# Google Sheets mode. The Sheets modules (and gspread behind them) are
+# imported on first use, so SQLite mode never loads them.
+USE_GOOGLE_SHEETS = False
+
+def _analytics():
+    # The DuckDB/Parquet engine, when installed; it only covers the SQLite ledger
+    if USE_GOOGLE_SHEETS:
+        return None
+    from modules import analytics
+    return analytics if analytics.AVAILABLE else None
+
+def _read_tab(tab):
+    """Read a Google Sheets tab from its local mirror."""
+    from modules import sheets_sync
+    return sheets_sync.read_tab(tab)
 
 DB_FILE = "money.db"
 
-def init_db():
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
-    
+# Connection pool settings. Connections are opened once, tuned with the
+# pragmas below and then handed back to the pool instead of being closed, so
+# Streamlit reruns and concurrent sessions reuse warm connections.
+POOL_SIZE = 8
+CONNECTION_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA mmap_size=268435456",   # 256 MB
+    "PRAGMA cache_size=-65536",     # 64 MB
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA foreign_keys=ON",
+)
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+# Database files whose schema was checked by this process
+_migrated = set()
+_migrate_lock = threading.Lock()
+
+def _open_connection(db_file):
+    """Open a new SQLite connection and apply the per-connection pragmas."""
+    conn = sqlite3.connect(db_file, check_same_thread=False)
+    for pragma in CONNECTION_PRAGMAS:
+        conn.execute(pragma)
+    # Lets set-based updates recompute duplicate keys inside SQLite
+    conn.create_function('transaction_key', 4, transaction_key, deterministic=True)
+    return conn
+
+def _get_pool(db_file):
+    with _pools_lock:
+        pool = _pools.get(db_file)
+        if pool is None:
+            pool = _pools[db_file] = queue.LifoQueue(maxsize=POOL_SIZE)
+        return pool
+
+@contextmanager
+def get_connection():
+    """Borrow a pooled connection to ``DB_FILE``.
+
+    Usage::
+
+        with get_connection() as conn:
+            ...
+
+    The connection is rolled back if the block raises and is returned to the
+    pool afterwards. Callers are responsible for ``conn.commit()``.
+
+    The first connection a process borrows for a database file brings its
+    schema up to date (see ``init_db``).
+    """
+    db_file = DB_FILE
+    pool = _get_pool(db_file)
+    try:
+        conn = pool.get_nowait()
+    except queue.Empty:
+        conn = _open_connection(db_file)
+
+    try:
+        if db_file not in _migrated:
+            with _migrate_lock:
+                if db_file not in _migrated:
+                    _migrate(conn)
+                    _migrated.add(db_file)
+        yield conn
+    except BaseException:
+        conn.rollback()
+        raise
+    finally:
+        try:
+            pool.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+def close_connections():
+    """Close every pooled connection (e.g. before replacing the database file)."""
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        while True:
+            try:
+                pool.get_nowait().close()
+            except queue.Empty:
+                break
+    with _monitor_lock:
+        for monitor in _monitors.values():
+            monitor.close()
+        _monitors.clear()
+        _seen_data_versions.clear()
+    with _migrate_lock:
+        # A replaced file gets its schema checked again
+        _migrated.clear()
+    cache.clear()
+
+# Read cache bookkeeping. Writes made through this module invalidate the
+# tables they touch; commits from any other process are detected through
+# PRAGMA data_version on a dedicated, never-writing connection and clear the
+# whole cache.
+#
+# Every function here that commits a write must therefore be decorated with
+# @_writes, listing the tables it changes (the trigger-maintained summary
+# tables are covered by 'transactions', which their readers depend on), even
+# when no cached read depends on them (quotes, sheet_sync_state): an
+# undecorated commit is indistinguishable from another process's write and
+# flushes the whole cache. Only schema migrations, which run before any read
+# is cached, are exempt.
+_monitors = {}
+_seen_data_versions = {}
+_monitor_lock = threading.Lock()
+
+def _data_version(db_file):
+    monitor = _monitors.get(db_file)
+    if monitor is None:
+        monitor = _monitors[db_file] = sqlite3.connect(db_file, check_same_thread=False)
+    return monitor.execute("PRAGMA data_version").fetchone()[0]
+
+def _cache_scope():
+    # Google Sheets data changes outside our control, so only SQLite reads are cached
+    if USE_GOOGLE_SHEETS:
+        return None
+    db_file = DB_FILE
+    with _monitor_lock:
+        version = _data_version(db_file)
+        if _seen_data_versions.get(db_file) != version:
+            if db_file in _seen_data_versions:
+                cache.clear()
+            _seen_data_versions[db_file] = version
+    return db_file
+
+def _cached(*tables):
+    """Cache a read function until one of ``tables`` is written."""
+    return cache.cached(*tables, scope=_cache_scope)
+
+def _writes(*tables):
+    """Invalidate cached reads of ``tables`` after the decorated write."""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            try:
+                return func(*args, **kwargs)
+            finally:
+                db_file = DB_FILE
+                with _monitor_lock:
+                    _seen_data_versions[db_file] = _data_version(db_file)
+                cache.invalidate(*tables)
+        return wrapper
+    return decorator
+
+def _migrate_base_schema(c):
+    """Create the original tables and seed default accounts and categories."""
     # Transactions table
     c.execute('''CREATE TABLE IF NOT EXISTS transactions (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -87,7 +251,9 @@ def init_db():
         ]
         for name, cat_type in default_categories:
             c.execute("INSERT INTO categories (name, type) VALUES (?, ?)", (name, cat_type))
-    
+
+def _migrate_transaction_account_id(c):
+    """Link transactions to accounts by backfilling account_id from payment_method."""
     # Check if transactions table has account_id
     c.execute("PRAGMA table_info(transactions)")
     columns = [info[1] for info in c.fetchall()]
@@ -95,28 +261,665 @@ def init_db():
         c.execute("ALTER TABLE transactions ADD COLUMN account_id INTEGER")
         
         # Migrate existing data
-        c.execute("SELECT id, name FROM accounts")
-        accounts = {name: id for id, name in c.fetchall()}
-        
-        c.execute("SELECT id, payment_method FROM transactions")
-        for tx_id, pm in c.fetchall():
-            if pm in accounts:
-                c.execute("UPDATE transactions SET account_id = ? WHERE id = ?", (accounts[pm], tx_id))
+        c.execute("""
+            UPDATE transactions
+            SET account_id = (SELECT a.id FROM accounts a WHERE a.name = transactions.payment_method)
+        """)
 
-    conn.commit()
-    conn.close()
+def _migrate_transaction_indexes(c):
+    """Index the columns used by date ordering and per-account aggregation."""
+    c.execute("CREATE INDEX IF NOT EXISTS idx_transactions_date ON transactions (date)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_transactions_account_type_amount ON transactions (account_id, type, amount)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_transactions_type_date ON transactions (type, date)")
+    c.execute("ANALYZE")
 
-def get_connection():
-    return sqlite3.connect(DB_FILE)
+def _migrate_account_balances(c):
+    """Materialize per-account income/expense totals, kept exact by triggers."""
+    c.execute('''CREATE TABLE IF NOT EXISTS account_balances (
+                    account_id INTEGER PRIMARY KEY,
+                    income REAL NOT NULL DEFAULT 0,
+                    expense REAL NOT NULL DEFAULT 0
+                )''')
+
+    # Subtract the old row, add the new row. Rows without an account or with
+    # a type other than Income/Expense never touch a balance.
+    subtract_old = """
+        UPDATE account_balances
+        SET income = income - CASE WHEN OLD.type = 'Income' THEN OLD.amount ELSE 0 END,
+            expense = expense - CASE WHEN OLD.type = 'Expense' THEN OLD.amount ELSE 0 END
+        WHERE account_id = OLD.account_id AND OLD.type IN ('Income', 'Expense');
+    """
+    add_new = """
+        INSERT OR IGNORE INTO account_balances (account_id)
+        SELECT NEW.account_id WHERE NEW.account_id IS NOT NULL;
+        UPDATE account_balances
+        SET income = income + CASE WHEN NEW.type = 'Income' THEN NEW.amount ELSE 0 END,
+            expense = expense + CASE WHEN NEW.type = 'Expense' THEN NEW.amount ELSE 0 END
+        WHERE account_id = NEW.account_id AND NEW.type IN ('Income', 'Expense');
+    """
+    c.execute(f"CREATE TRIGGER IF NOT EXISTS trg_transactions_balance_insert AFTER INSERT ON transactions BEGIN {add_new} END")
+    c.execute(f"CREATE TRIGGER IF NOT EXISTS trg_transactions_balance_update AFTER UPDATE OF type, amount, account_id ON transactions BEGIN {subtract_old} {add_new} END")
+    c.execute(f"CREATE TRIGGER IF NOT EXISTS trg_transactions_balance_delete AFTER DELETE ON transactions BEGIN {subtract_old} END")
+
+    # Populated with this step's own query: the shared helpers follow the
+    # current schema (integer cents since _migrate_integer_cents)
+    c.execute("""
+        INSERT INTO account_balances (account_id, income, expense)
+        SELECT account_id,
+               SUM(CASE WHEN type = 'Income' THEN amount ELSE 0 END),
+               SUM(CASE WHEN type = 'Expense' THEN amount ELSE 0 END)
+        FROM transactions
+        WHERE account_id IS NOT NULL AND type IN ('Income', 'Expense')
+        GROUP BY account_id
+    """)
+
+def _migrate_monthly_summary(c):
+    """Roll transactions up per month/type/category/account, kept current by triggers."""
+    # account_id 0 stands for transactions without an account so the
+    # primary key can dedupe them.
+    c.execute('''CREATE TABLE IF NOT EXISTS monthly_summary (
+                    year_month TEXT NOT NULL,
+                    type TEXT NOT NULL,
+                    category TEXT NOT NULL,
+                    account_id INTEGER NOT NULL DEFAULT 0,
+                    total REAL NOT NULL DEFAULT 0,
+                    count INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (year_month, type, category, account_id)
+                ) WITHOUT ROWID''')
+
+    old_key = "year_month = substr(OLD.date, 1, 7) AND type = OLD.type AND category = OLD.category AND account_id = COALESCE(OLD.account_id, 0)"
+    subtract_old = f"""
+        UPDATE monthly_summary SET total = total - OLD.amount, count = count - 1 WHERE {old_key};
+        DELETE FROM monthly_summary WHERE {old_key} AND count <= 0;
+    """
+    add_new = """
+        INSERT OR IGNORE INTO monthly_summary (year_month, type, category, account_id)
+        VALUES (substr(NEW.date, 1, 7), NEW.type, NEW.category, COALESCE(NEW.account_id, 0));
+        UPDATE monthly_summary SET total = total + NEW.amount, count = count + 1
+        WHERE year_month = substr(NEW.date, 1, 7) AND type = NEW.type AND category = NEW.category AND account_id = COALESCE(NEW.account_id, 0);
+    """
+    c.execute(f"CREATE TRIGGER IF NOT EXISTS trg_transactions_summary_insert AFTER INSERT ON transactions BEGIN {add_new} END")
+    c.execute(f"CREATE TRIGGER IF NOT EXISTS trg_transactions_summary_update AFTER UPDATE OF date, type, category, amount, account_id ON transactions BEGIN {subtract_old} {add_new} END")
+    c.execute(f"CREATE TRIGGER IF NOT EXISTS trg_transactions_summary_delete AFTER DELETE ON transactions BEGIN {subtract_old} END")
+
+    # Populated with this step's own query, see _migrate_account_balances
+    c.execute("""
+        INSERT INTO monthly_summary (year_month, type, category, account_id, total, count)
+        SELECT substr(date, 1, 7), type, category, COALESCE(account_id, 0), SUM(amount), COUNT(*)
+        FROM transactions
+        GROUP BY 1, 2, 3, 4
+    """)
+
+def _migrate_quotes(c):
+    """Cache the latest market price per stock symbol."""
+    c.execute('''CREATE TABLE IF NOT EXISTS quotes (
+                    symbol TEXT PRIMARY KEY,
+                    price REAL NOT NULL,
+                    fetched_at REAL NOT NULL
+                )''')
+
+def _migrate_price_history(c):
+    """Store daily closing prices per stock symbol."""
+    c.execute('''CREATE TABLE IF NOT EXISTS price_history (
+                    symbol TEXT NOT NULL,
+                    date TEXT NOT NULL,
+                    close REAL NOT NULL,
+                    PRIMARY KEY (symbol, date)
+                ) WITHOUT ROWID''')
+
+def _migrate_sheet_sync_state(c):
+    """Track the content hash of each Google Sheets tab mirrored locally."""
+    c.execute('''CREATE TABLE IF NOT EXISTS sheet_sync_state (
+                    tab TEXT PRIMARY KEY,
+                    content_hash TEXT,
+                    row_count INTEGER NOT NULL DEFAULT 0,
+                    checked_at REAL NOT NULL,
+                    changed_at REAL
+                )''')
+
+def _migrate_transaction_dedupe_key(c):
+    """Store a content hash per transaction and index it for duplicate lookups."""
+    c.execute("PRAGMA table_info(transactions)")
+    columns = [info[1] for info in c.fetchall()]
+    if 'dedupe_key' not in columns:
+        c.execute("ALTER TABLE transactions ADD COLUMN dedupe_key TEXT")
+    rows = c.execute("SELECT id, date, amount, account_id, description FROM transactions").fetchall()
+    c.executemany("UPDATE transactions SET dedupe_key = ? WHERE id = ?",
+                  [(transaction_key(*row[1:]), row[0]) for row in rows])
+    # Not unique: two identical coffees on the same day are legitimate
+    c.execute("CREATE INDEX IF NOT EXISTS idx_transactions_dedupe_key ON transactions (dedupe_key)")
+
+def _migrate_transaction_page_indexes(c):
+    """Index (account, date) and (category, date) so filtered pages walk an index in order."""
+    c.execute("CREATE INDEX IF NOT EXISTS idx_transactions_account_date ON transactions (account_id, date)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_transactions_category_date ON transactions (category, date)")
+    c.execute("ANALYZE")
+
+def _migrate_transaction_search(c):
+    """Full-text index over description and category, kept in sync by triggers.
+
+    The trigram tokenizer matches any substring of three or more characters,
+    which also works for Chinese text without word breaks. Builds of SQLite
+    without it fall back to unicode61; builds without FTS5 get no index and
+    search_transactions uses LIKE instead.
+    """
+    for tokenizer in ('trigram', 'unicode61'):
+        try:
+            c.execute(f"""CREATE VIRTUAL TABLE IF NOT EXISTS transactions_fts USING fts5(
+                            description, category,
+                            content='transactions', content_rowid='id', tokenize='{tokenizer}'
+                        )""")
+            break
+        except sqlite3.OperationalError:
+            continue
+    else:
+        return
+
+    _create_search_triggers(c)
+    c.execute("INSERT INTO transactions_fts (transactions_fts) VALUES ('rebuild')")
+
+def _create_search_triggers(c):
+    delete_old = "INSERT INTO transactions_fts (transactions_fts, rowid, description, category) VALUES ('delete', OLD.id, OLD.description, OLD.category);"
+    insert_new = "INSERT INTO transactions_fts (rowid, description, category) VALUES (NEW.id, NEW.description, NEW.category);"
+    c.execute(f"CREATE TRIGGER IF NOT EXISTS trg_transactions_fts_insert AFTER INSERT ON transactions BEGIN {insert_new} END")
+    c.execute(f"CREATE TRIGGER IF NOT EXISTS trg_transactions_fts_update AFTER UPDATE OF description, category ON transactions BEGIN {delete_old} {insert_new} END")
+    c.execute(f"CREATE TRIGGER IF NOT EXISTS trg_transactions_fts_delete AFTER DELETE ON transactions BEGIN {delete_old} END")
+
+def _create_amount_triggers(c):
+    """Keep account_balances and monthly_summary exact under every write to transactions."""
+    # Subtract the old row, add the new row. Rows without an account or with
+    # a type other than Income/Expense never touch a balance.
+    subtract_balance = """
+        UPDATE account_balances
+        SET income_cents = income_cents - CASE WHEN OLD.type = 'Income' THEN OLD.amount_cents ELSE 0 END,
+            expense_cents = expense_cents - CASE WHEN OLD.type = 'Expense' THEN OLD.amount_cents ELSE 0 END
+        WHERE account_id = OLD.account_id AND OLD.type IN ('Income', 'Expense');
+    """
+    add_balance = """
+        INSERT OR IGNORE INTO account_balances (account_id)
+        SELECT NEW.account_id WHERE NEW.account_id IS NOT NULL;
+        UPDATE account_balances
+        SET income_cents = income_cents + CASE WHEN NEW.type = 'Income' THEN NEW.amount_cents ELSE 0 END,
+            expense_cents = expense_cents + CASE WHEN NEW.type = 'Expense' THEN NEW.amount_cents ELSE 0 END
+        WHERE account_id = NEW.account_id AND NEW.type IN ('Income', 'Expense');
+    """
+    c.execute(f"CREATE TRIGGER IF NOT EXISTS trg_transactions_balance_insert AFTER INSERT ON transactions BEGIN {add_balance} END")
+    c.execute(f"CREATE TRIGGER IF NOT EXISTS trg_transactions_balance_update AFTER UPDATE OF type, amount_cents, account_id ON transactions BEGIN {subtract_balance} {add_balance} END")
+    c.execute(f"CREATE TRIGGER IF NOT EXISTS trg_transactions_balance_delete AFTER DELETE ON transactions BEGIN {subtract_balance} END")
+
+    old_key = "year_month = substr(OLD.date, 1, 7) AND type = OLD.type AND category = OLD.category AND account_id = COALESCE(OLD.account_id, 0)"
+    subtract_summary = f"""
+        UPDATE monthly_summary SET total_cents = total_cents - OLD.amount_cents, count = count - 1 WHERE {old_key};
+        DELETE FROM monthly_summary WHERE {old_key} AND count <= 0;
+    """
+    add_summary = """
+        INSERT OR IGNORE INTO monthly_summary (year_month, type, category, account_id)
+        VALUES (substr(NEW.date, 1, 7), NEW.type, NEW.category, COALESCE(NEW.account_id, 0));
+        UPDATE monthly_summary SET total_cents = total_cents + NEW.amount_cents, count = count + 1
+        WHERE year_month = substr(NEW.date, 1, 7) AND type = NEW.type AND category = NEW.category AND account_id = COALESCE(NEW.account_id, 0);
+    """
+    c.execute(f"CREATE TRIGGER IF NOT EXISTS trg_transactions_summary_insert AFTER INSERT ON transactions BEGIN {add_summary} END")
+    c.execute(f"CREATE TRIGGER IF NOT EXISTS trg_transactions_summary_update AFTER UPDATE OF date, type, category, amount_cents, account_id ON transactions BEGIN {subtract_summary} {add_summary} END")
+    c.execute(f"CREATE TRIGGER IF NOT EXISTS trg_transactions_summary_delete AFTER DELETE ON transactions BEGIN {subtract_summary} END")
+
+def _migrate_integer_cents(c):
+    """Store transaction amounts, and the totals derived from them, as integer cents.
+
+    SQLite cannot change a column's type, so transactions is rebuilt with an
+    amount_cents column. Ids are preserved, which keeps the external-content
+    search index valid; indexes and triggers are re-created.
+    """
+    c.execute('''CREATE TABLE transactions_new (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    date TEXT NOT NULL,
+                    type TEXT NOT NULL,
+                    category TEXT NOT NULL,
+                    amount_cents INTEGER NOT NULL,
+                    payment_method TEXT NOT NULL,
+                    description TEXT,
+                    account_id INTEGER,
+                    dedupe_key TEXT
+                )''')
+    c.execute("""
+        INSERT INTO transactions_new (id, date, type, category, amount_cents, payment_method, description, account_id, dedupe_key)
+        SELECT id, date, type, category, CAST(ROUND(amount * 100) AS INTEGER), payment_method, description, account_id, dedupe_key
+        FROM transactions
+    """)
+    # Dropping the old table also drops its indexes and triggers
+    c.execute("DROP TABLE transactions")
+    c.execute("ALTER TABLE transactions_new RENAME TO transactions")
+
+    c.execute("CREATE INDEX idx_transactions_date ON transactions (date)")
+    c.execute("CREATE INDEX idx_transactions_account_type_amount ON transactions (account_id, type, amount_cents)")
+    c.execute("CREATE INDEX idx_transactions_type_date ON transactions (type, date)")
+    c.execute("CREATE INDEX idx_transactions_dedupe_key ON transactions (dedupe_key)")
+    c.execute("CREATE INDEX idx_transactions_account_date ON transactions (account_id, date)")
+    c.execute("CREATE INDEX idx_transactions_category_date ON transactions (category, date)")
+
+    c.execute("DROP TABLE account_balances")
+    c.execute('''CREATE TABLE account_balances (
+                    account_id INTEGER PRIMARY KEY,
+                    income_cents INTEGER NOT NULL DEFAULT 0,
+                    expense_cents INTEGER NOT NULL DEFAULT 0
+                )''')
+    c.execute("DROP TABLE monthly_summary")
+    c.execute('''CREATE TABLE monthly_summary (
+                    year_month TEXT NOT NULL,
+                    type TEXT NOT NULL,
+                    category TEXT NOT NULL,
+                    account_id INTEGER NOT NULL DEFAULT 0,
+                    total_cents INTEGER NOT NULL DEFAULT 0,
+                    count INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (year_month, type, category, account_id)
+                ) WITHOUT ROWID''')
+    _create_amount_triggers(c)
+    _rebuild_account_balances(c)
+    _rebuild_monthly_summary(c)
+
+    c.execute("SELECT 1 FROM sqlite_master WHERE name = 'transactions_fts'")
+    if c.fetchone():
+        _create_search_triggers(c)
+    c.execute("ANALYZE")
+
+def _migrate_card_account_types(c):
+    """Mark the seeded card accounts as credit cards.
+
+    The card page used to pick cards from the payment method names
+    containing "Card" plus Line Bank and Richart; it now uses accounts.type,
+    so accounts still carrying the seed type 'General' under exactly those
+    names become 'Credit Card'. The generic 信用卡 method was never shown
+    there and keeps its type.
+    """
+    c.execute("""UPDATE accounts SET type = 'Credit Card'
+                 WHERE type = 'General'
+                   AND name IN ('Go Card', 'Cube Card', 'iLeo Card', 'Line Bank', 'Richart')""")
+
+def _migrate_foreign_keys(c):
+    """Reference accounts and categories from transactions with foreign keys.
+
+    Adds category_id next to the category name, which stays on the row for
+    the filters, search index and monthly summary. Categories used by
+    transactions but missing from the categories table are created, and
+    account ids of accounts deleted earlier are cleared, so every existing
+    row satisfies the constraints. Like _migrate_integer_cents this rebuilds
+    the table with the same ids.
+    """
+    c.execute("""
+        INSERT INTO categories (name, type)
+        SELECT category, CASE WHEN COUNT(DISTINCT type) > 1 THEN 'Both' ELSE MAX(type) END
+        FROM transactions
+        WHERE category NOT IN (SELECT name FROM categories)
+        GROUP BY category
+    """)
+    c.execute('''CREATE TABLE transactions_new (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    date TEXT NOT NULL,
+                    type TEXT NOT NULL,
+                    category TEXT NOT NULL,
+                    amount_cents INTEGER NOT NULL,
+                    payment_method TEXT NOT NULL,
+                    description TEXT,
+                    account_id INTEGER REFERENCES accounts (id),
+                    dedupe_key TEXT,
+                    category_id INTEGER REFERENCES categories (id)
+                )''')
+    c.execute("""
+        INSERT INTO transactions_new (id, date, type, category, amount_cents, payment_method, description, account_id, dedupe_key, category_id)
+        SELECT t.id, t.date, t.type, t.category, t.amount_cents, t.payment_method, t.description, a.id,
+               CASE WHEN a.id IS NULL AND t.account_id IS NOT NULL
+                    THEN transaction_key(t.date, t.amount_cents / 100.0, NULL, t.description)
+                    ELSE t.dedupe_key END,
+               cat.id
+        FROM transactions t
+        LEFT JOIN accounts a ON a.id = t.account_id
+        LEFT JOIN categories cat ON cat.name = t.category
+    """)
+    c.execute("DROP TABLE transactions")
+    c.execute("ALTER TABLE transactions_new RENAME TO transactions")
+
+    c.execute("CREATE INDEX idx_transactions_date ON transactions (date)")
+    c.execute("CREATE INDEX idx_transactions_account_type_amount ON transactions (account_id, type, amount_cents)")
+    c.execute("CREATE INDEX idx_transactions_type_date ON transactions (type, date)")
+    c.execute("CREATE INDEX idx_transactions_dedupe_key ON transactions (dedupe_key)")
+    c.execute("CREATE INDEX idx_transactions_account_date ON transactions (account_id, date)")
+    c.execute("CREATE INDEX idx_transactions_category_date ON transactions (category, date)")
+    # Backs the foreign key and the category usage checks
+    c.execute("CREATE INDEX idx_transactions_category_id ON transactions (category_id)")
+
+    _create_amount_triggers(c)
+    # Cleared account ids move their rows out of the per-account totals
+    _rebuild_account_balances(c)
+    _rebuild_monthly_summary(c)
+
+    c.execute("SELECT 1 FROM sqlite_master WHERE name = 'transactions_fts'")
+    if c.fetchone():
+        _create_search_triggers(c)
+    c.execute("ANALYZE")
+
+def _create_year_version_triggers(c):
+    """Bump a year's version in transaction_years on every write to one of its rows."""
+    bump = "INSERT INTO transaction_years (year, version) VALUES (substr({row}.date, 1, 4), 1) ON CONFLICT (year) DO UPDATE SET version = version + 1;"
+    c.execute(f"CREATE TRIGGER IF NOT EXISTS trg_transactions_year_insert AFTER INSERT ON transactions BEGIN {bump.format(row='NEW')} END")
+    c.execute(f"CREATE TRIGGER IF NOT EXISTS trg_transactions_year_update AFTER UPDATE ON transactions BEGIN {bump.format(row='OLD')} {bump.format(row='NEW')} END")
+    c.execute(f"CREATE TRIGGER IF NOT EXISTS trg_transactions_year_delete AFTER DELETE ON transactions BEGIN {bump.format(row='OLD')} END")
+
+def _migrate_transaction_years(c):
+    """Track a change counter per transaction year.
+
+    The analytics export (modules/analytics.py) rewrites the Parquet
+    partition of a year only when its version moved.
+    """
+    c.execute('''CREATE TABLE IF NOT EXISTS transaction_years (
+                    year TEXT PRIMARY KEY,
+                    version INTEGER NOT NULL DEFAULT 0
+                ) WITHOUT ROWID''')
+    c.execute("INSERT OR IGNORE INTO transaction_years (year, version) SELECT DISTINCT substr(date, 1, 4), 1 FROM transactions")
+    _create_year_version_triggers(c)
+
+def _migrate_bulk_load_guard(c):
+    """Let add_transactions switch the per-row insert triggers off for a bulk load.
+
+    The insert triggers of the derived tables (balances, monthly summary,
+    search index, years) only fire while bulk_load_guard is empty. The bulk
+    path fills it inside its own write transaction, updates those tables
+    with one set-based statement each and empties it again before the
+    commit, so other connections never see it set and the schema never
+    changes at runtime.
+    """
+    c.execute("CREATE TABLE IF NOT EXISTS bulk_load_guard (active INTEGER PRIMARY KEY)")
+    c.execute("DELETE FROM bulk_load_guard")
+    names = list(_BULK_INSERT_STATEMENTS)
+    triggers = c.execute(f"SELECT name, sql FROM sqlite_master WHERE type = 'trigger' AND name IN ({','.join('?' * len(names))})",
+                         names).fetchall()
+    for name, sql in triggers:
+        guarded = sql.replace("AFTER INSERT ON transactions BEGIN",
+                              f"AFTER INSERT ON transactions WHEN {_BULK_LOAD_OFF} BEGIN", 1)
+        if guarded == sql:
+            raise RuntimeError(f"Unexpected definition of trigger {name}")
+        c.execute(f"DROP TRIGGER {name}")
+        c.execute(guarded)
+
+# Ordered schema migrations. The database stores how many of these have been
+# applied in PRAGMA user_version; append new steps, never reorder or edit them.
+MIGRATIONS = [
+    _migrate_base_schema,
+    _migrate_transaction_account_id,
+    _migrate_transaction_indexes,
+    _migrate_account_balances,
+    _migrate_monthly_summary,
+    _migrate_quotes,
+    _migrate_price_history,
+    _migrate_sheet_sync_state,
+    _migrate_transaction_dedupe_key,
+    _migrate_transaction_page_indexes,
+    _migrate_transaction_search,
+    _migrate_integer_cents,
+    _migrate_card_account_types,
+    _migrate_foreign_keys,
+    _migrate_transaction_years,
+    _migrate_bulk_load_guard,
+]
+SCHEMA_VERSION = len(MIGRATIONS)
+
+def get_schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+def _migrate(conn):
+    if get_schema_version(conn) >= SCHEMA_VERSION:
+        return
 
-def add_transaction(date, type, category, amount, payment_method, description, account_id=None):
-    conn = get_connection()
     c = conn.cursor()
-    c.execute("INSERT INTO transactions (date, type, category, amount, payment_method, description, account_id) VALUES (?, ?, ?, ?, ?, ?, ?)",
-              (date, type, category, amount, payment_method, description, account_id))
-    conn.commit()
-    conn.close()
+    while True:
+        # Take the write lock before re-reading the version so concurrent
+        # processes don't apply the same step twice.
+        c.execute("BEGIN IMMEDIATE")
+        version = get_schema_version(conn)
+        if version >= SCHEMA_VERSION:
+            conn.rollback()
+            break
+        MIGRATIONS[version](c)
+        c.execute(f"PRAGMA user_version = {version + 1}")
+        conn.commit()
+
+def init_db():
+    """Bring the database schema up to SCHEMA_VERSION.
+
+    Each pending migration runs in its own transaction together with the
+    user_version bump, so an interrupted upgrade resumes where it stopped.
+    A database that is already current costs a single PRAGMA read.
+
+    This happens automatically, once per process and database file, when
+    the first connection is borrowed; calling it is only needed to migrate
+    eagerly (e.g. from a maintenance script).
+    """
+    with get_connection() as conn:
+        _migrate(conn)
+
+_WHITESPACE = re.compile(r'\s+')
+
+def to_cents(amount):
+    """Convert a currency amount to integer cents, rounding half away from zero like SQLite's ROUND."""
+    cents = abs(float(amount)) * 100
+    return int(cents + 0.5) * (-1 if float(amount) < 0 else 1)
+
+def transaction_key(date, amount, account_id, description):
+    """Content hash identifying a transaction for duplicate detection.
+
+    Built from the date, the amount in cents, the account and the
+    description with case and whitespace normalized.
+    """
+    description = _WHITESPACE.sub(' ', str(description or '')).strip().casefold()
+    content = f"{str(date)[:10]}|{to_cents(amount)}|{'' if account_id is None else int(account_id)}|{description}"
+    return hashlib.blake2b(content.encode('utf-8'), digest_size=12).hexdigest()
+
+def to_cents_array(amounts):
+    """to_cents for a whole column: integer cents as an int64 array."""
+    amounts = np.asarray(amounts, dtype=float)
+    return (np.floor(np.abs(amounts) * 100 + 0.5) * np.sign(amounts)).astype(np.int64)
+
+def transaction_keys(dates, amounts_cents, account_ids, descriptions):
+    """transaction_key for whole columns; ``amounts_cents`` are already in cents (see to_cents_array).
 
+    Returns
+    -------
+    list of str
+        One key per row, equal to what transaction_key gives for it.
+    """
+    dates = pd.Series(dates, dtype=object).map(str).str.slice(0, 10)
+    account_ids = pd.Series(account_ids, dtype=object)
+    accounts = pd.array(account_ids.where(account_ids.notna(), None), dtype='Int64').astype(object)
+    descriptions = pd.Series(descriptions, dtype=object)
+    descriptions = descriptions.where(descriptions.notna(), '')
+    blake2b, normalize = hashlib.blake2b, _WHITESPACE.sub
+    # Python's re, not pandas' string methods: its \s also matches full-width spaces
+    return [
+        blake2b(f"{date}|{cents}|{'' if account is pd.NA else account}|{normalize(' ', str(description)).strip().casefold()}"
+                .encode('utf-8'), digest_size=12).hexdigest()
+        for date, cents, account, description in zip(dates.tolist(), np.asarray(amounts_cents).tolist(),
+                                                     accounts.tolist(), descriptions.tolist())
+    ]
+
+# category_id is looked up from the category name (?3); it stays NULL for a
+# name that is not in the categories table until that category is added
+_INSERT_TRANSACTION = """
+    INSERT INTO transactions (date, type, category, amount_cents, payment_method, description, account_id, dedupe_key, category_id)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, (SELECT id FROM categories WHERE name = ?3))
+"""
+# Batch form: category_id is resolved from one name -> id dict per batch
+_INSERT_TRANSACTIONS = """
+    INSERT INTO transactions (date, type, category, amount_cents, payment_method, description, account_id, category_id, dedupe_key)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+TRANSACTION_COLUMNS = ['date', 'type', 'category', 'amount', 'payment_method', 'description', 'account_id']
+# Bulk batches are staged in a connection-private temp table and moved with
+# one INSERT ... SELECT: run as a single statement, the insert pays the
+# per-statement trigger and journal overhead once instead of once per row
+_STAGED_COLUMNS = "date, type, category, amount_cents, payment_method, description, account_id, category_id, dedupe_key"
+
+@_writes('transactions')
+def add_transaction(date, type, category, amount, payment_method, description, account_id=None):
+    with get_connection() as conn:
+        c = conn.cursor()
+        c.execute(_INSERT_TRANSACTION,
+                  (date, type, category, to_cents(amount), payment_method, description, account_id,
+                   transaction_key(date, amount, account_id, description)))
+        conn.commit()
+
+def find_duplicate(date, amount, account_id, description):
+    """Return the id of an existing transaction with the same content, or None."""
+    with get_connection() as conn:
+        row = conn.execute("SELECT id FROM transactions WHERE dedupe_key = ? LIMIT 1",
+                           (transaction_key(date, amount, account_id, description),)).fetchone()
+    return row[0] if row else None
+
+def _existing_key_counts(c, keys, max_id=None):
+    """How many stored transactions (up to ``max_id``) have each of ``keys``."""
+    keys = list(keys)
+    counts = Counter()
+    for i in range(0, len(keys), 500):
+        batch = keys[i:i + 500]
+        query = f"SELECT dedupe_key, COUNT(*) FROM transactions WHERE dedupe_key IN ({','.join('?' * len(batch))})"
+        params = batch
+        if max_id is not None:
+            query += " AND id <= ?"
+            params = batch + [max_id]
+        counts.update(dict(c.execute(query + " GROUP BY dedupe_key", params).fetchall()))
+    return counts
+
+def _drop_duplicates(c, rows, max_id=None):
+    """Drop rows already stored, keeping repeats within ``rows`` beyond the stored count.
+
+    Re-importing an overlapping statement then adds nothing, while a
+    statement with two identical purchases still gets both.
+    """
+    keys = [row[-1] for row in rows]
+    remaining = _existing_key_counts(c, set(keys), max_id)
+    kept = []
+    for row, key in zip(rows, keys):
+        if remaining[key] > 0:
+            remaining[key] -= 1
+        else:
+            kept.append(row)
+    return kept
+
+# Batches at least this large switch off the insert triggers guarded by
+# bulk_load_guard (see _migrate_bulk_load_guard) and update each derived
+# table with one set-based statement over the new rows instead. Every guarded
+# trigger needs its statement here, keyed by trigger name; triggers without
+# the guard keep firing per row.
+BULK_INSERT_THRESHOLD = 1000
+_BULK_LOAD_OFF = "NOT EXISTS (SELECT 1 FROM bulk_load_guard)"
+_BULK_INSERT_STATEMENTS = {
+    'trg_transactions_balance_insert': """
+        INSERT INTO account_balances (account_id, income_cents, expense_cents)
+        SELECT account_id,
+               SUM(CASE WHEN type = 'Income' THEN amount_cents ELSE 0 END),
+               SUM(CASE WHEN type = 'Expense' THEN amount_cents ELSE 0 END)
+        FROM transactions
+        WHERE id >= ? AND account_id IS NOT NULL AND type IN ('Income', 'Expense')
+        GROUP BY account_id
+        ON CONFLICT (account_id) DO UPDATE SET income_cents = income_cents + excluded.income_cents, expense_cents = expense_cents + excluded.expense_cents
+    """,
+    'trg_transactions_summary_insert': """
+        INSERT INTO monthly_summary (year_month, type, category, account_id, total_cents, count)
+        SELECT substr(date, 1, 7), type, category, COALESCE(account_id, 0), SUM(amount_cents), COUNT(*)
+        FROM transactions
+        WHERE id >= ?
+        GROUP BY 1, 2, 3, 4
+        ON CONFLICT (year_month, type, category, account_id) DO UPDATE SET total_cents = total_cents + excluded.total_cents, count = count + excluded.count
+    """,
+    'trg_transactions_fts_insert': """
+        INSERT INTO transactions_fts (rowid, description, category)
+        SELECT id, description, category FROM transactions WHERE id >= ?
+    """,
+    'trg_transactions_year_insert': """
+        INSERT INTO transaction_years (year, version)
+        SELECT DISTINCT substr(date, 1, 4), 1 FROM transactions WHERE id >= ?
+        ON CONFLICT (year) DO UPDATE SET version = version + 1
+    """,
+}
+
+@_writes('transactions')
+def add_transactions(rows, skip_duplicates=False, max_existing_id=None):
+    """Insert many transactions in a single database transaction.
+    
+    Amounts and duplicate keys are computed for the whole batch at once and
+    category ids come from one lookup, so the per-row work left is SQLite's.
+    
+    Parameters
+    ----------
+    rows: pandas.DataFrame or iterable of tuple
+        Frame with the TRANSACTION_COLUMNS columns, or tuples of
+        (date, type, category, amount, payment_method, description, account_id)
+    skip_duplicates: bool
+        Leave out rows whose content already exists in the table.
+    max_existing_id: int, optional
+        Only compare against transactions up to this id, so a file imported
+        in several batches is not deduplicated against itself.
+    
+    Returns
+    -------
+    int
+        Number of rows inserted.
+    """
+    if isinstance(rows, pd.DataFrame):
+        frame = rows[TRANSACTION_COLUMNS]
+    else:
+        frame = pd.DataFrame(list(rows), columns=TRANSACTION_COLUMNS)
+    if frame.empty:
+        return 0
+
+    cents = to_cents_array(frame['amount'])
+    keys = transaction_keys(frame['date'], cents, frame['account_id'], frame['description'])
+    account_ids = pd.array(frame['account_id'].astype(object).where(frame['account_id'].notna(), None), dtype='Int64')
+    descriptions = frame['description'].astype(object)
+    with get_connection() as conn:
+        c = conn.cursor()
+        category_ids = dict(c.execute("SELECT name, id FROM categories").fetchall())
+        categories = frame['category'].tolist()
+        rows = list(zip(
+            frame['date'].tolist(), frame['type'].tolist(), categories, cents.tolist(),
+            frame['payment_method'].tolist(), descriptions.where(descriptions.notna(), None).tolist(),
+            [None if account is pd.NA else account for account in account_ids.astype(object).tolist()],
+            [category_ids.get(name) for name in categories], keys,
+        ))
+        if skip_duplicates:
+            rows = _drop_duplicates(c, rows, max_existing_id)
+        if not rows:
+            return 0
+        if len(rows) < BULK_INSERT_THRESHOLD:
+            c.executemany(_INSERT_TRANSACTIONS, rows)
+            conn.commit()
+            return len(rows)
+
+        guarded = [name for name, in c.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'transactions' AND instr(sql, 'bulk_load_guard')")]
+        if set(guarded) - set(_BULK_INSERT_STATEMENTS):
+            # A guarded trigger nothing here can stand in for: let every trigger fire
+            c.executemany(_INSERT_TRANSACTIONS, rows)
+            conn.commit()
+            return len(rows)
+
+        try:
+            c.execute(f"CREATE TEMP TABLE IF NOT EXISTS transactions_staging ({_STAGED_COLUMNS})")
+            c.execute("BEGIN IMMEDIATE")
+            c.executemany(f"INSERT INTO temp.transactions_staging VALUES ({', '.join('?' * 9)})", rows)
+            first_id = c.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM transactions").fetchone()[0]
+            # Only visible to this transaction, and emptied before its commit
+            c.execute("INSERT INTO bulk_load_guard (active) VALUES (1)")
+            c.execute(f"INSERT INTO transactions ({_STAGED_COLUMNS}) "
+                      f"SELECT {_STAGED_COLUMNS} FROM temp.transactions_staging ORDER BY rowid")
+            c.execute("DELETE FROM bulk_load_guard")
+            c.execute("DELETE FROM temp.transactions_staging")
+            for name in guarded:
+                c.execute(_BULK_INSERT_STATEMENTS[name], (first_id,))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        return len(rows)
+
+@_writes('transactions')
 def update_transaction(tx_id, date, type, category, amount, payment_method, description, account_id=None):
     """Update an existing transaction record.
 
@@ -139,70 +942,621 @@ def update_transaction(tx_id, date, type, category, amount, payment_method, desc
     account_id: int, optional
         Foreign key to accounts table.
     """
-    conn = get_connection()
-    c = conn.cursor()
-    c.execute(
-        """UPDATE transactions SET date = ?, type = ?, category = ?, amount = ?, payment_method = ?, description = ?, account_id = ? WHERE id = ?""",
-        (date, type, category, amount, payment_method, description, account_id, tx_id)
-    )
-    conn.commit()
-    conn.close()
+    with get_connection() as conn:
+        c = conn.cursor()
+        c.execute(
+            """UPDATE transactions SET date = ?, type = ?, category = ?, amount_cents = ?, payment_method = ?, description = ?, account_id = ?, dedupe_key = ?,
+                   category_id = (SELECT id FROM categories WHERE name = ?3) WHERE id = ?""",
+            (date, type, category, to_cents(amount), payment_method, description, account_id,
+             transaction_key(date, amount, account_id, description), tx_id)
+        )
+        conn.commit()
 
+@_writes('transactions')
 def delete_transaction(tx_id):
-    conn = get_connection()
-    c = conn.cursor()
-    c.execute("DELETE FROM transactions WHERE id = ?", (tx_id,))
-    conn.commit()
-    conn.close()
+    with get_connection() as conn:
+        c = conn.cursor()
+        c.execute("DELETE FROM transactions WHERE id = ?", (tx_id,))
+        conn.commit()
+
+# Transaction columns as returned by the read API, with amounts in currency units
+_TRANSACTION_COLUMNS = "t.id, t.date, t.type, t.category, t.amount_cents / 100.0 AS amount, t.payment_method, t.description, t.account_id"
+
+@_writes('transactions')
+def delete_transactions(tx_ids):
+    """Delete several transactions in one database transaction."""
+    with get_connection() as conn:
+        conn.executemany("DELETE FROM transactions WHERE id = ?", [(int(tx_id),) for tx_id in tx_ids])
+        conn.commit()
+
+@_cached('transactions')
+def get_max_transaction_id():
+    with get_connection() as conn:
+        return conn.execute("SELECT COALESCE(MAX(id), 0) FROM transactions").fetchone()[0]
+
+@_cached('transactions', 'accounts')
+def get_duplicate_transactions():
+    """Transactions whose content hash occurs more than once, grouped by dedupe_key.
+    
+    Returns
+    -------
+    pandas.DataFrame
+        Transactions in duplicate groups, ordered by group and id.
+    """
+    if USE_GOOGLE_SHEETS:
+        df = _read_tab('transactions')
+        if df.empty:
+            return df
+        df = df.dropna(subset=['date', 'amount'])
+        account_ids = df['account_id'] if 'account_id' in df.columns else pd.Series(None, index=df.index)
+        descriptions = df['description'] if 'description' in df.columns else pd.Series(None, index=df.index)
+        df = df.assign(dedupe_key=[
+            transaction_key(d, amount, None if pd.isna(acc) else acc, None if pd.isna(desc) else desc)
+            for d, amount, acc, desc in zip(df['date'], df['amount'], account_ids, descriptions)
+        ])
+        return df[df.duplicated('dedupe_key', keep=False)].sort_values(['dedupe_key', 'id'])
+
+    # Fallback to SQLite
+    with get_connection() as conn:
+        return pd.read_sql_query(f"""
+            SELECT {_TRANSACTION_COLUMNS}, t.dedupe_key, a.name AS account_name
+            FROM transactions t
+            LEFT JOIN accounts a ON t.account_id = a.id
+            WHERE t.dedupe_key IN (
+                SELECT dedupe_key FROM transactions GROUP BY dedupe_key HAVING COUNT(*) > 1
+            )
+            ORDER BY t.dedupe_key, t.id
+        """, conn)
+
+@_cached('transactions', 'accounts')
+def get_near_duplicate_candidates():
+    """Transactions sharing their account, type and amount with at least one other.
 
+    Only these rows can be near duplicates (see dedupe.find_near_duplicates),
+    so the rest of the ledger is never loaded.
+
+    Returns
+    -------
+    pandas.DataFrame
+        Transactions ordered by account, type, amount and date.
+    """
+    if USE_GOOGLE_SHEETS:
+        df = _read_tab('transactions')
+        if df.empty:
+            return df
+        df = df.dropna(subset=['date', 'amount'])
+        df = df.assign(account_id=df['account_id'] if 'account_id' in df.columns else pd.NA,
+                       amount_cents=(df['amount'] * 100).round())
+        key = ['account_id', 'type', 'amount_cents']
+        df = df[df.duplicated(key, keep=False)].sort_values(key + ['date'])
+        return df.drop(columns='amount_cents')
+
+    # Fallback to SQLite. The groups come from the covering
+    # (account_id, type, amount_cents) index and CROSS JOIN keeps them as
+    # the outer loop, so only their rows are looked up through that index.
+    with get_connection() as conn:
+        return pd.read_sql_query(f"""
+            SELECT {_TRANSACTION_COLUMNS}, a.name AS account_name
+            FROM (
+                SELECT account_id, type, amount_cents FROM transactions
+                GROUP BY account_id, type, amount_cents HAVING COUNT(*) > 1
+            ) g
+            CROSS JOIN transactions t
+                ON t.account_id IS g.account_id AND t.type = g.type AND t.amount_cents = g.amount_cents
+            LEFT JOIN accounts a ON t.account_id = a.id
+            ORDER BY t.account_id, t.type, t.amount_cents, t.date
+        """, conn)
+
+@_cached('transactions', 'accounts')
 def get_transactions(limit=50):
     if USE_GOOGLE_SHEETS:
-        df = sheets.get_transactions_sheet()
+        df = _read_tab('transactions')
         if not df.empty:
             df = df.sort_values('date', ascending=False).head(limit)
         return df
     
     # Fallback to SQLite
-    conn = get_connection()
-    query = """
-        SELECT t.*, a.name as account_name 
+    query = f"""
+        SELECT {_TRANSACTION_COLUMNS}, a.name as account_name 
         FROM transactions t 
         LEFT JOIN accounts a ON t.account_id = a.id 
         ORDER BY t.date DESC LIMIT ?
     """
-    df = pd.read_sql_query(query, conn, params=(limit,))
-    conn.close()
-    return df
+    with get_connection() as conn:
+        return pd.read_sql_query(query, conn, params=(limit,))
 
+@_cached('transactions', 'accounts')
 def get_all_transactions():
     if USE_GOOGLE_SHEETS:
-        df = sheets.get_transactions_sheet()
+        df = _read_tab('transactions')
         if not df.empty:
             df = df.sort_values('date', ascending=False)
         return df
     
     # Fallback to SQLite
-    conn = get_connection()
-    query = """
-        SELECT t.*, a.name as account_name 
+    query = f"""
+        SELECT {_TRANSACTION_COLUMNS}, a.name as account_name 
         FROM transactions t 
         LEFT JOIN accounts a ON t.account_id = a.id 
         ORDER BY t.date DESC
     """
-    df = pd.read_sql_query(query, conn)
-    conn.close()
-    return df
+    with get_connection() as conn:
+        return pd.read_sql_query(query, conn)
+
+@_cached('transactions', 'accounts')
+def load_transactions(start_date=None, end_date=None):
+    """Load transactions into a compact, typed DataFrame.
+
+    Unlike get_all_transactions(), types are fixed at the SQL boundary so
+    callers never re-parse them: ``date`` is datetime64, ``amount_cents``
+    is int64 (exact sums), and ``type``, ``category``, ``payment_method``
+    and ``account_name`` are categoricals.
+
+    Parameters
+    ----------
+    start_date: datetime.date or str, optional
+        Inclusive lower bound (YYYY-MM-DD).
+    end_date: datetime.date or str, optional
+        Exclusive upper bound (YYYY-MM-DD).
+
+    Returns
+    -------
+    pandas.DataFrame
+        Columns id, date, type, category, amount_cents, payment_method,
+        description, account_id (nullable Int64) and account_name, newest first.
+    """
+    if USE_GOOGLE_SHEETS:
+        df = _read_tab('transactions')
+        if not df.empty:
+            df = _filter_transactions_frame(df, start_date=start_date, end_date=end_date)
+            df = df.assign(amount_cents=(df['amount'] * 100).round()).sort_values('date', ascending=False)
+        return _typed_transactions(df)
+
+    # Fallback to SQLite
+    clauses, params = _transaction_filters(start_date=start_date, end_date=end_date)
+    query = f"""
+        SELECT t.id, t.date, t.type, t.category, t.amount_cents, t.payment_method,
+               t.description, t.account_id, a.name AS account_name
+        FROM transactions t
+        LEFT JOIN accounts a ON t.account_id = a.id
+        {'WHERE ' + ' AND '.join(clauses) if clauses else ''}
+        ORDER BY t.date DESC, t.id DESC
+    """
+    with get_connection() as conn:
+        df = pd.read_sql_query(query, conn, params=params)
+    return _typed_transactions(df)
+
+_TYPED_TRANSACTION_COLUMNS = {
+    'id': 'int64',
+    'type': 'category',
+    'category': 'category',
+    'amount_cents': 'int64',
+    'payment_method': 'category',
+    'account_id': 'Int64',
+    'account_name': 'category',
+}
+
+def _typed_transactions(df):
+    columns = ['id', 'date', 'type', 'category', 'amount_cents', 'payment_method',
+               'description', 'account_id', 'account_name']
+    df = df.reindex(columns=columns)
+    df['date'] = pd.to_datetime(df['date'], format='ISO8601', errors='coerce')
+    df['amount_cents'] = df['amount_cents'].fillna(0)
+    df['account_id'] = pd.to_numeric(df['account_id'], errors='coerce')
+    return df.astype(_TYPED_TRANSACTION_COLUMNS).reset_index(drop=True)
+
+@_cached('transactions', 'accounts')
+def get_transactions_by_date_range(start_date, end_date):
+    """Get transactions with ``start_date <= date < end_date``, newest first.
+
+    Parameters
+    ----------
+    start_date: datetime.date or str
+        Inclusive lower bound (YYYY-MM-DD).
+    end_date: datetime.date or str
+        Exclusive upper bound (YYYY-MM-DD).
+
+    Returns
+    -------
+    pandas.DataFrame
+        Same columns as get_all_transactions().
+    """
+    start_date, end_date = str(start_date), str(end_date)
+
+    if USE_GOOGLE_SHEETS:
+        df = _read_tab('transactions')
+        if not df.empty:
+            mask = (df['date'] >= pd.Timestamp(start_date)) & (df['date'] < pd.Timestamp(end_date))
+            df = df[mask].sort_values('date', ascending=False)
+        return df
+
+    # Fallback to SQLite
+    query = f"""
+        SELECT {_TRANSACTION_COLUMNS}, a.name as account_name
+        FROM transactions t
+        LEFT JOIN accounts a ON t.account_id = a.id
+        WHERE t.date >= ? AND t.date < ?
+        ORDER BY t.date DESC
+    """
+    with get_connection() as conn:
+        return pd.read_sql_query(query, conn, params=(start_date, end_date))
+
+def _transaction_filters(type=None, category=None, account_id=None, start_date=None, end_date=None):
+    """WHERE clauses and parameters for the common transaction filters."""
+    clauses, params = [], []
+    if type is not None:
+        clauses.append("t.type = ?")
+        params.append(type)
+    if category is not None:
+        clauses.append("t.category = ?")
+        params.append(category)
+    if account_id is not None:
+        clauses.append("t.account_id = ?")
+        params.append(int(account_id))
+    if start_date is not None:
+        clauses.append("t.date >= ?")
+        params.append(str(start_date))
+    if end_date is not None:
+        clauses.append("t.date < ?")
+        params.append(str(end_date))
+    return clauses, params
+
+def _filter_transactions_frame(df, type=None, category=None, account_id=None, start_date=None, end_date=None):
+    """Apply the same filters as _transaction_filters to a DataFrame."""
+    mask = pd.Series(True, index=df.index)
+    if type is not None:
+        mask &= df['type'] == type
+    if category is not None:
+        mask &= df['category'] == category
+    if account_id is not None:
+        mask &= df['account_id'] == account_id
+    if start_date is not None:
+        mask &= df['date'] >= pd.Timestamp(start_date)
+    if end_date is not None:
+        mask &= df['date'] < pd.Timestamp(end_date)
+    return df[mask]
+
+@_cached('transactions', 'accounts')
+def get_transactions_page(after=None, limit=50, type=None, category=None, account_id=None,
+                          start_date=None, end_date=None):
+    """Get one page of transactions, newest first, using keyset pagination.
+
+    Pages are ordered by (date, id) descending and the next page starts
+    after the last row of the previous one, so every page costs the same
+    however deep into the history it is.
+
+    Parameters
+    ----------
+    after: tuple, optional
+        (date, id) of the last row of the previous page; None for the first page.
+    limit: int
+        Page size.
+    type: str, optional
+        "Expense" or "Income".
+    category: str, optional
+        Category name.
+    account_id: int, optional
+        Account ID.
+    start_date: datetime.date or str, optional
+        Inclusive lower bound (YYYY-MM-DD).
+    end_date: datetime.date or str, optional
+        Exclusive upper bound (YYYY-MM-DD).
+
+    Returns
+    -------
+    pandas.DataFrame
+        Same columns as get_all_transactions(), at most ``limit`` rows.
+    """
+    filters = dict(type=type, category=category, account_id=account_id, start_date=start_date, end_date=end_date)
+
+    if USE_GOOGLE_SHEETS:
+        df = _read_tab('transactions')
+        if df.empty:
+            return df
+        df = _filter_transactions_frame(df, **filters)
+        if after is not None:
+            after_date, after_id = pd.Timestamp(after[0]), after[1]
+            df = df[(df['date'] < after_date) | ((df['date'] == after_date) & (df['id'] < after_id))]
+        return df.sort_values(['date', 'id'], ascending=False).head(limit)
+
+    # Fallback to SQLite
+    clauses, params = _transaction_filters(**filters)
+    if after is not None:
+        clauses.append("(t.date, t.id) < (?, ?)")
+        params.extend([str(after[0]), int(after[1])])
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    query = f"""
+        SELECT {_TRANSACTION_COLUMNS}, a.name as account_name
+        FROM transactions t
+        LEFT JOIN accounts a ON t.account_id = a.id
+        {where}
+        ORDER BY t.date DESC, t.id DESC
+        LIMIT ?
+    """
+    with get_connection() as conn:
+        return pd.read_sql_query(query, conn, params=params + [limit])
+
+@_cached('transactions', 'accounts')
+def get_transaction(tx_id):
+    """Get a single transaction by ID.
+
+    Returns
+    -------
+    pandas.Series or None
+        Same fields as a get_all_transactions() row, or None if the ID does not exist.
+    """
+    if USE_GOOGLE_SHEETS:
+        df = _read_tab('transactions')
+        if df.empty:
+            return None
+        rows = df[df['id'] == tx_id]
+        return rows.iloc[0] if not rows.empty else None
+
+    # Fallback to SQLite
+    query = f"""
+        SELECT {_TRANSACTION_COLUMNS}, a.name as account_name
+        FROM transactions t
+        LEFT JOIN accounts a ON t.account_id = a.id
+        WHERE t.id = ?
+    """
+    with get_connection() as conn:
+        df = pd.read_sql_query(query, conn, params=(int(tx_id),))
+    return df.iloc[0] if not df.empty else None
+
+def _fts_tokenizer(conn):
+    """Tokenizer of the transactions_fts index, or None if there is no index."""
+    row = conn.execute("SELECT sql FROM sqlite_master WHERE name = 'transactions_fts'").fetchone()
+    if row is None:
+        return None
+    return 'trigram' if 'trigram' in row[0] else 'unicode61'
 
+def _like_pattern(term):
+    escaped = term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f"%{escaped}%"
+
+@_cached('transactions', 'accounts')
+def search_transactions(query, filters=None, limit=50):
+    """Search transaction descriptions and categories.
+
+    Every whitespace-separated term must match, case-insensitively, as a
+    substring. Results are ranked by BM25 relevance, then newest first.
+
+    Parameters
+    ----------
+    query: str
+        Search text.
+    filters: dict, optional
+        Any of type, category, account_id, start_date and end_date, as in
+        get_transactions_page().
+    limit: int
+        Maximum number of results.
+
+    Returns
+    -------
+    pandas.DataFrame
+        Same columns as get_all_transactions(), best matches first.
+    """
+    filters = filters or {}
+    terms = str(query).split()
+
+    if USE_GOOGLE_SHEETS:
+        df = _read_tab('transactions')
+        if df.empty or not terms:
+            return df.head(0)
+        df = _filter_transactions_frame(df, **filters)
+        text = df['description'].fillna('').astype(str) + ' ' + df['category'].fillna('').astype(str)
+        for term in terms:
+            df = df[text.loc[df.index].str.contains(term, case=False, regex=False)]
+        return df.sort_values('date', ascending=False).head(limit)
+
+    # Fallback to SQLite
+    if not terms:
+        return get_transactions_page(None, 0)
+
+    clauses, params = _transaction_filters(**filters)
+    with get_connection() as conn:
+        tokenizer = _fts_tokenizer(conn)
+        # The trigram index can only look up terms of three or more characters
+        min_length = 3 if tokenizer == 'trigram' else 1
+        indexed = [term for term in terms if tokenizer and len(term) >= min_length]
+        for term in terms:
+            if term not in indexed:
+                clauses.append("(t.description LIKE ? ESCAPE '\\' OR t.category LIKE ? ESCAPE '\\')")
+                params.extend([_like_pattern(term)] * 2)
+
+        if indexed:
+            match = ' '.join('"' + term.replace('"', '""') + '"' for term in indexed)
+            # Materializing the matches keeps the index lookup first, rather
+            # than one MATCH per row of a filtered scan
+            query = f"""
+                WITH hits AS MATERIALIZED (
+                    SELECT rowid AS id, bm25(transactions_fts, 1.0, 0.5) AS score
+                    FROM transactions_fts
+                    WHERE transactions_fts MATCH ?
+                )
+                SELECT {_TRANSACTION_COLUMNS}, a.name as account_name
+                FROM hits
+                CROSS JOIN transactions t ON t.id = hits.id
+                LEFT JOIN accounts a ON t.account_id = a.id
+                {'WHERE ' + ' AND '.join(clauses) if clauses else ''}
+                ORDER BY hits.score, t.date DESC, t.id DESC
+                LIMIT ?
+            """
+            params = [match] + params
+        else:
+            query = f"""
+                SELECT {_TRANSACTION_COLUMNS}, a.name as account_name
+                FROM transactions t
+                LEFT JOIN accounts a ON t.account_id = a.id
+                WHERE {' AND '.join(clauses)}
+                ORDER BY t.date DESC, t.id DESC
+                LIMIT ?
+            """
+        return pd.read_sql_query(query, conn, params=params + [limit])
+
+@_cached('transactions')
+def get_monthly_summary(start=None, end=None):
+    """Get pre-aggregated monthly totals.
+
+    Parameters
+    ----------
+    start: str, optional
+        First month to include (YYYY-MM).
+    end: str, optional
+        Last month to include (YYYY-MM).
+
+    Returns
+    -------
+    pandas.DataFrame
+        Columns: year_month, type, category, account_id, total, count.
+        account_id is 0 for transactions without an account.
+    """
+    if USE_GOOGLE_SHEETS:
+        df = _read_tab('transactions')
+        columns = ['year_month', 'type', 'category', 'account_id', 'total', 'count']
+        if df.empty:
+            return pd.DataFrame(columns=columns)
+        df = df.assign(
+            year_month=df['date'].dt.strftime('%Y-%m'),
+            account_id=df['account_id'].fillna(0) if 'account_id' in df.columns else 0,
+        )
+        summary = (df.groupby(['year_month', 'type', 'category', 'account_id'], dropna=False)['amount']
+                     .agg(total='sum', count='count').reset_index())
+        if start:
+            summary = summary[summary['year_month'] >= start]
+        if end:
+            summary = summary[summary['year_month'] <= end]
+        return summary[columns]
+
+    # Fallback to SQLite
+    query = """
+        SELECT year_month, type, category, account_id, total_cents / 100.0 AS total, count
+        FROM monthly_summary
+        WHERE year_month >= ? AND year_month <= ?
+        ORDER BY year_month
+    """
+    with get_connection() as conn:
+        return pd.read_sql_query(query, conn, params=(start or '', end or '9999-99'))
+
+@_cached('transactions')
+def get_daily_totals(start_date=None, end_date=None):
+    """Transaction totals per day, type and account.
+
+    Enough to derive totals per type, spending per day and the asset trend
+    (dashboard.calculate_monthly_assets accepts it in place of raw rows)
+    while staying bounded by days x accounts rather than by row count.
+
+    Parameters
+    ----------
+    start_date: datetime.date or str, optional
+        Inclusive lower bound (YYYY-MM-DD).
+    end_date: datetime.date or str, optional
+        Exclusive upper bound (YYYY-MM-DD).
+
+    Returns
+    -------
+    pandas.DataFrame
+        Columns date (datetime64), type (categorical), account_id (nullable
+        Int64), amount_cents (int64) and count.
+    """
+    columns = {'date': 'datetime64[ns]', 'type': 'category', 'account_id': 'Int64', 'amount_cents': 'int64', 'count': 'int64'}
+    if USE_GOOGLE_SHEETS:
+        df = _read_tab('transactions')
+        if df.empty:
+            return pd.DataFrame({name: pd.Series(dtype=dtype) for name, dtype in columns.items()})
+        df = _filter_transactions_frame(df, start_date=start_date, end_date=end_date)
+        df = df.assign(date=df['date'].dt.normalize(), amount_cents=(df['amount'] * 100).round(),
+                       account_id=df['account_id'] if 'account_id' in df.columns else pd.NA)
+        df = (df.groupby(['date', 'type', 'account_id'], dropna=False, observed=True)['amount_cents']
+                .agg(amount_cents='sum', count='count').reset_index())
+        return df.astype(columns)
+
+    engine = _analytics()
+    if engine is not None:
+        return engine.daily_totals(start_date, end_date).astype(columns)
+
+    # Fallback to SQLite
+    clauses, params = _transaction_filters(start_date=start_date, end_date=end_date)
+    query = f"""
+        SELECT substr(t.date, 1, 10) AS date, t.type, t.account_id,
+               SUM(t.amount_cents) AS amount_cents, COUNT(*) AS count
+        FROM transactions t
+        {'WHERE ' + ' AND '.join(clauses) if clauses else ''}
+        GROUP BY 1, 2, 3
+    """
+    with get_connection() as conn:
+        df = pd.read_sql_query(query, conn, params=params)
+    return df.assign(date=pd.to_datetime(df['date'], errors='coerce')).astype(columns)
+
+@_cached('transactions')
+def get_category_totals(type=None, start_date=None, end_date=None):
+    """Transaction totals per category, largest first.
+
+    Parameters
+    ----------
+    type: str, optional
+        "Expense" or "Income".
+    start_date: datetime.date or str, optional
+        Inclusive lower bound (YYYY-MM-DD).
+    end_date: datetime.date or str, optional
+        Exclusive upper bound (YYYY-MM-DD).
+
+    Returns
+    -------
+    pandas.DataFrame
+        Columns category, total and count.
+    """
+    if USE_GOOGLE_SHEETS:
+        df = _read_tab('transactions')
+        if df.empty:
+            return pd.DataFrame(columns=['category', 'total', 'count'])
+        df = _filter_transactions_frame(df, type=type, start_date=start_date, end_date=end_date)
+        return (df.groupby('category', observed=True)['amount'].agg(total='sum', count='count')
+                  .reset_index().sort_values('total', ascending=False, ignore_index=True))
+
+    engine = _analytics()
+    if engine is not None:
+        return engine.category_totals(type, start_date, end_date)
+
+    # Fallback to SQLite
+    clauses, params = _transaction_filters(type=type, start_date=start_date, end_date=end_date)
+    query = f"""
+        SELECT t.category, SUM(t.amount_cents) / 100.0 AS total, COUNT(*) AS count
+        FROM transactions t
+        {'WHERE ' + ' AND '.join(clauses) if clauses else ''}
+        GROUP BY t.category
+        ORDER BY total DESC
+    """
+    with get_connection() as conn:
+        return pd.read_sql_query(query, conn, params=params)
+
+def _rebuild_monthly_summary(c):
+    c.execute("DELETE FROM monthly_summary")
+    c.execute("""
+        INSERT INTO monthly_summary (year_month, type, category, account_id, total_cents, count)
+        SELECT substr(date, 1, 7), type, category, COALESCE(account_id, 0), SUM(amount_cents), COUNT(*)
+        FROM transactions
+        GROUP BY 1, 2, 3, 4
+    """)
+
+@_writes('transactions')
+def rebuild_monthly_summary():
+    """Recompute the monthly_summary table from the transactions table."""
+    with get_connection() as conn:
+        _rebuild_monthly_summary(conn.cursor())
+        conn.commit()
+
+@_writes('budgets')
 def set_budget(month, amount):
-    conn = get_connection()
-    c = conn.cursor()
-    c.execute("INSERT OR REPLACE INTO budgets (month, amount) VALUES (?, ?)", (month, amount))
-    conn.commit()
-    conn.close()
+    with get_connection() as conn:
+        c = conn.cursor()
+        c.execute("INSERT OR REPLACE INTO budgets (month, amount) VALUES (?, ?)", (month, amount))
+        conn.commit()
 
+@_cached('budgets')
 def get_budget(month):
     if USE_GOOGLE_SHEETS:
-        df = sheets.get_budgets_sheet()
+        df = _read_tab('budgets')
         if not df.empty and 'month' in df.columns and 'amount' in df.columns:
             budget_row = df[df['month'] == month]
             if not budget_row.empty:
@@ -210,74 +1564,270 @@ def get_budget(month):
         return 0
     
     # Fallback to SQLite
-    conn = get_connection()
-    c = conn.cursor()
-    c.execute("SELECT amount FROM budgets WHERE month = ?", (month,))
-    result = c.fetchone()
-    conn.close()
+    with get_connection() as conn:
+        c = conn.cursor()
+        c.execute("SELECT amount FROM budgets WHERE month = ?", (month,))
+        result = c.fetchone()
     return result[0] if result else 0
 
+@_writes('stocks')
 def add_stock(symbol, buy_date, buy_price, quantity, broker_fee, transaction_fee):
-    conn = get_connection()
-    c = conn.cursor()
-    c.execute('''INSERT INTO stocks (symbol, buy_date, buy_price, quantity, broker_fee, transaction_fee) 
-                 VALUES (?, ?, ?, ?, ?, ?)''',
-              (symbol, buy_date, buy_price, quantity, broker_fee, transaction_fee))
-    conn.commit()
-    conn.close()
+    with get_connection() as conn:
+        c = conn.cursor()
+        c.execute('''INSERT INTO stocks (symbol, buy_date, buy_price, quantity, broker_fee, transaction_fee) 
+                     VALUES (?, ?, ?, ?, ?, ?)''',
+                  (symbol, buy_date, buy_price, quantity, broker_fee, transaction_fee))
+        conn.commit()
 
+@_cached('stocks')
 def get_stocks():
     if USE_GOOGLE_SHEETS:
-        return sheets.get_stocks_sheet()
+        return _read_tab('stocks')
     
     # Fallback to SQLite
-    conn = get_connection()
-    df = pd.read_sql_query("SELECT * FROM stocks WHERE status = 'Held'", conn)
-    conn.close()
-    return df
+    with get_connection() as conn:
+        return pd.read_sql_query("SELECT * FROM stocks WHERE status = 'Held'", conn)
 
-# Initialize DB on import
-init_db()
+def get_quotes(symbols):
+    """Get cached quotes for ``symbols``.
+    
+    Returns
+    -------
+    dict
+        symbol -> (price, fetched_at) for the symbols that have a quote;
+        fetched_at is a Unix timestamp.
+    """
+    symbols = list(symbols)
+    if not symbols:
+        return {}
+    placeholders = ", ".join("?" * len(symbols))
+    with get_connection() as conn:
+        rows = conn.execute(
+            f"SELECT symbol, price, fetched_at FROM quotes WHERE symbol IN ({placeholders})", symbols
+        ).fetchall()
+    return {symbol: (price, fetched_at) for symbol, price, fetched_at in rows}
 
-def add_account(name, type, initial_balance):
-    conn = get_connection()
-    c = conn.cursor()
-    try:
-        c.execute("INSERT INTO accounts (name, type, initial_balance) VALUES (?, ?, ?)", (name, type, initial_balance))
+@_cached('price_history')
+def get_price_history(symbols=None, start=None, end=None):
+    """Get stored daily closes.
+    
+    Parameters
+    ----------
+    symbols: tuple of str, optional
+        Symbols to include (all when omitted).
+    start: str, optional
+        First date to include (YYYY-MM-DD).
+    end: str, optional
+        Last date to include (YYYY-MM-DD).
+    
+    Returns
+    -------
+    pandas.DataFrame
+        Columns: symbol, date, close; ordered by symbol and date.
+    """
+    query = "SELECT symbol, date, close FROM price_history WHERE date >= ? AND date <= ?"
+    params = [str(start) if start else '', str(end) if end else '9999-99-99']
+    if symbols is not None:
+        symbols = list(symbols)
+        if not symbols:
+            return pd.DataFrame(columns=['symbol', 'date', 'close'])
+        query += f" AND symbol IN ({', '.join('?' * len(symbols))})"
+        params += symbols
+    query += " ORDER BY symbol, date"
+    with get_connection() as conn:
+        return pd.read_sql_query(query, conn, params=params)
+
+def get_price_history_ranges(symbols):
+    """First and last stored date per symbol.
+    
+    Returns
+    -------
+    dict
+        symbol -> (first_date, last_date) as YYYY-MM-DD strings, for symbols
+        that have any history.
+    """
+    symbols = list(symbols)
+    if not symbols:
+        return {}
+    placeholders = ", ".join("?" * len(symbols))
+    with get_connection() as conn:
+        rows = conn.execute(
+            f"SELECT symbol, MIN(date), MAX(date) FROM price_history WHERE symbol IN ({placeholders}) GROUP BY symbol",
+            symbols
+        ).fetchall()
+    return {symbol: (first, last) for symbol, first, last in rows}
+
+@_writes('price_history')
+def save_price_history(df):
+    """Insert or replace daily closes.
+    
+    Parameters
+    ----------
+    df: pandas.DataFrame
+        Columns: symbol, date (YYYY-MM-DD), close.
+    """
+    if df.empty:
+        return
+    rows = df[['symbol', 'date', 'close']].itertuples(index=False, name=None)
+    with get_connection() as conn:
+        conn.executemany("INSERT OR REPLACE INTO price_history (symbol, date, close) VALUES (?, ?, ?)", rows)
         conn.commit()
-        return True
-    except sqlite3.IntegrityError:
-        return False
-    finally:
-        conn.close()
 
+@_writes('quotes')
+def save_quotes(prices, fetched_at):
+    """Insert or replace quotes.
+    
+    Parameters
+    ----------
+    prices: dict
+        symbol -> price
+    fetched_at: float
+        Unix timestamp of the fetch.
+    """
+    with get_connection() as conn:
+        conn.executemany(
+            "INSERT OR REPLACE INTO quotes (symbol, price, fetched_at) VALUES (?, ?, ?)",
+            [(symbol, float(price), fetched_at) for symbol, price in prices.items()]
+        )
+        conn.commit()
+
+@_writes('accounts')
+def add_account(name, type, initial_balance):
+    with get_connection() as conn:
+        c = conn.cursor()
+        try:
+            c.execute("INSERT INTO accounts (name, type, initial_balance) VALUES (?, ?, ?)", (name, type, initial_balance))
+            conn.commit()
+            return True
+        except sqlite3.IntegrityError:
+            conn.rollback()
+            return False
+
+@_cached('accounts')
 def get_accounts():
     if USE_GOOGLE_SHEETS:
-        return sheets.get_accounts_sheet()
+        return _read_tab('accounts')
     
     # Fallback to SQLite
-    conn = get_connection()
-    df = pd.read_sql_query("SELECT * FROM accounts", conn)
-    conn.close()
-    return df
+    with get_connection() as conn:
+        return pd.read_sql_query("SELECT * FROM accounts", conn)
+
+def account_in_use(account_id):
+    """Whether any transaction belongs to the account (one index probe)."""
+    with get_connection() as conn:
+        return bool(conn.execute("SELECT EXISTS (SELECT 1 FROM transactions WHERE account_id = ?)",
+                                 (int(account_id),)).fetchone()[0])
 
+@_writes('accounts')
 def delete_account(account_id):
-    conn = get_connection()
-    c = conn.cursor()
-    c.execute("DELETE FROM accounts WHERE id = ?", (account_id,))
-    conn.commit()
-    conn.close()
+    """Delete an account that no transaction uses.
+
+    Returns
+    -------
+    bool
+        True if deleted, False if transactions still belong to it (move
+        them first with reassign_account or merge_accounts).
+    """
+    with get_connection() as conn:
+        c = conn.cursor()
+        try:
+            c.execute("DELETE FROM accounts WHERE id = ?", (int(account_id),))
+        except sqlite3.IntegrityError:
+            # The transactions.account_id foreign key refused the delete
+            conn.rollback()
+            return False
+        c.execute("DELETE FROM account_balances WHERE account_id = ?", (int(account_id),))
+        conn.commit()
+        return True
 
+@_writes('accounts', 'transactions')
+def rename_account(account_id, name):
+    """Rename an account, along with the payment method stored on its transactions.
+
+    Returns
+    -------
+    bool
+        True if renamed, False if another account already has ``name``.
+    """
+    with get_connection() as conn:
+        c = conn.cursor()
+        try:
+            c.execute("UPDATE accounts SET name = ? WHERE id = ?", (name, int(account_id)))
+        except sqlite3.IntegrityError:
+            conn.rollback()
+            return False
+        c.execute("UPDATE transactions SET payment_method = ? WHERE account_id = ?", (name, int(account_id)))
+        conn.commit()
+        return True
+
+def _reassign_account(c, source_id, target_id):
+    # The account is part of the duplicate key, so the keys move with it
+    c.execute("""
+        UPDATE transactions
+        SET account_id = :target,
+            payment_method = (SELECT name FROM accounts WHERE id = :target),
+            dedupe_key = transaction_key(date, amount_cents / 100.0, :target, description)
+        WHERE account_id = :source
+    """, {'source': int(source_id), 'target': int(target_id)})
+    return c.rowcount
+
+@_writes('accounts', 'transactions')
+def reassign_account(source_id, target_id):
+    """Move every transaction of one account to another in a single statement.
+
+    Parameters
+    ----------
+    source_id: int
+        Account the transactions are taken from.
+    target_id: int
+        Account they are moved to.
+
+    Returns
+    -------
+    int
+        Number of transactions moved.
+    """
+    with get_connection() as conn:
+        moved = _reassign_account(conn.cursor(), source_id, target_id)
+        conn.commit()
+        return moved
+
+@_writes('accounts', 'transactions')
+def merge_accounts(source_id, target_id):
+    """Fold one account into another and delete it.
+
+    The transactions move to the target and the target's initial balance
+    absorbs the source's, so the combined balance is unchanged.
+
+    Returns
+    -------
+    int
+        Number of transactions moved.
+    """
+    if int(source_id) == int(target_id):
+        return 0
+    with get_connection() as conn:
+        c = conn.cursor()
+        moved = _reassign_account(c, source_id, target_id)
+        c.execute("""UPDATE accounts
+                     SET initial_balance = COALESCE(initial_balance, 0) + (SELECT COALESCE(initial_balance, 0) FROM accounts WHERE id = :source)
+                     WHERE id = :target""", {'source': int(source_id), 'target': int(target_id)})
+        c.execute("DELETE FROM accounts WHERE id = ?", (int(source_id),))
+        c.execute("DELETE FROM account_balances WHERE account_id = ?", (int(source_id),))
+        conn.commit()
+        return moved
+
+@_cached('accounts', 'transactions')
 def get_account_balances():
     if USE_GOOGLE_SHEETS:
         # Get accounts from Google Sheets
-        accounts_df = sheets.get_accounts_sheet()
+        accounts_df = _read_tab('accounts')
         
         if accounts_df.empty:
             return pd.DataFrame(columns=['name', 'type', 'initial_balance', 'balance'])
         
         # Get transactions from Google Sheets
-        df_tx = sheets.get_transactions_sheet()
+        df_tx = _read_tab('transactions')
         
         # Calculate balances
         balances = []
@@ -305,42 +1855,131 @@ def get_account_balances():
         return accounts_df
     
     # Fallback to SQLite
-    conn = get_connection()
-    
-    # Get accounts
-    accounts_df = pd.read_sql_query("SELECT * FROM accounts", conn)
-    
-    # Get transactions grouped by account
+    # Balances come from the trigger-maintained account_balances table
     query = """
-        SELECT account_id, type, SUM(amount) as total
-        FROM transactions 
-        WHERE account_id IS NOT NULL
-        GROUP BY account_id, type
+        SELECT a.*,
+               a.initial_balance + (COALESCE(b.income_cents, 0) - COALESCE(b.expense_cents, 0)) / 100.0 AS balance
+        FROM accounts a
+        LEFT JOIN account_balances b ON b.account_id = a.id
     """
-    tx_df = pd.read_sql_query(query, conn)
-    
-    conn.close()
+    with get_connection() as conn:
+        accounts_df = pd.read_sql_query(query, conn)
     
     if accounts_df.empty:
         return pd.DataFrame(columns=['name', 'type', 'initial_balance', 'balance'])
-        
-    balances = []
-    for _, account in accounts_df.iterrows():
-        balance = account['initial_balance']
-        
-        if not tx_df.empty:
-            # Add income
-            income = tx_df[(tx_df['account_id'] == account['id']) & (tx_df['type'] == 'Income')]['total'].sum()
-            # Subtract expenses
-            expenses = tx_df[(tx_df['account_id'] == account['id']) & (tx_df['type'] == 'Expense')]['total'].sum()
-            
-            balance += (income - expenses)
-            
-        balances.append(balance)
-        
-    accounts_df['balance'] = balances
+    
     return accounts_df
 
+CREDIT_CARD_TYPE = 'Credit Card'
+
+@_cached('transactions', 'accounts')
+def get_card_usage(start_date=None, end_date=None):
+    """Expense totals per credit-card account.
+
+    Cards are the accounts whose type is 'Credit Card'. Only their own
+    expenses are read, through the (account_id, type, amount_cents) index,
+    so the cost does not grow with the rest of the history.
+
+    Parameters
+    ----------
+    start_date: datetime.date or str, optional
+        Inclusive lower bound (YYYY-MM-DD).
+    end_date: datetime.date or str, optional
+        Exclusive upper bound (YYYY-MM-DD).
+
+    Returns
+    -------
+    pandas.DataFrame
+        Columns: account_id, account_name, total, count; one row per card
+        (including unused ones), largest total first.
+    """
+    columns = ['account_id', 'account_name', 'total', 'count']
+    if USE_GOOGLE_SHEETS:
+        accounts_df = _read_tab('accounts')
+        if accounts_df.empty or 'type' not in accounts_df.columns:
+            return pd.DataFrame(columns=columns)
+        cards = accounts_df[accounts_df['type'] == CREDIT_CARD_TYPE]
+        df = _read_tab('transactions')
+        if not df.empty:
+            df = _filter_transactions_frame(df, type='Expense', start_date=start_date, end_date=end_date)
+        totals = (df.groupby('account_id')['amount'].agg(['sum', 'count'])
+                  if not df.empty and 'account_id' in df.columns else pd.DataFrame(columns=['sum', 'count']))
+        usage = pd.DataFrame({
+            'account_id': cards['id'].to_numpy(),
+            'account_name': cards['name'].to_numpy(),
+            'total': cards['id'].map(totals['sum']).fillna(0).to_numpy(dtype=float),
+            'count': cards['id'].map(totals['count']).fillna(0).to_numpy(dtype=int),
+        })
+        return usage.sort_values(['total', 'account_name'], ascending=[False, True]).reset_index(drop=True)
+
+    # Fallback to SQLite
+    clauses, params = _transaction_filters(start_date=start_date, end_date=end_date)
+    date_filter = ''.join(f" AND {clause}" for clause in clauses)
+    query = f"""
+        SELECT a.id AS account_id, a.name AS account_name,
+               COALESCE(SUM(t.amount_cents), 0) / 100.0 AS total, COUNT(t.id) AS count
+        FROM accounts a
+        LEFT JOIN transactions t ON t.account_id = a.id AND t.type = 'Expense'{date_filter}
+        WHERE a.type = ?
+        GROUP BY a.id
+        ORDER BY total DESC, a.name
+    """
+    with get_connection() as conn:
+        return pd.read_sql_query(query, conn, params=params + [CREDIT_CARD_TYPE])
+
+# Per-account totals recomputed from the raw transactions
+_ACCOUNT_TOTALS_QUERY = """
+    SELECT account_id,
+           SUM(CASE WHEN type = 'Income' THEN amount_cents ELSE 0 END) AS income_cents,
+           SUM(CASE WHEN type = 'Expense' THEN amount_cents ELSE 0 END) AS expense_cents
+    FROM transactions
+    WHERE account_id IS NOT NULL AND type IN ('Income', 'Expense')
+    GROUP BY account_id
+"""
+
+def _rebuild_account_balances(c):
+    c.execute("DELETE FROM account_balances")
+    c.execute(f"INSERT INTO account_balances (account_id, income_cents, expense_cents) {_ACCOUNT_TOTALS_QUERY}")
+
+@_writes('transactions')
+def rebuild_account_balances():
+    """Recompute the account_balances table from the transactions table."""
+    with get_connection() as conn:
+        _rebuild_account_balances(conn.cursor())
+        conn.commit()
+
+def verify_account_balances(tolerance=1e-6):
+    """Compare account_balances against a full recomputation.
+    
+    Parameters
+    ----------
+    tolerance: float
+        Largest absolute difference treated as equal.
+    
+    Returns
+    -------
+    pandas.DataFrame
+        One row per mismatching account with stored and expected totals;
+        empty when the materialized balances are exact.
+    """
+    query = f"""
+        WITH expected AS ({_ACCOUNT_TOTALS_QUERY}),
+        ids AS (SELECT account_id FROM account_balances UNION SELECT account_id FROM expected)
+        SELECT ids.account_id,
+               COALESCE(b.income_cents, 0) / 100.0 AS stored_income,
+               COALESCE(e.income_cents, 0) / 100.0 AS expected_income,
+               COALESCE(b.expense_cents, 0) / 100.0 AS stored_expense,
+               COALESCE(e.expense_cents, 0) / 100.0 AS expected_expense
+        FROM ids
+        LEFT JOIN account_balances b ON b.account_id = ids.account_id
+        LEFT JOIN expected e ON e.account_id = ids.account_id
+        WHERE ABS(COALESCE(b.income_cents, 0) - COALESCE(e.income_cents, 0)) > :tol * 100
+           OR ABS(COALESCE(b.expense_cents, 0) - COALESCE(e.expense_cents, 0)) > :tol * 100
+    """
+    with get_connection() as conn:
+        return pd.read_sql_query(query, conn, params={'tol': tolerance})
+
+@_writes('categories', 'transactions')
 def add_category(name, type):
     """Add a new category to the database.
     
@@ -356,17 +1995,20 @@ def add_category(name, type):
     bool
         True if successful, False if category already exists
     """
-    conn = get_connection()
-    c = conn.cursor()
-    try:
-        c.execute("INSERT INTO categories (name, type) VALUES (?, ?)", (name, type))
+    with get_connection() as conn:
+        c = conn.cursor()
+        try:
+            c.execute("INSERT INTO categories (name, type) VALUES (?, ?)", (name, type))
+        except sqlite3.IntegrityError:
+            conn.rollback()
+            return False
+        # Link transactions recorded under this name before it was a category
+        c.execute("UPDATE transactions SET category_id = ? WHERE category = ? AND category_id IS NULL",
+                  (c.lastrowid, name))
         conn.commit()
         return True
-    except sqlite3.IntegrityError:
-        return False
-    finally:
-        conn.close()
 
+@_cached('categories')
 def get_categories(filter_type=None):
     """Get categories from the database or Google Sheets.
     
@@ -381,7 +2023,7 @@ def get_categories(filter_type=None):
         DataFrame with category data
     """
     if USE_GOOGLE_SHEETS:
-        df = sheets.get_categories_sheet()
+        df = _read_tab('categories')
         if not df.empty and filter_type:
             # Filter by type
             df = df[(df['type'] == filter_type) | (df['type'] == 'Both')]
@@ -390,26 +2032,256 @@ def get_categories(filter_type=None):
         return df
     
     # Fallback to SQLite
-    conn = get_connection()
-    if filter_type:
-        query = "SELECT * FROM categories WHERE type = ? OR type = 'Both' ORDER BY name"
-        df = pd.read_sql_query(query, conn, params=(filter_type,))
-    else:
-        df = pd.read_sql_query("SELECT * FROM categories ORDER BY name", conn)
-    conn.close()
+    with get_connection() as conn:
+        if filter_type:
+            query = "SELECT * FROM categories WHERE type = ? OR type = 'Both' ORDER BY name"
+            df = pd.read_sql_query(query, conn, params=(filter_type,))
+        else:
+            df = pd.read_sql_query("SELECT * FROM categories ORDER BY name", conn)
     return df
 
+@_cached('categories', 'transactions')
+def get_category_usage():
+    """Categories with the number of transactions using each.
+
+    Counts come from the monthly_summary table, whose size depends on the
+    months and categories in use rather than on the number of transactions.
+
+    Returns
+    -------
+    pandas.DataFrame
+        id, name, type and count, ordered by name.
+    """
+    if USE_GOOGLE_SHEETS:
+        df = _read_tab('categories')
+        if df.empty:
+            return df.assign(count=pd.Series(dtype=int))
+        tx = _read_tab('transactions')
+        counts = tx['category'].value_counts() if not tx.empty and 'category' in tx.columns else pd.Series(dtype=int)
+        return (df.assign(count=df['name'].map(counts).fillna(0).astype(int))
+                .sort_values('name').reset_index(drop=True))
+
+    # Fallback to SQLite
+    query = """
+        SELECT c.id, c.name, c.type, COALESCE(SUM(s.count), 0) AS count
+        FROM categories c
+        LEFT JOIN monthly_summary s ON s.category = c.name
+        GROUP BY c.id
+        ORDER BY c.name
+    """
+    with get_connection() as conn:
+        return pd.read_sql_query(query, conn)
+
+def category_in_use(category_id):
+    """Whether any transaction uses the category (one index probe)."""
+    with get_connection() as conn:
+        return bool(conn.execute("SELECT EXISTS (SELECT 1 FROM transactions WHERE category_id = ?)",
+                                 (int(category_id),)).fetchone()[0])
+
+@_writes('categories')
 def delete_category(category_id):
-    """Delete a category from the database.
+    """Delete a category that no transaction uses.
     
     Parameters
     ----------
     category_id: int
         ID of the category to delete
+    
+    Returns
+    -------
+    bool
+        True if deleted, False if transactions still use it (move them
+        first with reassign_category or merge_categories).
     """
-    conn = get_connection()
-    c = conn.cursor()
-    c.execute("DELETE FROM categories WHERE id = ?", (category_id,))
-    conn.commit()
-    conn.close()
+    with get_connection() as conn:
+        c = conn.cursor()
+        try:
+            c.execute("DELETE FROM categories WHERE id = ?", (int(category_id),))
+        except sqlite3.IntegrityError:
+            # The transactions.category_id foreign key refused the delete
+            conn.rollback()
+            return False
+        conn.commit()
+        return True
+
+@_writes('categories', 'transactions')
+def rename_category(category_id, name):
+    """Rename a category, along with the category name stored on its transactions.
+
+    Returns
+    -------
+    bool
+        True if renamed, False if another category already has ``name``.
+    """
+    with get_connection() as conn:
+        c = conn.cursor()
+        try:
+            c.execute("UPDATE categories SET name = ? WHERE id = ?", (name, int(category_id)))
+        except sqlite3.IntegrityError:
+            conn.rollback()
+            return False
+        c.execute("UPDATE transactions SET category = ? WHERE category_id = ?", (name, int(category_id)))
+        conn.commit()
+        return True
+
+def _reassign_category(c, source_id, target_id):
+    # None when the target category doesn't exist (e.g. deleted meanwhile)
+    if c.execute("SELECT 1 FROM categories WHERE id = ?", (int(target_id),)).fetchone() is None:
+        return None
+    c.execute("""
+        UPDATE transactions
+        SET category_id = :target, category = (SELECT name FROM categories WHERE id = :target)
+        WHERE category_id = :source
+    """, {'source': int(source_id), 'target': int(target_id)})
+    return c.rowcount
+
+@_writes('categories', 'transactions')
+def reassign_category(source_id, target_id):
+    """Move every transaction of one category to another in a single statement.
+
+    Parameters
+    ----------
+    source_id: int
+        Category the transactions are taken from.
+    target_id: int
+        Category they are moved to.
+
+    Returns
+    -------
+    int or None
+        Number of transactions moved, or None if ``target_id`` is not a
+        category.
+    """
+    with get_connection() as conn:
+        moved = _reassign_category(conn.cursor(), source_id, target_id)
+        conn.commit()
+        return moved
+
+@_writes('categories', 'transactions')
+def merge_categories(source_id, target_id):
+    """Move every transaction of one category to another and delete the first.
+
+    Returns
+    -------
+    int or None
+        Number of transactions moved, or None (and nothing changed) if
+        ``target_id`` is not a category.
+    """
+    if int(source_id) == int(target_id):
+        return 0
+    with get_connection() as conn:
+        c = conn.cursor()
+        moved = _reassign_category(c, source_id, target_id)
+        if moved is None:
+            return None
+        c.execute("DELETE FROM categories WHERE id = ?", (int(source_id),))
+        conn.commit()
+        return moved
+
+def get_sheet_sync_state(tab):
+    """Sync bookkeeping for a mirrored sheet tab, or None if never synced."""
+    with get_connection() as conn:
+        row = conn.execute(
+            "SELECT content_hash, row_count, checked_at, changed_at FROM sheet_sync_state WHERE tab = ?", (tab,)
+        ).fetchone()
+    if row is None:
+        return None
+    return dict(zip(['content_hash', 'row_count', 'checked_at', 'changed_at'], row))
+
+@_writes('sheet_sync_state')
+def mark_sheet_checked(tab, checked_at):
+    """Record that a tab was checked without re-ingesting it."""
+    with get_connection() as conn:
+        conn.execute("""
+            INSERT INTO sheet_sync_state (tab, checked_at) VALUES (?, ?)
+            ON CONFLICT(tab) DO UPDATE SET checked_at = excluded.checked_at
+        """, (tab, checked_at))
+        conn.commit()
+
+# The sheet_<tab> mirrors themselves are only read in Sheets mode, which
+# bypasses the read cache
+@_writes('sheet_sync_state')
+def save_sheet_mirror(tab, df, content_hash, synced_at):
+    """Replace the local mirror table of a sheet tab.
+
+    The new contents are written to sheet_<tab>_new and swapped in together
+    with the sync state in one transaction, so a failed write leaves the
+    previous mirror and its state in place.
+    
+    Parameters
+    ----------
+    tab: str
+        Tab key (e.g. 'transactions'); stored as table sheet_<tab>.
+    df: pandas.DataFrame
+        Normalized tab contents.
+    content_hash: str
+        Hash of the raw sheet content the frame was parsed from.
+    synced_at: float
+        Unix timestamp of the sync.
+    """
+    table = f"sheet_{tab}"
+    staging = f"{table}_new"
+    with get_connection() as conn:
+        c = conn.cursor()
+        # to_sql commits on its own, so it only ever writes the staging
+        # table; the last good mirror is replaced by the swap below
+        c.execute(f'DROP TABLE IF EXISTS "{staging}"')
+        if len(df.columns):
+            df.to_sql(staging, conn, index=False)
+        try:
+            c.execute("BEGIN IMMEDIATE")
+            c.execute(f'DROP TABLE IF EXISTS "{table}"')
+            if len(df.columns):
+                c.execute(f'ALTER TABLE "{staging}" RENAME TO "{table}"')
+            c.execute("""
+                INSERT INTO sheet_sync_state (tab, content_hash, row_count, checked_at, changed_at)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(tab) DO UPDATE SET
+                    content_hash = excluded.content_hash, row_count = excluded.row_count,
+                    checked_at = excluded.checked_at, changed_at = excluded.changed_at
+            """, (tab, content_hash, len(df), synced_at, synced_at))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+def read_sheet_mirror(tab, date_columns=()):
+    """Read the local mirror of a sheet tab (empty if it was never synced)."""
+    table = f"sheet_{tab}"
+    with get_connection() as conn:
+        exists = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone()
+        if not exists:
+            return pd.DataFrame()
+        df = pd.read_sql_query(f'SELECT * FROM "{table}"', conn)
+    # to_sql stores datetimes as ISO 8601 text
+    for col in date_columns:
+        if col in df.columns:
+            df[col] = pd.to_datetime(df[col], format='ISO8601', errors='coerce')
+    return df
+
+# Time every public call when tracing is on (see modules/tracing.py).
+# Per-row helpers and the connection context manager stay unwrapped.
+tracing.instrument(globals(), 'db', exclude={
+    'get_connection', 'close_connections', 'init_db', 'get_schema_version', 'to_cents', 'transaction_key',
+})
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Ledger database maintenance")
+    parser.add_argument("command", choices=["rebuild-balances", "verify-balances", "rebuild-summary"])
+    args = parser.parse_args()
 
+    if args.command == "rebuild-balances":
+        rebuild_account_balances()
+        print("account_balances rebuilt.")
+    elif args.command == "verify-balances":
+        mismatches = verify_account_balances()
+        if mismatches.empty:
+            print("account_balances OK.")
+        else:
+            print(mismatches.to_string(index=False))
+            raise SystemExit(1)
+    elif args.command == "rebuild-summary":
+        rebuild_monthly_summary()
+        print("monthly_summary rebuilt.")
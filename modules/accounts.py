@@ -1,7 +1,7 @@
 import streamlit as st
 import database as db
 import pandas as pd
-from .utils import format_currency
+from .utils import format_currencies
 
 def view():
     st.header("帳戶管理")
@@ -30,27 +30,12 @@ def view():
     # View Accounts
     st.subheader("您的帳戶")
     
-    # Calculate current balances
-    accounts_df = db.get_accounts()
-    transactions_df = db.get_all_transactions()
-    
+    # Current balances (initial balance + income - expenses per account)
+    accounts_df = db.get_account_balances()
+
     if not accounts_df.empty:
-        balances = []
-        for _, account in accounts_df.iterrows():
-            # Initial balance
-            balance = account['initial_balance']
-            
-            # Add income, subtract expenses linked to this account
-            if not transactions_df.empty:
-                account_txs = transactions_df[transactions_df['account_id'] == account['id']]
-                income = account_txs[account_txs['type'] == 'Income']['amount'].sum()
-                expenses = account_txs[account_txs['type'] == 'Expense']['amount'].sum()
-                balance += (income - expenses)
-            
-            balances.append(balance)
-        
-        accounts_df['Current Balance'] = balances
-        
+        accounts_df['Current Balance'] = accounts_df['balance']
+
         # Translate account types for display
         type_map = {"Bank": "銀行", "Credit Card": "信用卡", "Cash": "現金", "Investment": "投資", "Other": "其他"}
         accounts_df['type'] = accounts_df['type'].map(type_map)
@@ -60,18 +45,50 @@ def view():
         display_df.columns = ['帳戶名稱', '類型', '初始餘額', '目前餘額']
         
         # Format currency columns
-        display_df['初始餘額'] = display_df['初始餘額'].apply(format_currency)
-        display_df['目前餘額'] = display_df['目前餘額'].apply(format_currency)
+        display_df[['初始餘額', '目前餘額']] = format_currencies(display_df[['初始餘額', '目前餘額']], na_rep="0")
         
         st.dataframe(display_df, use_container_width=True)
         
+        account_names = accounts_df['name'].tolist()
+        account_map = dict(zip(accounts_df['name'], accounts_df['id']))
+        
+        # Rename Account
+        with st.expander("重新命名帳戶"):
+            rename_from = st.selectbox("選擇帳戶", account_names, key="rename_account_from")
+            rename_to = st.text_input("新名稱", key="rename_account_to")
+            if st.button("重新命名", key="rename_account_btn"):
+                if not rename_to:
+                    st.error("請輸入帳戶名稱。")
+                elif db.rename_account(account_map[rename_from], rename_to):
+                    st.success(f"帳戶 '{rename_from}' 已更名為 '{rename_to}'。")
+                    st.rerun()
+                else:
+                    st.error("帳戶名稱已存在。")
+        
+        # Merge Accounts
+        with st.expander("合併帳戶"):
+            mcol1, mcol2 = st.columns(2)
+            merge_from = mcol1.selectbox("將此帳戶的交易", account_names, key="merge_account_from")
+            merge_to = mcol2.selectbox("移至帳戶", account_names, key="merge_account_to")
+            st.caption("原帳戶的初始餘額會併入目標帳戶，之後刪除原帳戶。")
+            if st.button("合併並刪除原帳戶", key="merge_account_btn"):
+                if merge_from == merge_to:
+                    st.error("請選擇兩個不同的帳戶。")
+                else:
+                    moved = db.merge_accounts(account_map[merge_from], account_map[merge_to])
+                    st.success(f"已將 {moved} 筆交易移至 '{merge_to}'，並刪除帳戶 '{merge_from}'。")
+                    st.rerun()
+        
         # Delete Account
         with st.expander("刪除帳戶"):
-            account_to_delete = st.selectbox("選擇要刪除的帳戶", accounts_df['name'])
+            account_to_delete = st.selectbox("選擇要刪除的帳戶", account_names)
             if st.button("刪除選取的帳戶"):
-                account_id = accounts_df[accounts_df['name'] == account_to_delete]['id'].values[0]
-                db.delete_account(account_id)
-                st.success(f"帳戶 '{account_to_delete}' 已刪除。")
-                st.rerun()
+                account_id = account_map[account_to_delete]
+                # The usage check is an index lookup on transactions.account_id
+                if db.account_in_use(account_id) or not db.delete_account(account_id):
+                    st.error(f"無法刪除帳戶 '{account_to_delete}'，因為它仍有交易記錄。請先合併至其他帳戶。")
+                else:
+                    st.success(f"帳戶 '{account_to_delete}' 已刪除。")
+                    st.rerun()
     else:
         st.info("找不到帳戶。請在上方新增一個。")
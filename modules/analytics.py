@@ -0,0 +1,205 @@
+"""
+Parquet/DuckDB analytics engine for the heavy reports.
+
+The ledger's transactions are exported to Parquet next to the database
+file, one partition per year (``money.db.parquet/year=2025/data.parquet``),
+and report queries run on them through an embedded DuckDB connection,
+which scans the files on all cores and only materializes the aggregates.
+
+The export is incremental: triggers count writes per year in the
+``transaction_years`` table and a partition is rewritten only when its
+year's count moved since it was written. The check runs before each
+report query that isn't already cached, so writes show up on the next
+read.
+
+Used by ``database.get_daily_totals`` and ``database.get_category_totals``
+when both duckdb and pyarrow are installed; otherwise those fall back to
+SQLite (or pandas in Google Sheets mode).
+"""
+import importlib.util
+import json
+import os
+import shutil
+import threading
+from pathlib import Path
+
+import pandas as pd
+
+from modules import tracing
+
+DUCKDB_AVAILABLE = importlib.util.find_spec('duckdb') is not None
+PYARROW_AVAILABLE = importlib.util.find_spec('pyarrow') is not None
+AVAILABLE = DUCKDB_AVAILABLE and PYARROW_AVAILABLE
+
+# Rows fetched from SQLite per Parquet record batch while exporting
+EXPORT_BATCH_ROWS = 100_000
+
+_export_lock = threading.Lock()
+_duckdb = None
+_duckdb_lock = threading.Lock()
+
+def parquet_dir(db_file=None):
+    """Directory holding the Parquet export of ``db_file`` (default: database.DB_FILE)."""
+    import database as db
+
+    return Path(f"{db_file or db.DB_FILE}.parquet")
+
+def _schema():
+    import pyarrow as pa
+
+    return pa.schema([
+        ('date', pa.date32()),
+        ('type', pa.dictionary(pa.int32(), pa.string())),
+        ('category', pa.dictionary(pa.int32(), pa.string())),
+        ('amount_cents', pa.int64()),
+        ('account_id', pa.int64()),
+    ])
+
+def _read_manifest(directory):
+    try:
+        return json.loads((directory / 'manifest.json').read_text())
+    except (OSError, ValueError):
+        return {}
+
+def _write_manifest(directory, manifest):
+    tmp = directory / f"manifest.json.{os.getpid()}.tmp"
+    tmp.write_text(json.dumps(manifest, sort_keys=True))
+    os.replace(tmp, directory / 'manifest.json')
+
+def _export_year(conn, year, directory):
+    """Write one year of transactions to its partition, batch by batch."""
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+
+    partition = directory / f"year={year}"
+    partition.mkdir(parents=True, exist_ok=True)
+    tmp = partition / f"data.parquet.{os.getpid()}.tmp"
+    schema = _schema()
+    cursor = conn.execute(
+        "SELECT substr(date, 1, 10), type, category, amount_cents, account_id FROM transactions WHERE date >= ? AND date < ?",
+        (f"{year}-01-01", f"{int(year) + 1}-01-01"))
+    with pq.ParquetWriter(tmp, schema, compression='zstd') as writer:
+        while True:
+            rows = cursor.fetchmany(EXPORT_BATCH_ROWS)
+            if not rows:
+                break
+            dates, types, categories, cents, accounts = zip(*rows)
+            writer.write_batch(pa.record_batch([
+                pc.cast(pc.strptime(pa.array(dates, pa.string()), format='%Y-%m-%d', unit='s', error_is_null=True),
+                        pa.date32()),
+                pa.array(types, pa.string()).dictionary_encode(),
+                pa.array(categories, pa.string()).dictionary_encode(),
+                pa.array(cents, pa.int64()),
+                pa.array(accounts, pa.int64()),
+            ], schema=schema))
+    os.replace(tmp, partition / 'data.parquet')
+
+@tracing.traced('analytics.refresh')
+def refresh(force=False):
+    """
+    Bring the Parquet export up to date with the database.
+
+    Parameters
+    ----------
+    force: bool
+        Rewrite every year, not only the ones written since the last export.
+
+    Returns
+    -------
+    list of str
+        Years whose partitions were rewritten or removed.
+    """
+    import database as db
+
+    directory = parquet_dir()
+    with _export_lock:
+        with db.get_connection() as conn:
+            versions = dict(conn.execute(
+                "SELECT year, version FROM transaction_years WHERE year GLOB '[0-9][0-9][0-9][0-9]'").fetchall())
+            manifest = _read_manifest(directory)
+            if force:
+                manifest = dict.fromkeys(manifest)
+            stale = sorted(year for year, version in versions.items() if manifest.get(year) != version)
+            removed = sorted(set(manifest) - set(versions))
+            if not stale and not removed:
+                return []
+
+            directory.mkdir(parents=True, exist_ok=True)
+            for year in stale:
+                _export_year(conn, year, directory)
+                manifest[year] = versions[year]
+                _write_manifest(directory, manifest)
+        for year in removed:
+            shutil.rmtree(directory / f"year={year}", ignore_errors=True)
+            manifest.pop(year, None)
+        _write_manifest(directory, manifest)
+    return stale + removed
+
+def _connection():
+    # One in-process DuckDB database; each query gets its own cursor so
+    # concurrent Streamlit sessions don't share a connection
+    global _duckdb
+    with _duckdb_lock:
+        if _duckdb is None:
+            import duckdb
+
+            _duckdb = duckdb.connect()
+        return _duckdb.cursor()
+
+def _query(sql, filters, params):
+    """Run ``sql`` over the refreshed export; ``{source}`` and ``{where}`` are filled in."""
+    refresh()
+    directory = parquet_dir()
+    if not any(directory.glob('year=*/data.parquet')):
+        return None
+    source = f"read_parquet('{(directory / 'year=*' / 'data.parquet').as_posix()}', hive_partitioning = true)"
+    where = f"WHERE {' AND '.join(filters)}" if filters else ''
+    with _connection() as conn:
+        return conn.execute(sql.format(source=source, where=where), params).df()
+
+def _filters(type=None, start_date=None, end_date=None):
+    filters, params = [], []
+    if type is not None:
+        filters.append("type = ?")
+        params.append(type)
+    if start_date is not None:
+        # The year predicate skips whole partitions
+        start = pd.Timestamp(start_date)
+        filters += ["year >= ?", "date >= ?"]
+        params += [start.year, start.date()]
+    if end_date is not None:
+        end = pd.Timestamp(end_date)
+        filters += ["year <= ?", "date < ?"]
+        params += [end.year, end.date()]
+    return filters, params
+
+@tracing.traced('analytics.daily_totals')
+def daily_totals(start_date=None, end_date=None):
+    """Totals per day, type and account; see database.get_daily_totals."""
+    filters, params = _filters(start_date=start_date, end_date=end_date)
+    df = _query("""
+        SELECT CAST(date AS TIMESTAMP) AS date, CAST(type AS VARCHAR) AS type, account_id,
+               SUM(amount_cents) AS amount_cents, COUNT(*) AS count
+        FROM {source} {where}
+        GROUP BY ALL
+    """, filters, params)
+    if df is None:
+        return pd.DataFrame({'date': pd.Series(dtype='datetime64[ns]'), 'type': pd.Series(dtype=str),
+                             'account_id': pd.Series(dtype='Int64'), 'amount_cents': pd.Series(dtype='int64'),
+                             'count': pd.Series(dtype='int64')})
+    return df
+
+@tracing.traced('analytics.category_totals')
+def category_totals(type=None, start_date=None, end_date=None):
+    """Totals per category, largest first; see database.get_category_totals."""
+    filters, params = _filters(type, start_date, end_date)
+    df = _query("""
+        SELECT CAST(category AS VARCHAR) AS category, SUM(amount_cents) / 100.0 AS total, COUNT(*) AS count
+        FROM {source} {where}
+        GROUP BY ALL
+        ORDER BY total DESC
+    """, filters, params)
+    if df is None:
+        return pd.DataFrame(columns=['category', 'total', 'count'])
+    return df
@@ -0,0 +1,121 @@
+"""
+In-process cache for database read functions.
+
+Entries are keyed by function, arguments and a scope (the database file) and
+tagged with the tables they were read from. Every write bumps a generation
+counter for the tables it touched; entries depending on those tables are
+dropped, and a read that raced with a write is never stored. Total size is
+capped with least-recently-used eviction.
+"""
+import sys
+import threading
+from collections import OrderedDict, defaultdict
+from functools import wraps
+
+import pandas as pd
+
+MAX_BYTES = 256 * 1024 * 1024  # 256 MB
+
+_lock = threading.RLock()
+_entries = OrderedDict()  # key -> (value, tables, nbytes)
+_generations = defaultdict(int)
+_total_bytes = 0
+
+def _sizeof(value):
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(index=True, deep=True))
+    return sys.getsizeof(value)
+
+def _copy(value):
+    # Callers routinely add or convert columns on the frames they get back.
+    # A shallow copy is enough: with copy-on-write (always on since pandas 3)
+    # any change to it copies the affected data instead of touching ours.
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return value.copy(deep=False)
+    return value
+
+def _drop(key):
+    global _total_bytes
+    _, _, nbytes = _entries.pop(key)
+    _total_bytes -= nbytes
+
+def generations(tables):
+    """Current generation counters for ``tables``."""
+    with _lock:
+        return tuple(_generations[t] for t in tables)
+
+def invalidate(*tables):
+    """Record a write to ``tables`` and drop every entry that read from them."""
+    with _lock:
+        for table in tables:
+            _generations[table] += 1
+        stale = [key for key, (_, deps, _) in _entries.items() if deps & set(tables)]
+        for key in stale:
+            _drop(key)
+
+def clear():
+    """Drop every entry, e.g. after the database was changed by another process."""
+    global _total_bytes
+    with _lock:
+        for table in list(_generations):
+            _generations[table] += 1
+        _entries.clear()
+        _total_bytes = 0
+
+def stats():
+    """Number of entries and their estimated size in bytes."""
+    with _lock:
+        return {'entries': len(_entries), 'bytes': _total_bytes, 'max_bytes': MAX_BYTES}
+
+def cached(*tables, scope=lambda: None):
+    """Cache a read function's result until one of ``tables`` is written.
+
+    Parameters
+    ----------
+    tables: str
+        Tables the function reads from.
+    scope: callable
+        Returns a hashable namespace for the key, or None to bypass the cache
+        for this call.
+    """
+    deps = frozenset(tables)
+
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            global _total_bytes
+            namespace = scope()
+            if namespace is None:
+                return func(*args, **kwargs)
+
+            key = (namespace, func.__qualname__, args, tuple(sorted(kwargs.items())))
+            try:
+                hash(key)
+            except TypeError:
+                return func(*args, **kwargs)
+
+            with _lock:
+                entry = _entries.get(key)
+                if entry is not None:
+                    _entries.move_to_end(key)
+                    return _copy(entry[0])
+                before = generations(tables)
+
+            value = func(*args, **kwargs)
+
+            nbytes = _sizeof(value)
+            with _lock:
+                # A write landed while we were reading: don't keep the result
+                if generations(tables) == before and nbytes <= MAX_BYTES and key not in _entries:
+                    _entries[key] = (value, deps, nbytes)
+                    _total_bytes += nbytes
+                    while _total_bytes > MAX_BYTES:
+                        _drop(next(iter(_entries)))
+            return _copy(value)
+
+        wrapper.uncached = func
+        return wrapper
+
+    return decorator
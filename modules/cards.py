@@ -1,50 +1,65 @@
 import streamlit as st
 import pandas as pd
 import database as db
-from modules import utils
+from modules import utils, tracing
+
+PAGE_SIZE = 20
 
 def view():
     st.header("信用卡管理")
 
-    # Filter transactions for credit cards
-    # We assume anything not "Cash" or "Bank Transfer" might be a card, or we just look for specific ones.
-    # For this simple app, we'll just show stats for all payment methods that are likely cards.
-    
-    card_methods = [m for m in utils.PAYMENT_METHODS if "Card" in m or m in ["Line Bank", "Richart"]]
-    
-    df = db.get_all_transactions()
-    
-    if not df.empty:
-        # Filter for expenses only
-        expenses = df[df['type'] == 'Expense']
-        
-        # Group by payment method
-        card_usage = expenses[expenses['payment_method'].isin(card_methods)].groupby('payment_method')['amount'].sum().reset_index()
-        
-        st.subheader("信用卡使用摘要")
-        if not card_usage.empty:
-            st.bar_chart(card_usage.set_index('payment_method'))
-            
-            display_df = card_usage.copy()
-            display_df.columns = ['支付方式', '金額']
-            display_df['金額'] = display_df['金額'].apply(utils.format_currency)
-            st.dataframe(display_df, use_container_width=True)
-        else:
-            st.info("找不到信用卡使用記錄。")
-            
-        # Detailed view per card
-        st.subheader("詳細信用卡交易")
-        selected_card = st.selectbox("選擇信用卡", card_methods)
-        
-        card_txs = expenses[expenses['payment_method'] == selected_card]
-        if not card_txs.empty:
-            display_txs = card_txs[['date', 'category', 'amount', 'description']].copy()
-            display_txs.columns = ['日期', '類別', '金額', '備註']
-            display_txs['金額'] = display_txs['金額'].apply(utils.format_currency)
-            st.dataframe(display_txs, use_container_width=True)
-            st.metric(label=f"{selected_card} 總使用金額", value=utils.format_currency(card_txs['amount'].sum()))
-        else:
-            st.info(f"{selected_card} 沒有交易記錄")
-            
+    # Totals per card are summed in SQL; cards are the accounts of type 'Credit Card'
+    card_usage = db.get_card_usage()
+
+    if card_usage.empty:
+        st.info("找不到信用卡帳戶。請在「帳戶」頁面新增類型為信用卡的帳戶。")
+        return
+
+    st.subheader("信用卡使用摘要")
+    used = card_usage[card_usage['count'] > 0]
+    if not used.empty:
+        with tracing.span('chart.card_usage', rows=len(used)):
+            st.bar_chart(used.set_index('account_name')['total'])
+
+        display_df = used[['account_name', 'total', 'count']].copy()
+        display_df.columns = ['信用卡', '金額', '筆數']
+        display_df['金額'] = utils.format_currencies(display_df['金額'], na_rep="0")
+        st.dataframe(display_df, use_container_width=True, hide_index=True)
+    else:
+        st.info("找不到信用卡使用記錄。")
+
+    # Detailed view per card, one page at a time
+    st.subheader("詳細信用卡交易")
+    selected_card = st.selectbox("選擇信用卡", card_usage['account_name'].tolist(), key="card_select")
+    card = card_usage[card_usage['account_name'] == selected_card].iloc[0]
+
+    # Cursors of the pages visited so far; starting over when another card is picked
+    if st.session_state.get('card_page_account') != int(card['account_id']):
+        st.session_state['card_page_account'] = int(card['account_id'])
+        st.session_state['card_page_cursors'] = [None]
+    cursors = st.session_state['card_page_cursors']
+
+    # One extra row tells whether a next page exists
+    page = db.get_transactions_page(cursors[-1], PAGE_SIZE + 1, type='Expense', account_id=int(card['account_id']))
+    has_next = len(page) > PAGE_SIZE
+    card_txs = page.head(PAGE_SIZE)
+
+    if not card_txs.empty:
+        display_txs = card_txs[['date', 'category', 'amount', 'description']].copy()
+        display_txs.columns = ['日期', '類別', '金額', '備註']
+        display_txs['金額'] = utils.format_currencies(display_txs['金額'], na_rep="0")
+        st.dataframe(display_txs, use_container_width=True, hide_index=True)
+
+        pcol1, pcol2, pcol3 = st.columns([1, 1, 4])
+        if pcol1.button("上一頁", disabled=len(cursors) == 1, key="card_prev_page_btn"):
+            cursors.pop()
+            st.rerun()
+        if pcol2.button("下一頁", disabled=not has_next, key="card_next_page_btn"):
+            last = card_txs.iloc[-1]
+            cursors.append((last['date'], int(last['id'])))
+            st.rerun()
+        pcol3.caption(f"第 {len(cursors)} 頁，共 {int(card['count'])} 筆")
+
+        st.metric(label=f"{selected_card} 總使用金額", value=utils.format_currency(card['total']))
     else:
-        st.info("找不到交易記錄。")
+        st.info(f"{selected_card} 沒有交易記錄")
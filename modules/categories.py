@@ -30,16 +30,48 @@ def view():
 
     # View Categories
     st.subheader("現有類別")
-    df = db.get_categories()
+    df = db.get_category_usage()
     
     if not df.empty:
         # Display categories in a nice format
-        display_df = df[['id', 'name', 'type']].copy()
+        display_df = df[['id', 'name', 'type', 'count']].copy()
         type_map = {"Expense": "支出", "Income": "收入", "Both": "兩者皆可"}
         display_df['type'] = display_df['type'].map(type_map)
-        display_df.columns = ['ID', '類別名稱', '類型']
+        display_df.columns = ['ID', '類別名稱', '類型', '交易筆數']
         st.dataframe(display_df, use_container_width=True)
         
+        category_names = df['name'].tolist()
+        category_map = dict(zip(df['name'], df['id']))
+        
+        # Rename Category
+        with st.expander("重新命名類別"):
+            rename_from = st.selectbox("選擇類別", category_names, key="rename_category_from")
+            rename_to = st.text_input("新名稱", key="rename_category_to")
+            if st.button("重新命名", key="rename_category_btn"):
+                if not rename_to:
+                    st.error("請輸入類別名稱。")
+                elif db.rename_category(category_map[rename_from], rename_to):
+                    st.success(f"類別 '{rename_from}' 已更名為 '{rename_to}'。")
+                    st.rerun()
+                else:
+                    st.error(f"類別 '{rename_to}' 已存在。")
+        
+        # Merge Categories
+        with st.expander("合併類別"):
+            mcol1, mcol2 = st.columns(2)
+            merge_from = mcol1.selectbox("將此類別的交易", category_names, key="merge_category_from")
+            merge_to = mcol2.selectbox("移至類別", category_names, key="merge_category_to")
+            if st.button("合併並刪除原類別", key="merge_category_btn"):
+                if merge_from == merge_to:
+                    st.error("請選擇兩個不同的類別。")
+                else:
+                    moved = db.merge_categories(category_map[merge_from], category_map[merge_to])
+                    if moved is None:
+                        st.error(f"找不到類別 '{merge_to}'，可能已被刪除。")
+                    else:
+                        st.success(f"已將 {moved} 筆交易移至 '{merge_to}'，並刪除類別 '{merge_from}'。")
+                        st.rerun()
+        
         # Delete Category
         with st.expander("刪除類別"):
             category_id_to_delete = st.number_input(
@@ -50,22 +82,14 @@ def view():
             )
             
             if st.button("刪除", key="delete_category_btn"):
-                # Check if category is in use
-                transactions_df = db.get_all_transactions()
-                if not transactions_df.empty:
-                    category_to_delete = df[df['id'] == category_id_to_delete]
-                    if not category_to_delete.empty:
-                        category_name = category_to_delete.iloc[0]['name']
-                        if category_name in transactions_df['category'].values:
-                            st.error(f"無法刪除類別 '{category_name}'，因為它正在交易中使用。")
-                        else:
-                            db.delete_category(category_id_to_delete)
-                            st.success(f"類別 {category_id_to_delete} 已成功刪除！")
-                            st.rerun()
-                    else:
-                        st.error("找不到該類別 ID。")
+                category_to_delete = df[df['id'] == category_id_to_delete]
+                if category_to_delete.empty:
+                    st.error("找不到該類別 ID。")
+                # The usage check is an index lookup on transactions.category_id
+                elif db.category_in_use(category_id_to_delete) or not db.delete_category(category_id_to_delete):
+                    category_name = category_to_delete.iloc[0]['name']
+                    st.error(f"無法刪除類別 '{category_name}'，因為它正在交易中使用。請先合併至其他類別。")
                 else:
-                    db.delete_category(category_id_to_delete)
                     st.success(f"類別 {category_id_to_delete} 已成功刪除！")
                     st.rerun()
     else:
@@ -0,0 +1,229 @@
+"""
+Chart-data layer for the Plotly figures.
+
+Every chart aggregates (and, for long series, downsamples) its data before
+plotting, so the figure sent to the browser stays about the same size
+however long the ledger grows:
+
+- ``pie`` sums the values per name and folds the smallest slices into 「其他」;
+- ``bar`` sums a dated series per day, week, month, quarter or year,
+  whichever keeps it within MAX_BARS bars;
+- ``line`` thins series longer than MAX_POINTS with
+  Largest-Triangle-Three-Buckets, which keeps the peaks and troughs that
+  plain striding would drop.
+
+Built figures are cached by a fingerprint of the input data and the chart
+options, so reruns over unchanged data skip both the aggregation and the
+Plotly Express build. The figure objects themselves are cached rather than
+their JSON: Streamlit re-validates a figure passed as a dict, which costs
+about half a build, while a Figure is serialized as is (and never modified).
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+MAX_POINTS = 400
+MAX_BARS = 120
+MAX_SLICES = 10
+FIGURE_CACHE_SIZE = 64
+
+OTHER_LABEL = '其他'
+
+# (pandas frequency, approximate days per bucket, label), finest first
+BAR_PERIODS = [
+    ('D', 1, '每日'),
+    ('W', 7, '每週'),
+    ('MS', 30.44, '每月'),
+    ('QS', 91.31, '每季'),
+    ('YS', 365.25, '每年'),
+]
+
+_figures = OrderedDict()
+_figures_lock = threading.Lock()
+
+def lttb(x, y, threshold):
+    """
+    Indices of the points kept by Largest-Triangle-Three-Buckets.
+
+    Parameters
+    ----------
+    x, y: array-like
+        The series, sorted by ``x``; datetimes are compared as nanoseconds.
+    threshold: int
+        Number of points to keep, at least 3.
+
+    Returns
+    -------
+    numpy.ndarray
+        Sorted positional indices, first and last point included.
+    """
+    x = np.asarray(x)
+    if np.issubdtype(x.dtype, np.datetime64):
+        x = x.astype('datetime64[ns]').astype(np.int64)
+    x = x.astype(float)
+    y = np.asarray(y, dtype=float)
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    # Interior points split into threshold - 2 buckets; each bucket keeps
+    # the point spanning the largest triangle with the previously kept
+    # point and the average of the next bucket
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int)
+    kept = np.empty(threshold, dtype=int)
+    kept[0], kept[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        next_start = end if end < next_end else n - 1
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(np.argmax(area))
+        kept[i + 1] = a
+    return kept
+
+def _positions(values):
+    """Numeric x positions for LTTB: numbers and datetimes as is, date labels parsed, other labels by row."""
+    if pd.api.types.is_numeric_dtype(values) or pd.api.types.is_datetime64_any_dtype(values):
+        return values.to_numpy()
+    try:
+        parsed = pd.to_datetime(values, errors='coerce', format='mixed')
+    except (ValueError, TypeError):
+        parsed = None
+    if parsed is not None and parsed.notna().all():
+        return parsed.to_numpy()
+    # Labels that aren't dates (e.g. weekly periods '2025-01-06/2025-01-12') keep their order
+    return np.arange(len(values))
+
+def downsample(df, x, y, max_points=MAX_POINTS):
+    """Rows of ``df`` thinned to about ``max_points`` per ``y`` column with LTTB; ``x`` keeps its labels."""
+    if len(df) <= max_points:
+        return df
+    positions = _positions(df[x])
+    order = np.argsort(positions, kind='stable')
+    df, positions = df.iloc[order], positions[order]
+    columns = [y] if isinstance(y, str) else list(y)
+    kept = np.unique(np.concatenate([lttb(positions, df[column].fillna(0), max_points) for column in columns]))
+    return df.iloc[kept]
+
+def bar_period(start, end, max_bars=MAX_BARS):
+    """The finest (frequency, label) of BAR_PERIODS that fits ``start``–``end`` in ``max_bars`` bars."""
+    days = (pd.Timestamp(end) - pd.Timestamp(start)).days + 1
+    for freq, bucket_days, label in BAR_PERIODS:
+        if days / bucket_days + 1 <= max_bars:
+            return freq, label
+    return BAR_PERIODS[-1][0], BAR_PERIODS[-1][2]
+
+def resample(df, x, y, max_bars=MAX_BARS):
+    """
+    Sum ``y`` per bucket of the dated column ``x``, bucketed by ``bar_period``.
+
+    Returns
+    -------
+    tuple of (pandas.DataFrame, str)
+        The bucketed frame and the period label (每日, 每週, ...).
+    """
+    columns = [y] if isinstance(y, str) else list(y)
+    dates = pd.to_datetime(df[x])
+    if dates.empty:
+        return df[[x] + columns], BAR_PERIODS[0][2]
+    freq, label = bar_period(dates.min(), dates.max(), max_bars)
+    totals = df[columns].groupby(dates.dt.to_period(freq.rstrip('S')).dt.start_time).sum()
+    return totals.rename_axis(x).reset_index(), label
+
+def fingerprint(df, *options):
+    """Digest of ``df``'s columns, index and values plus ``options``."""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(repr((list(df.columns), options)).encode())
+    if len(df):
+        digest.update(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+    return digest.hexdigest()
+
+def _cached_figure(kind, df, options, build):
+    key = (kind, fingerprint(df, sorted(options.items(), key=lambda item: item[0])))
+    with _figures_lock:
+        fig = _figures.get(key)
+        if fig is not None:
+            _figures.move_to_end(key)
+            return fig
+
+    fig = build()
+    with _figures_lock:
+        _figures[key] = fig
+        while len(_figures) > FIGURE_CACHE_SIZE:
+            _figures.popitem(last=False)
+    return fig
+
+def clear():
+    """Drop all cached figures."""
+    with _figures_lock:
+        _figures.clear()
+
+def _styled(fig, layout, traces):
+    if layout:
+        fig.update_layout(**layout)
+    if traces:
+        fig.update_traces(**traces)
+    return fig
+
+def pie(df, values, names, title=None, max_slices=MAX_SLICES, layout=None, traces=None, **px_options):
+    """
+    Pie of ``values`` summed per ``names``.
+
+    Non-positive totals are dropped and everything past the ``max_slices``
+    largest slices is folded into one 「其他」 slice.
+    """
+    import plotly.express as px
+
+    def build():
+        totals = df.groupby(names, sort=False)[values].sum()
+        totals = totals[totals > 0].sort_values(ascending=False)
+        if len(totals) > max_slices:
+            rest = totals.iloc[max_slices - 1:].sum()
+            totals = pd.concat([totals.iloc[:max_slices - 1], pd.Series({OTHER_LABEL: rest})])
+        data = totals.rename_axis(names).reset_index(name=values)
+        return _styled(px.pie(data, values=values, names=names, title=title, **px_options), layout, traces)
+
+    options = dict(title=title, max_slices=max_slices, layout=layout, traces=traces, **px_options)
+    return _cached_figure('pie', df[[names, values]], options, build)
+
+def bar(df, x, y, title=None, max_bars=MAX_BARS, layout=None, traces=None, **px_options):
+    """
+    Bars of ``y`` summed per ``x``.
+
+    A datetime ``x`` is bucketed by ``resample`` so at most ``max_bars`` bars
+    are drawn; ``{period}`` in ``title`` is replaced with the bucket's label
+    (每日, 每週, ...).
+    """
+    import plotly.express as px
+
+    columns = [y] if isinstance(y, str) else list(y)
+
+    def build():
+        if pd.api.types.is_datetime64_any_dtype(df[x]):
+            data, period = resample(df, x, columns, max_bars)
+        else:
+            data, period = df.groupby(x, sort=False)[columns].sum().reset_index(), ''
+        fig = px.bar(data, x=x, y=y, title=title.format(period=period) if title else title, **px_options)
+        return _styled(fig, layout, traces)
+
+    options = dict(title=title, max_bars=max_bars, layout=layout, traces=traces, **px_options)
+    return _cached_figure('bar', df[[x] + columns], options, build)
+
+def line(df, x, y, title=None, max_points=MAX_POINTS, layout=None, traces=None, **px_options):
+    """Lines of ``y`` against ``x``, thinned by ``downsample`` past ``max_points`` points."""
+    import plotly.express as px
+
+    columns = [y] if isinstance(y, str) else list(y)
+
+    def build():
+        data = downsample(df[[x] + columns], x, y, max_points)
+        return _styled(px.line(data, x=x, y=y, title=title, **px_options), layout, traces)
+
+    options = dict(title=title, max_points=max_points, layout=layout, traces=traces, **px_options)
+    return _cached_figure('line', df[[x] + columns], options, build)
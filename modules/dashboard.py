@@ -1,9 +1,12 @@
 import streamlit as st
 import pandas as pd
-import plotly.express as px
+import numpy as np
 from datetime import date
 import database as db
-from modules import utils, stocks
+from modules import utils, tracing, charts, jobs
+
+# How long a first visit waits for the asset trend before showing its progress
+ASSET_TREND_WAIT_SECONDS = 1.0
 
 def categorize_account(account_name, account_type):
     """Categorize account into 活存, 定存, or 美金"""
@@ -29,69 +32,123 @@ def categorize_stock(symbol):
         return '台股'
     return '美股'
 
-def calculate_monthly_assets(df_tx, accounts_df, df_stocks, end_date=None):
-    """Calculate total assets for each month up to end_date"""
+def _asof_cumsum(event_dates, values, cutoffs):
+    """Running total of ``values`` over events dated on or before each cutoff."""
+    event_dates = np.asarray(event_dates, dtype='datetime64[ns]')
+    cutoffs = np.asarray(cutoffs, dtype='datetime64[ns]')
+    order = np.argsort(event_dates, kind='stable')
+    sorted_dates = event_dates[order]
+    running = np.concatenate(([0.0], np.cumsum(values[order])))
+    return running[np.searchsorted(sorted_dates, cutoffs, side='right')]
+
+def _closes_asof(price_history, symbols, cutoffs):
+    """Last known close on or before each cutoff, as a (cutoff x symbol) array (NaN if none)."""
+    cutoffs = np.asarray(cutoffs, dtype='datetime64[ns]')
+    history = price_history[price_history['symbol'].isin(symbols)].assign(
+        date=pd.to_datetime(price_history['date']).astype('datetime64[ns]')
+    ).sort_values('date')
+    grid = pd.DataFrame({
+        'cutoff': np.tile(cutoffs, len(symbols)),
+        'symbol': np.repeat(np.asarray(symbols, dtype=object), len(cutoffs)),
+    }).sort_values('cutoff', kind='stable')
+    closes = pd.merge_asof(grid, history[['date', 'symbol', 'close']], left_on='cutoff',
+                           right_on='date', by='symbol', direction='backward')
+    return (closes.pivot_table(index='cutoff', columns='symbol', values='close', dropna=False)
+                  .reindex(index=cutoffs, columns=symbols).to_numpy(dtype=float))
+
+def latest_stock_values(df_stocks, price_history):
+    """Market value per lot at the latest stored close, falling back to cost."""
+    cost = df_stocks['buy_price'] * df_stocks['quantity']
+    if price_history is None or price_history.empty:
+        return cost
+    latest = price_history.sort_values('date').groupby('symbol')['close'].last()
+    return (df_stocks['symbol'].map(latest) * df_stocks['quantity']).fillna(cost)
+
+def calculate_monthly_assets(df_tx, accounts_df, df_stocks, end_date=None, freq='M', price_history=None):
+    """Calculate total assets at the end of each period up to end_date.
+    
+    Parameters
+    ----------
+    df_tx: pandas.DataFrame
+        Transactions with date, type, account_id and either amount_cents
+        (as from database.load_transactions) or amount columns. Rows may
+        be pre-aggregated per day, type and account (database.get_daily_totals).
+    accounts_df: pandas.DataFrame
+        Accounts with id and initial_balance columns.
+    df_stocks: pandas.DataFrame
+        Stock lots with buy_date, buy_price and quantity columns.
+    end_date: datetime.date, optional
+        Period that is always included (defaults to today).
+    freq: str
+        Period granularity: 'M' (monthly), 'W' (weekly) or 'D' (daily).
+    price_history: pandas.DataFrame, optional
+        Daily closes (symbol, date, close). Holdings are valued at the last
+        close on or before each period end; without a known close (or
+        without price_history) they are valued at cost.
+    
+    Returns
+    -------
+    pandas.DataFrame
+        Columns 'month' (period label) and 'total_assets', one row per
+        period that has transactions plus the period containing end_date.
+    """
     if end_date is None:
         end_date = date.today()
     
-    monthly_assets = []
-    
-    # Work with a copy to avoid modifying original
+    # Periods that have transactions, plus the current one
     if not df_tx.empty:
-        df_tx_copy = df_tx.copy()
+        tx_dates = pd.to_datetime(df_tx['date'])
+        periods = tx_dates.dt.to_period(freq).dropna().unique()
     else:
-        df_tx_copy = pd.DataFrame()
+        tx_dates = pd.Series(dtype='datetime64[ns]')
+        periods = []
     
-    # Get all unique months from transactions
-    if not df_tx_copy.empty:
-        # Ensure date is datetime
-        if not pd.api.types.is_datetime64_any_dtype(df_tx_copy['date']):
-            df_tx_copy['date'] = pd.to_datetime(df_tx_copy['date'])
-        months = df_tx_copy['date'].dt.to_period('M').unique()
-    else:
-        months = []
-    
-    # Add current month if not in list
-    current_month = pd.Period(end_date.strftime("%Y-%m"), freq='M')
-    if current_month not in months:
-        months = list(months) + [current_month]
+    current_period = pd.Period(end_date, freq=freq)
+    periods = pd.PeriodIndex(sorted(set(periods) | {current_period}), freq=freq)
     
-    months = sorted(months)
+    # Each period is valued as of midnight on its last day
+    cutoffs = periods.end_time.normalize().values
     
-    for month in months:
-        month_str = str(month)
-        month_end = month.to_timestamp() + pd.offsets.MonthEnd(0)
+    # Liquid assets: initial balances plus the signed running total of
+    # income/expenses booked to known accounts
+    liquid = np.zeros(len(periods))
+    if not accounts_df.empty:
+        liquid += accounts_df['initial_balance'].sum()
         
-        # Calculate account balances up to this month
-        month_liquid = 0
-        if not accounts_df.empty:
-            for _, account in accounts_df.iterrows():
-                balance = account['initial_balance']
-                
-                if not df_tx_copy.empty:
-                    # Filter transactions up to this month
-                    month_tx = df_tx_copy[df_tx_copy['date'] <= month_end]
-                    account_txs = month_tx[month_tx['account_id'] == account['id']]
-                    income = account_txs[account_txs['type'] == 'Income']['amount'].sum()
-                    expenses = account_txs[account_txs['type'] == 'Expense']['amount'].sum()
-                    balance += (income - expenses)
-                
-                month_liquid += balance
-        
-        # Calculate stock value (using buy price * quantity for simplicity)
-        month_stock = 0
-        if not df_stocks.empty:
-            df_stocks_copy = df_stocks.copy()
-            df_stocks_copy['buy_date'] = pd.to_datetime(df_stocks_copy['buy_date'])
-            month_stock_df = df_stocks_copy[df_stocks_copy['buy_date'] <= month_end]
-            month_stock = (month_stock_df['buy_price'] * month_stock_df['quantity']).sum()
+        if not df_tx.empty:
+            sign = np.select([df_tx['type'] == 'Income', df_tx['type'] == 'Expense'], [1.0, -1.0], 0.0)
+            known = df_tx['account_id'].isin(accounts_df['id']).to_numpy() & tx_dates.notna().to_numpy()
+            if 'amount_cents' in df_tx.columns:
+                # Whole cents are exact in float64, so the running totals are too
+                cents = df_tx['amount_cents'].to_numpy(dtype=float)
+            else:
+                cents = (pd.to_numeric(df_tx['amount'], errors='coerce').fillna(0).to_numpy(dtype=float) * 100).round()
+            liquid += _asof_cumsum(tx_dates.to_numpy()[known], cents[known] * sign[known], cutoffs) / 100
+    
+    # Stock value: market value where a close is known, otherwise cost
+    stock = np.zeros(len(periods))
+    if not df_stocks.empty:
+        buy_dates = pd.to_datetime(df_stocks['buy_date'])
+        valid = buy_dates.notna().to_numpy()
+        cost = (df_stocks['buy_price'] * df_stocks['quantity']).fillna(0).to_numpy(dtype=float)
         
-        monthly_assets.append({
-            'month': month_str,
-            'total_assets': month_liquid + month_stock
-        })
+        if price_history is None or price_history.empty:
+            stock += _asof_cumsum(buy_dates.to_numpy()[valid], cost[valid], cutoffs)
+        else:
+            lot_symbols = df_stocks['symbol'].to_numpy()
+            quantity = df_stocks['quantity'].fillna(0).to_numpy(dtype=float)
+            symbols = list(pd.unique(lot_symbols[valid]))
+            closes = _closes_asof(price_history, symbols, cutoffs)
+            for i, symbol in enumerate(symbols):
+                lots = valid & (lot_symbols == symbol)
+                held = _asof_cumsum(buy_dates.to_numpy()[lots], quantity[lots], cutoffs)
+                held_cost = _asof_cumsum(buy_dates.to_numpy()[lots], cost[lots], cutoffs)
+                stock += np.where(np.isnan(closes[:, i]), held_cost, held * closes[:, i])
     
-    return pd.DataFrame(monthly_assets)
+    return pd.DataFrame({
+        'month': periods.astype(str),
+        'total_assets': liquid + stock
+    })
 
 def view():
     st.header("儀表板")
@@ -101,29 +158,25 @@ def view():
     current_month_str = today.strftime("%Y-%m")
     
     # Fetch Data
-    df_tx = db.get_all_transactions()
+    # Aggregates only: totals per day/type/account and per category, so the
+    # page never holds the raw ledger
+    df_tx = db.get_daily_totals()
     df_stocks = db.get_stocks()
+    month_start = pd.Period(today, freq='M')
+    month_expenses = db.get_category_totals('Expense', month_start.start_time.date(), (month_start + 1).start_time.date())
     
-    # Calculate Totals
-    total_income = 0
-    total_expenses = 0
-    monthly_expenses = 0
-    
-    if not df_tx.empty:
-        # Convert date to datetime
-        df_tx['date'] = pd.to_datetime(df_tx['date'])
-        
-        total_income = df_tx[df_tx['type'] == 'Income']['amount'].sum()
-        total_expenses = df_tx[df_tx['type'] == 'Expense']['amount'].sum()
-        
-        # Monthly Expenses
-        mask = (df_tx['date'].dt.to_period('M') == current_month_str) & (df_tx['type'] == 'Expense')
-        monthly_expenses = df_tx[mask]['amount'].sum()
+    # Monthly Expenses
+    monthly_expenses = month_expenses['total'].sum() if not month_expenses.empty else 0
 
-    # Stock Value
+    # Stock Value (cost, and market value from the local price history)
     stock_value = 0
+    stock_market_value = 0
+    price_history = None
     if not df_stocks.empty:
         stock_value = (df_stocks['buy_price'] * df_stocks['quantity']).sum() 
+        price_history = db.get_price_history(tuple(df_stocks['symbol'].unique()))
+        df_stocks['market_value'] = latest_stock_values(df_stocks, price_history)
+        stock_market_value = df_stocks['market_value'].sum()
     
     # Account Balances (Liquid Assets)
     accounts_df = db.get_account_balances()
@@ -136,7 +189,7 @@ def view():
     
     # Top Metrics
     col1, col2, col3, col4 = st.columns(4)
-    col1.metric("總資產", utils.format_currency(liquid_assets + stock_value))
+    col1.metric("總資產", utils.format_currency(liquid_assets + stock_market_value))
     col2.metric("本月支出", utils.format_currency(monthly_expenses), delta=utils.format_currency(budget - monthly_expenses))
     col3.metric("本月預算", utils.format_currency(budget))
     col4.metric("股票成本", utils.format_currency(stock_value))
@@ -177,8 +230,7 @@ def view():
         if not df_stocks.empty:
             for _, stock in df_stocks.iterrows():
                 category = categorize_stock(stock['symbol'])
-                stock_value_item = stock['buy_price'] * stock['quantity']
-                asset_data[category] += stock_value_item
+                asset_data[category] += stock['market_value']
         
         # Filter out zero values
         asset_data_filtered = {k: v for k, v in asset_data.items() if v > 0}
@@ -188,8 +240,9 @@ def view():
             
             # Total Asset Proportion Pie Chart
             asset_df = pd.DataFrame(list(asset_data_filtered.items()), columns=['類別', '金額'])
-            fig_asset = px.pie(asset_df, values='金額', names='類別', title='總資產比例分布')
-            col1.plotly_chart(fig_asset, use_container_width=True)
+            with tracing.span('chart.asset_allocation', rows=len(asset_df)):
+                fig_asset = charts.pie(asset_df, values='金額', names='類別', title='總資產比例分布')
+                col1.plotly_chart(fig_asset, use_container_width=True)
             
             # Current Deposit Allocation (活存 accounts only)
             if not accounts_df.empty:
@@ -204,8 +257,9 @@ def view():
                 
                 if current_deposit_accounts:
                     deposit_df = pd.DataFrame(current_deposit_accounts)
-                    fig_deposit = px.pie(deposit_df, values='餘額', names='帳戶', title='活存配置圖')
-                    col2.plotly_chart(fig_deposit, use_container_width=True)
+                    with tracing.span('chart.deposit_allocation', rows=len(deposit_df)):
+                        fig_deposit = charts.pie(deposit_df, values='餘額', names='帳戶', title='活存配置圖')
+                        col2.plotly_chart(fig_deposit, use_container_width=True)
                 else:
                     col2.info("目前沒有活存帳戶資料")
             else:
@@ -216,14 +270,28 @@ def view():
     # 2. Monthly Asset Trend Chart
     st.subheader("資產趨勢")
     if not df_tx.empty or not accounts_df.empty or not df_stocks.empty:
-        monthly_assets_df = calculate_monthly_assets(df_tx, accounts_df, df_stocks, today)
-        if not monthly_assets_df.empty:
-            fig_trend = px.line(monthly_assets_df, x='month', y='total_assets', 
-                               title='每月資產趨勢圖', markers=True)
-            fig_trend.update_layout(xaxis_title='月份', yaxis_title='總資產 (NT$)')
-            fig_trend.update_traces(line=dict(width=3))
-            st.plotly_chart(fig_trend, use_container_width=True)
-        else:
+        granularity = st.radio("時間區間", ["每月", "每週", "每日"], horizontal=True, key="asset_trend_granularity")
+        freq = {"每月": "M", "每週": "W", "每日": "D"}[granularity]
+        # Computed in the background; the last result is shown meanwhile and
+        # concurrent sessions over the same data share one run
+        inputs = (df_tx, accounts_df, df_stocks, price_history if price_history is not None else pd.DataFrame())
+        trend_job = jobs.latest(('dashboard.asset_trend', db.DB_FILE, freq), calculate_monthly_assets,
+                                df_tx, accounts_df, df_stocks, today, freq=freq, price_history=price_history,
+                                version=(today,) + tuple(charts.fingerprint(df) for df in inputs),
+                                wait_first=ASSET_TREND_WAIT_SECONDS)
+        utils.job_status(trend_job, "資產趨勢")
+        monthly_assets_df = trend_job['result']
+        # Until the first run finishes there is no result; job_status shows its progress
+        if monthly_assets_df is not None and not monthly_assets_df.empty:
+            with tracing.span('chart.asset_trend', rows=len(monthly_assets_df)):
+                # Long daily series are thinned to charts.MAX_POINTS points
+                fig_trend = charts.line(monthly_assets_df, x='month', y='total_assets',
+                                        title=f'{granularity}資產趨勢圖', markers=True,
+                                        layout=dict(xaxis_title='月份' if freq == 'M' else '期間',
+                                                    yaxis_title='總資產 (NT$)'),
+                                        traces=dict(line=dict(width=3)))
+                st.plotly_chart(fig_trend, use_container_width=True)
+        elif monthly_assets_df is not None:
             st.info("目前沒有足夠的歷史資料來顯示資產趨勢")
     else:
         st.info("目前沒有資料可供顯示資產趨勢")
@@ -231,19 +299,14 @@ def view():
     # 3. This Month's Spending Items Pie Chart
     st.subheader("本月支出分析")
     if not df_tx.empty:
-        # Filter to current month expenses
-        current_month_expenses = df_tx[
-            (df_tx['date'].dt.to_period('M') == current_month_str) & 
-            (df_tx['type'] == 'Expense')
-        ]
-        
-        if not current_month_expenses.empty:
-            expense_by_category = current_month_expenses.groupby('category')['amount'].sum().reset_index()
+        if not month_expenses.empty:
+            expense_by_category = month_expenses[['category', 'total']].copy()
             expense_by_category.columns = ['類別', '金額']
             
-            fig_monthly_expense = px.pie(expense_by_category, values='金額', names='類別', 
-                                        title='本月花費項目分布')
-            st.plotly_chart(fig_monthly_expense, use_container_width=True)
+            with tracing.span('chart.month_expenses', rows=len(expense_by_category)):
+                fig_monthly_expense = charts.pie(expense_by_category, values='金額', names='類別',
+                                                 title='本月花費項目分布')
+                st.plotly_chart(fig_monthly_expense, use_container_width=True)
         else:
             st.info("本月尚無支出記錄")
     else:
@@ -257,12 +320,15 @@ def view():
         # Expense by Category (All time)
         expenses_df = df_tx[df_tx['type'] == 'Expense']
         if not expenses_df.empty:
-            fig_cat = px.pie(expenses_df, values='amount', names='category', title='支出類別分布（全部）')
-            col1.plotly_chart(fig_cat, use_container_width=True)
+            expense_totals = db.get_category_totals('Expense').rename(columns={'total': 'amount'})
+            with tracing.span('chart.expense_categories', rows=len(expense_totals)):
+                fig_cat = charts.pie(expense_totals, values='amount', names='category', title='支出類別分布（全部）')
+                col1.plotly_chart(fig_cat, use_container_width=True)
             
-            # Daily Spending Trend
-            daily_spend = expenses_df.groupby('date')['amount'].sum().reset_index()
-            fig_trend = px.bar(daily_spend, x='date', y='amount', title='每日支出趨勢')
-            col2.plotly_chart(fig_trend, use_container_width=True)
+            # Spending Trend, summed per day, week or month depending on the range
+            daily_spend = expenses_df[['date']].assign(amount=expenses_df['amount_cents'] / 100)
+            with tracing.span('chart.daily_spending', rows=len(daily_spend)):
+                fig_trend = charts.bar(daily_spend, x='date', y='amount', title='{period}支出趨勢')
+                col2.plotly_chart(fig_trend, use_container_width=True)
     else:
         st.info("尚無資料可供圖表顯示。")
@@ -0,0 +1,105 @@
+"""
+Near-duplicate transaction finder.
+
+Exact duplicates share a ``dedupe_key`` and are found through its index
+(see ``database.get_duplicate_transactions``). Near duplicates are rows
+with the same account, type and amount, dates a few days apart and
+similar descriptions, e.g. a purchase entered by hand and later imported
+from the bank with the posting date and the merchant's own wording.
+
+Rather than comparing every pair of rows, rows are put into buckets of
+``window_days`` days per (account, type, amount). Each bucket is only
+joined with itself and the next bucket, so the work grows with the number
+of candidate pairs rather than with the square of the table size. Stored
+transactions are blocked in SQL first: only rows whose (account, type,
+amount) occurs more than once are loaded.
+"""
+from difflib import SequenceMatcher
+
+import numpy as np
+import pandas as pd
+
+BLOCK_COLUMNS = ['account_key', 'type', 'cents']
+
+def _normalize(text) -> str:
+    return ' '.join(str(text).split()).casefold() if isinstance(text, str) else ''
+
+def description_similarity(a: str, b: str) -> float:
+    """Similarity of two descriptions in [0, 1]; two blank descriptions count as equal."""
+    a, b = _normalize(a), _normalize(b)
+    if not a and not b:
+        return 1.0
+    return SequenceMatcher(None, a, b).ratio()
+
+def find_near_duplicates(df: pd.DataFrame = None, window_days: int = 3,
+                         min_similarity: float = 0.6) -> pd.DataFrame:
+    """
+    Find pairs of transactions that are probably the same real transaction.
+
+    Parameters
+    ----------
+    df : pandas.DataFrame, optional
+        Transactions with id, date, type, amount, account_id and description
+        columns (defaults to the stored transactions that share their
+        account, type and amount with another one).
+    window_days : int
+        Largest date difference between the two rows of a pair.
+    min_similarity : float
+        Smallest description similarity (0-1) for a pair to be reported.
+
+    Returns
+    -------
+    pandas.DataFrame
+        One row per pair: id_a < id_b, both dates, amount, account,
+        both descriptions, days apart and similarity, most similar first.
+    """
+    if df is None:
+        import database as db
+        df = db.get_near_duplicate_candidates()
+
+    columns = ['id_a', 'id_b', 'date_a', 'date_b', 'type', 'amount', 'account_name',
+               'description_a', 'description_b', 'days_apart', 'similarity']
+    if df.empty:
+        return pd.DataFrame(columns=columns)
+
+    window_days = max(int(window_days), 1)
+    rows = pd.DataFrame({
+        'id': df['id'].to_numpy(),
+        'date': pd.to_datetime(df['date'], errors='coerce').dt.normalize(),
+        'type': df['type'].to_numpy(),
+        'amount': df['amount'].to_numpy(dtype=float),
+        'account_key': df['account_id'].fillna(0).to_numpy() if 'account_id' in df.columns else 0,
+        'account_name': df['account_name'].to_numpy() if 'account_name' in df.columns else None,
+        'description': df['description'].to_numpy() if 'description' in df.columns else None,
+    }).dropna(subset=['date', 'amount'])
+    rows['cents'] = np.round(rows['amount'] * 100).astype('int64')
+    rows['bucket'] = (rows['date'] - pd.Timestamp(0)).dt.days // window_days
+
+    # Pair each bucket with itself and its successor; with buckets of
+    # window_days days that covers every pair at most window_days apart.
+    nxt = rows.assign(bucket=rows['bucket'] - 1)
+    pairs = pd.concat([
+        rows.merge(rows, on=BLOCK_COLUMNS + ['bucket'], suffixes=('_a', '_b')),
+        rows.merge(nxt, on=BLOCK_COLUMNS + ['bucket'], suffixes=('_a', '_b')),
+    ], ignore_index=True)
+    pairs = pairs[pairs['id_a'] != pairs['id_b']]
+    pairs['days_apart'] = (pairs['date_b'] - pairs['date_a']).dt.days.abs()
+    pairs = pairs[pairs['days_apart'] <= window_days]
+    # Each unordered pair can show up once per direction; orient every pair
+    # as id_a < id_b, swapping all of its _a/_b columns together so dates
+    # and descriptions stay with their ids
+    swap = pairs['id_a'] > pairs['id_b']
+    for col_a in [col for col in pairs.columns if col.endswith('_a')]:
+        col_b = col_a[:-2] + '_b'
+        pairs[col_a], pairs[col_b] = pairs[col_a].where(~swap, pairs[col_b]), pairs[col_b].where(~swap, pairs[col_a])
+    pairs = pairs.drop_duplicates(['id_a', 'id_b'])
+    if pairs.empty:
+        return pd.DataFrame(columns=columns)
+
+    pairs['similarity'] = [
+        description_similarity(a, b) for a, b in zip(pairs['description_a'], pairs['description_b'])
+    ]
+    pairs = pairs[pairs['similarity'] >= min_similarity]
+    return (pairs.rename(columns={'account_name_a': 'account_name', 'amount_a': 'amount'})
+            .sort_values(['similarity', 'days_apart', 'id_a'], ascending=[False, True, True])
+            [columns].reset_index(drop=True))
@@ -1,8 +1,11 @@
 import streamlit as st
 import pandas as pd
-from datetime import date
+from datetime import date, timedelta
 import database as db
-from modules import utils
+from modules import utils, importer, dedupe
+
+PAGE_SIZE = 20
+SEARCH_LIMIT = 100
 
 def view():
     st.header("交易管理")
@@ -30,29 +33,119 @@ def view():
             # payment_method = st.selectbox("Payment Method", utils.PAYMENT_METHODS) # Deprecated
             account_name = st.selectbox("帳戶", account_names)
             description = st.text_input("備註")
+        allow_duplicate = st.checkbox("允許重複交易", help="已有相同日期、金額、帳戶與備註的交易時仍然新增")
         
         if st.button("新增交易"):
             if amount > 0:
                 if account_name:
                     account_id = account_map[account_name]
-                    # We still pass account_name as payment_method for backward compatibility or display in simple views if needed, 
-                    # but ideally we rely on account_id. The DB function still takes payment_method.
-                    db.add_transaction(tx_date, tx_type_db, category, amount, account_name, description, account_id)
-                    st.success("交易新增成功！")
-                    st.rerun()
+                    duplicate_id = None if allow_duplicate else db.find_duplicate(tx_date, amount, account_id, description)
+                    if duplicate_id is not None:
+                        st.warning(f"已有相同的交易（ID {duplicate_id}），未新增。如確定要新增，請勾選「允許重複交易」。")
+                    else:
+                        # We still pass account_name as payment_method for backward compatibility or display in simple views if needed, 
+                        # but ideally we rely on account_id. The DB function still takes payment_method.
+                        db.add_transaction(tx_date, tx_type_db, category, amount, account_name, description, account_id)
+                        st.success("交易新增成功！")
+                        st.rerun()
                 else:
                     st.error("請選擇帳戶。")
             else:
                 st.error("金額必須大於 0")
 
+    # Bulk import from bank statements
+    with st.expander("匯入交易"):
+        uploaded = st.file_uploader("上傳銀行對帳單（CSV 或 OFX/QFX）", type=["csv", "ofx", "qfx"])
+        import_account = st.selectbox("匯入帳戶", ["（依檔案中的帳戶欄位）"] + account_names, key="import_account")
+        if uploaded is not None and st.button("匯入", key="import_btn"):
+            target = import_account if import_account in account_map else None
+            if uploaded.name.lower().endswith(('.ofx', '.qfx')) and not target:
+                st.error("OFX 檔案請選擇匯入帳戶。")
+            else:
+                status = st.empty()
+                rows = importer.import_file(uploaded, uploaded.name, target,
+                                            progress=lambda n: status.text(f"已匯入 {n:,} 筆..."))
+                status.empty()
+                st.success(f"已匯入 {rows:,} 筆交易（已略過重複的交易）。")
+
+    # Duplicate cleanup
+    with st.expander("重複交易"):
+        exact = db.get_duplicate_transactions()
+        if not exact.empty:
+            # Keep the earliest entry of each group
+            extra_ids = exact.loc[exact.duplicated('dedupe_key'), 'id'].tolist()
+            st.write(f"完全相同的交易：{len(exact)} 筆，可刪除 {len(extra_ids)} 筆重複項目。")
+            st.dataframe(exact[['id', 'date', 'type', 'category', 'amount', 'account_name', 'description']],
+                         use_container_width=True)
+            if st.button("刪除重複項目（保留最早一筆）", key="dedupe_btn"):
+                db.delete_transactions(extra_ids)
+                st.success(f"已刪除 {len(extra_ids)} 筆重複交易。")
+                st.rerun()
+        else:
+            st.write("沒有完全相同的交易。")
+
+        window_days = st.number_input("相近交易的日期範圍（天）", min_value=1, max_value=31, value=3, key="near_dup_days")
+        if st.button("尋找相近交易", key="near_dup_btn"):
+            st.session_state['near_duplicates'] = dedupe.find_near_duplicates(window_days=window_days)
+        near = st.session_state.get('near_duplicates')
+        if near is not None:
+            if near.empty:
+                st.write("沒有找到相近的交易。")
+            else:
+                near_display = near.copy()
+                near_display.columns = ['ID A', 'ID B', '日期 A', '日期 B', '類型', '金額', '帳戶',
+                                        '備註 A', '備註 B', '相差天數', '相似度']
+                st.dataframe(near_display, use_container_width=True)
+                to_delete = st.multiselect("選擇要刪除的交易 ID", sorted(set(near['id_b'])), key="near_dup_delete")
+                if to_delete and st.button("刪除所選交易", key="near_dup_delete_btn"):
+                    db.delete_transactions(to_delete)
+                    del st.session_state['near_duplicates']
+                    st.success(f"已刪除 {len(to_delete)} 筆交易。")
+                    st.rerun()
+
     # View Transactions
-    st.subheader("最近交易")
-    df = db.get_transactions(limit=20)
-    
+    st.subheader("交易記錄")
+    search_query = st.text_input("搜尋備註或類別", key="tx_search", placeholder="例如：午餐 便當")
+    fcol1, fcol2, fcol3, fcol4 = st.columns(4)
+    with fcol1:
+        filter_type = st.selectbox("類型", ["全部", "支出", "收入"], key="filter_type")
+    type_db = {"支出": "Expense", "收入": "Income"}.get(filter_type)
+    with fcol2:
+        filter_category = st.selectbox("類別", ["全部"] + utils.get_categories(type_db), key="filter_category")
+    with fcol3:
+        filter_account = st.selectbox("帳戶", ["全部"] + account_names, key="filter_account")
+    with fcol4:
+        date_range = st.date_input("日期範圍", value=(), key="filter_dates")
+
+    filters = {
+        'type': type_db,
+        'category': None if filter_category == "全部" else filter_category,
+        'account_id': account_map.get(filter_account),
+        'start_date': date_range[0] if len(date_range) == 2 else None,
+        # The range picker is inclusive; the query's end bound is exclusive
+        'end_date': date_range[1] + timedelta(days=1) if len(date_range) == 2 else None,
+    }
+
+    # Cursors of the pages visited so far; starting over whenever the filters change
+    if st.session_state.get('tx_page_filters') != filters:
+        st.session_state['tx_page_filters'] = filters
+        st.session_state['tx_page_cursors'] = [None]
+    cursors = st.session_state['tx_page_cursors']
+
+    if search_query.strip():
+        # Ranked search results replace the paged listing
+        df = db.search_transactions(search_query, filters, limit=SEARCH_LIMIT)
+        has_next = False
+    else:
+        # One extra row tells whether a next page exists
+        page = db.get_transactions_page(cursors[-1], PAGE_SIZE + 1, **filters)
+        has_next = len(page) > PAGE_SIZE
+        df = page.head(PAGE_SIZE)
+
     if not df.empty:
         # Display as a dataframe with some formatting
         # Show account_name instead of payment_method if available
-        display_cols = ['date', 'type', 'category', 'amount', 'account_name', 'description']
+        display_cols = ['id', 'date', 'type', 'category', 'amount', 'account_name', 'description']
         # If account_name is null (legacy), fallback to payment_method might be needed, but our query handles it via join.
         # However, if join fails (account deleted), it might be null.
         # Let's just show what we have.
@@ -60,67 +153,77 @@ def view():
         # Translate type column for display
         df_display = df[display_cols].copy()
         df_display['type'] = df_display['type'].map({'Income': '收入', 'Expense': '支出'})
-        df_display.columns = ['日期', '類型', '類別', '金額', '帳戶', '備註']
+        df_display.columns = ['ID', '日期', '類型', '類別', '金額', '帳戶', '備註']
         
         # Format currency column
-        df_display['金額'] = df_display['金額'].apply(lambda x: utils.format_currency(x) if isinstance(x, (int, float)) else x)
-        st.dataframe(df_display, use_container_width=True)
-        
-        # Delete Transaction
-        # Delete Transaction
-        with st.expander("刪除交易"):
-            tx_id_to_delete = st.number_input("輸入要刪除的交易 ID", min_value=0, step=1, key="delete_tx_id")
-            if st.button("刪除", key="delete_btn"):
-                db.delete_transaction(tx_id_to_delete)
-                st.success(f"交易 {tx_id_to_delete} 已刪除。")
-                st.rerun()
-
-        # Edit Transaction
-        with st.expander("編輯交易"):
-            edit_tx_id = st.number_input("輸入要編輯的交易 ID", min_value=0, step=1, key="edit_tx_id")
-            # Load existing transaction details
-            if st.button("載入", key="load_btn"):
-                tx_df = db.get_transactions(limit=1000)  # fetch all
-                tx_row = tx_df[tx_df['id'] == edit_tx_id]
-                if not tx_row.empty:
-                    tx = tx_row.iloc[0]
-                    st.session_state['edit_date'] = pd.to_datetime(tx['date']).date()
-                    st.session_state['edit_type'] = tx['type']
-                    st.session_state['edit_category'] = tx['category']
-                    st.session_state['edit_amount'] = tx['amount']
-                    st.session_state['edit_account'] = tx.get('account_name', '')
-                    st.session_state['edit_description'] = tx['description']
-                else:
-                    st.error("找不到該交易 ID。")
-            if 'edit_date' in st.session_state:
-                col1, col2 = st.columns(2)
-                with col1:
-                    edit_date = st.date_input("日期", st.session_state['edit_date'], key="edit_date_input")
-                    edit_type_display = "支出" if st.session_state['edit_type'] == "Expense" else "收入"
-                    edit_type = st.selectbox("類型", ["支出", "收入"], index=0 if st.session_state['edit_type'] == "Expense" else 1, key="edit_type_input")
-                    edit_type_db = "Expense" if edit_type == "支出" else "Income"
-                    # Get categories based on transaction type
-                    edit_categories = utils.get_categories(edit_type_db)
-                    current_category = st.session_state['edit_category']
-                    category_index = edit_categories.index(current_category) if current_category in edit_categories else 0
-                    edit_category = st.selectbox("類別", edit_categories, index=category_index, key="edit_category_input")
-
-                with col2:
-                    edit_amount = st.number_input("金額", min_value=0.0, step=1.0, value=st.session_state['edit_amount'], key="edit_amount_input")
-                    # Account selection
-                    accounts_df = db.get_accounts()
-                    account_names = accounts_df['name'].tolist()
-                    account_map = {row['name']: row['id'] for _, row in accounts_df.iterrows()}
-                    edit_account_name = st.selectbox("帳戶", account_names, index=account_names.index(st.session_state['edit_account']) if st.session_state['edit_account'] in account_names else 0, key="edit_account_input")
-                    edit_description = st.text_input("備註", st.session_state['edit_description'], key="edit_description_input")
-                if st.button("更新交易", key="update_btn"):
-                    account_id = account_map.get(edit_account_name)
-                    db.update_transaction(edit_tx_id, edit_date, edit_type_db, edit_category, edit_amount, edit_account_name, edit_description, account_id)
-                    st.success(f"交易 {edit_tx_id} 已更新。")
-                    # Clear session state
-                    for k in ['edit_date','edit_type','edit_category','edit_amount','edit_account','edit_description']:
-                        if k in st.session_state:
-                            del st.session_state[k]
-                    st.rerun()
+        df_display['金額'] = utils.format_currencies(df_display['金額'], na_rep="")
+        st.dataframe(df_display, use_container_width=True, hide_index=True)
     else:
         st.info("找不到交易記錄。")
+
+    if search_query.strip():
+        st.caption(f"顯示最相關的 {len(df)} 筆結果（最多 {SEARCH_LIMIT} 筆）")
+    else:
+        pcol1, pcol2, pcol3 = st.columns([1, 1, 4])
+        if pcol1.button("上一頁", disabled=len(cursors) == 1, key="prev_page_btn"):
+            cursors.pop()
+            st.rerun()
+        if pcol2.button("下一頁", disabled=not has_next, key="next_page_btn"):
+            last = df.iloc[-1]
+            cursors.append((last['date'], int(last['id'])))
+            st.rerun()
+        pcol3.caption(f"第 {len(cursors)} 頁")
+
+    # Delete Transaction
+    with st.expander("刪除交易"):
+        tx_id_to_delete = st.number_input("輸入要刪除的交易 ID", min_value=0, step=1, key="delete_tx_id")
+        if st.button("刪除", key="delete_btn"):
+            db.delete_transaction(tx_id_to_delete)
+            st.success(f"交易 {tx_id_to_delete} 已刪除。")
+            st.rerun()
+
+    # Edit Transaction
+    with st.expander("編輯交易"):
+        edit_tx_id = st.number_input("輸入要編輯的交易 ID", min_value=0, step=1, key="edit_tx_id")
+        # Load existing transaction details
+        if st.button("載入", key="load_btn"):
+            tx = db.get_transaction(edit_tx_id)
+            if tx is not None:
+                st.session_state['edit_date'] = pd.to_datetime(tx['date']).date()
+                st.session_state['edit_type'] = tx['type']
+                st.session_state['edit_category'] = tx['category']
+                st.session_state['edit_amount'] = tx['amount']
+                st.session_state['edit_account'] = tx.get('account_name', '')
+                st.session_state['edit_description'] = tx['description']
+            else:
+                st.error("找不到該交易 ID。")
+        if 'edit_date' in st.session_state:
+            col1, col2 = st.columns(2)
+            with col1:
+                edit_date = st.date_input("日期", st.session_state['edit_date'], key="edit_date_input")
+                edit_type_display = "支出" if st.session_state['edit_type'] == "Expense" else "收入"
+                edit_type = st.selectbox("類型", ["支出", "收入"], index=0 if st.session_state['edit_type'] == "Expense" else 1, key="edit_type_input")
+                edit_type_db = "Expense" if edit_type == "支出" else "Income"
+                # Get categories based on transaction type
+                edit_categories = utils.get_categories(edit_type_db)
+                current_category = st.session_state['edit_category']
+                category_index = edit_categories.index(current_category) if current_category in edit_categories else 0
+                edit_category = st.selectbox("類別", edit_categories, index=category_index, key="edit_category_input")
+
+            with col2:
+                edit_amount = st.number_input("金額", min_value=0.0, step=1.0, value=st.session_state['edit_amount'], key="edit_amount_input")
+                # Account selection
+                accounts_df = db.get_accounts()
+                account_names = accounts_df['name'].tolist()
+                account_map = {row['name']: row['id'] for _, row in accounts_df.iterrows()}
+                edit_account_name = st.selectbox("帳戶", account_names, index=account_names.index(st.session_state['edit_account']) if st.session_state['edit_account'] in account_names else 0, key="edit_account_input")
+                edit_description = st.text_input("備註", st.session_state['edit_description'], key="edit_description_input")
+            if st.button("更新交易", key="update_btn"):
+                account_id = account_map.get(edit_account_name)
+                db.update_transaction(edit_tx_id, edit_date, edit_type_db, edit_category, edit_amount, edit_account_name, edit_description, account_id)
+                st.success(f"交易 {edit_tx_id} 已更新。")
+                # Clear session state
+                for k in ['edit_date','edit_type','edit_category','edit_amount','edit_account','edit_description']:
+                    if k in st.session_state:
+                        del st.session_state[k]
+                st.rerun()
@@ -0,0 +1,218 @@
+"""
+Bulk transaction import from bank statements (CSV or OFX).
+
+Files are streamed in chunks. Each chunk is normalized with the same column
+mapping as the Google Sheets transactions tab, account names are resolved
+to ids with one lookup dict, and each chunk goes to
+``database.add_transactions`` as a frame, which computes the amounts and
+duplicate keys column-wise and inserts it in one transaction.
+"""
+import io
+import re
+from typing import Callable, Dict, Iterator, List, Optional
+
+import pandas as pd
+
+import database as db
+from modules import sheets
+
+CHUNK_SIZE = 50_000
+
+# Accepted spellings of transaction types
+TYPE_MAPPING = {
+    'expense': 'Expense', '支出': 'Expense', 'debit': 'Expense',
+    'income': 'Income', '收入': 'Income', 'credit': 'Income',
+}
+
+ProgressCallback = Callable[[int], None]
+
+def _account_lookup() -> Dict[str, int]:
+    accounts = db.get_accounts()
+    return dict(zip(accounts['name'], accounts['id'])) if not accounts.empty else {}
+
+def _chunk_rows(df: pd.DataFrame, accounts: Dict[str, int], account_name: Optional[str]) -> pd.DataFrame:
+    """Convert a normalized chunk into a TRANSACTION_COLUMNS frame for database.add_transactions."""
+    df = sheets.prepare('transactions', df)
+    df = df.dropna(subset=['date', 'amount'])
+    n = len(df)
+    if n == 0:
+        return pd.DataFrame(columns=db.TRANSACTION_COLUMNS)
+
+    amount = df['amount'].astype(float)
+    if 'type' in df.columns:
+        tx_type = df['type'].astype(str).str.strip().str.lower().map(TYPE_MAPPING)
+        # Unrecognized or missing types fall back to the amount's sign
+        tx_type = tx_type.fillna(amount.lt(0).map({True: 'Expense', False: 'Income'}))
+    else:
+        tx_type = amount.lt(0).map({True: 'Expense', False: 'Income'})
+
+    if account_name is not None:
+        names = pd.Series(account_name, index=df.index)
+    elif 'account_name' in df.columns:
+        names = df['account_name'].astype('string').str.strip()
+    elif 'payment_method' in df.columns:
+        names = df['payment_method'].astype('string').str.strip()
+    else:
+        names = pd.Series(pd.NA, index=df.index, dtype='string')
+
+    if 'account_id' in df.columns and account_name is None:
+        account_id = pd.to_numeric(df['account_id'], errors='coerce')
+        # Ids of accounts that don't exist here would fail the foreign key
+        account_id = account_id.where(account_id.isin(list(accounts.values())))
+        account_id = account_id.fillna(names.map(accounts))
+    else:
+        account_id = names.map(accounts)
+
+    payment_method = df['payment_method'].astype('string') if 'payment_method' in df.columns else names
+    category = df['category'].astype('string') if 'category' in df.columns else pd.Series('Other', index=df.index)
+    description = df['description'] if 'description' in df.columns else pd.Series(None, index=df.index)
+
+    return pd.DataFrame({
+        'date': df['date'].dt.strftime('%Y-%m-%d'),
+        'type': tx_type,
+        'category': category.fillna('Other').astype(str),
+        'amount': amount.abs(),
+        'payment_method': payment_method.fillna('').astype(str),
+        'description': description.astype(object).where(description.notna(), None),
+        'account_id': account_id.astype('Int64'),
+    }, columns=db.TRANSACTION_COLUMNS)
+
+def _import_chunks(chunks: Iterator[pd.DataFrame], account_name: Optional[str],
+                   progress: Optional[ProgressCallback], skip_duplicates: bool) -> int:
+    accounts = _account_lookup()
+    if account_name is not None and account_name not in accounts:
+        raise ValueError(f"Unknown account '{account_name}'")
+
+    # Rows from earlier chunks of this file are not duplicates of later ones
+    max_existing_id = db.get_max_transaction_id()
+    total = 0
+    for chunk in chunks:
+        rows = _chunk_rows(chunk, accounts, account_name)
+        if not rows.empty:
+            total += db.add_transactions(rows, skip_duplicates, max_existing_id)
+        if progress:
+            progress(total)
+    return total
+
+def import_csv(path_or_buffer, account_name: str = None, chunksize: int = CHUNK_SIZE,
+               progress: ProgressCallback = None, skip_duplicates: bool = True) -> int:
+    """
+    Import transactions from a CSV file.
+
+    Parameters
+    ----------
+    path_or_buffer : str or file-like
+        CSV with date and amount columns; type, category, description and
+        account columns are optional (same headers as the Sheets tab).
+    account_name : str, optional
+        Book every row to this account instead of the file's account column.
+    chunksize : int
+        Rows parsed and inserted per batch.
+    progress : callable, optional
+        Called with the number of rows imported so far after each chunk.
+    skip_duplicates : bool
+        Leave out rows already stored, so overlapping statements can be
+        re-imported safely.
+
+    Returns
+    -------
+    int
+        Number of rows imported.
+    """
+    chunks = pd.read_csv(path_or_buffer, chunksize=chunksize, dtype=str, skipinitialspace=True)
+    return _import_chunks(chunks, account_name, progress, skip_duplicates)
+
+_OFX_TRANSACTION = re.compile(r'<STMTTRN>(.*?)(?:</STMTTRN>|(?=<STMTTRN>)|(?=</BANKTRANLIST>))', re.S | re.I)
+_OFX_FIELD = re.compile(r'<(DTPOSTED|TRNAMT|NAME|MEMO|TRNTYPE)>([^<\r\n]*)', re.I)
+
+def _iter_ofx_records(text_stream, chunksize: int) -> Iterator[pd.DataFrame]:
+    """Yield OFX <STMTTRN> records as raw DataFrames of up to ``chunksize`` rows."""
+    buffer = ''
+    records = []
+    for block in iter(lambda: text_stream.read(1 << 20), ''):
+        buffer += block
+        matches = list(_OFX_TRANSACTION.finditer(buffer))
+        # The last match may be cut off at the block boundary; keep it for the next read
+        complete = matches[:-1] if matches else []
+        for match in complete:
+            fields = {k.upper(): v.strip() for k, v in _OFX_FIELD.findall(match.group(1))}
+            records.append(fields)
+            if len(records) >= chunksize:
+                yield _ofx_frame(records)
+                records = []
+        if complete:
+            buffer = buffer[complete[-1].end():]
+    for match in _OFX_TRANSACTION.finditer(buffer):
+        records.append({k.upper(): v.strip() for k, v in _OFX_FIELD.findall(match.group(1))})
+    if records:
+        yield _ofx_frame(records)
+
+def _ofx_frame(records: List[dict]) -> pd.DataFrame:
+    df = pd.DataFrame.from_records(records, columns=['DTPOSTED', 'TRNAMT', 'NAME', 'MEMO', 'TRNTYPE'])
+    return pd.DataFrame({
+        # DTPOSTED is YYYYMMDD[HHMMSS[.XXX]][TZ]; the date part is enough
+        'date': df['DTPOSTED'].str[:8],
+        'amount': df['TRNAMT'],
+        'description': df['NAME'].fillna(df['MEMO']),
+    })
+
+def import_ofx(path_or_buffer, account_name: str, chunksize: int = CHUNK_SIZE,
+               progress: ProgressCallback = None, skip_duplicates: bool = True) -> int:
+    """
+    Import transactions from an OFX/QFX bank statement.
+
+    Negative amounts become expenses and positive amounts income; the
+    category is set to 'Other'.
+
+    Parameters
+    ----------
+    path_or_buffer : str or file-like
+        OFX file (SGML or XML flavour).
+    account_name : str
+        Account the statement belongs to.
+    chunksize : int
+        Rows inserted per batch.
+    progress : callable, optional
+        Called with the number of rows imported so far after each chunk.
+    skip_duplicates : bool
+        Leave out rows already stored.
+
+    Returns
+    -------
+    int
+        Number of rows imported.
+    """
+    if isinstance(path_or_buffer, str):
+        with open(path_or_buffer, encoding='utf-8', errors='replace') as f:
+            return _import_chunks(_iter_ofx_records(f, chunksize), account_name, progress, skip_duplicates)
+    stream = path_or_buffer
+    if isinstance(stream.read(0), bytes):
+        stream = io.TextIOWrapper(stream, encoding='utf-8', errors='replace')
+    return _import_chunks(_iter_ofx_records(stream, chunksize), account_name, progress, skip_duplicates)
+
+def import_file(path_or_buffer, name: str, account_name: str = None,
+                progress: ProgressCallback = None, skip_duplicates: bool = True) -> int:
+    """Import a statement, choosing the parser from the file name's extension."""
+    if name.lower().endswith(('.ofx', '.qfx')):
+        return import_ofx(path_or_buffer, account_name, progress=progress, skip_duplicates=skip_duplicates)
+    return import_csv(path_or_buffer, account_name, progress=progress, skip_duplicates=skip_duplicates)
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Bulk-import bank statements")
+    parser.add_argument("path", help="CSV or OFX/QFX file")
+    parser.add_argument("--account", help="account name to book every row to (required for OFX)")
+    parser.add_argument("--keep-duplicates", action="store_true", help="also import rows that are already stored")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+
+    def report(rows):
+        elapsed = time.perf_counter() - start
+        print(f"\r{rows:,} rows ({rows / elapsed if elapsed else 0:,.0f} rows/s)", end="", flush=True)
+
+    total = import_file(args.path, args.path, args.account, progress=report,
+                        skip_duplicates=not args.keep_duplicates)
+    print(f"\nImported {total:,} transactions in {time.perf_counter() - start:.1f}s.")
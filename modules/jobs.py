@@ -0,0 +1,198 @@
+"""
+Background jobs for the slow work behind the pages.
+
+Price downloads, Google Sheets syncs and the dashboard asset trend run on a
+thread pool owned by the process instead of inside the Streamlit script.
+Each job key (e.g. ``('prices.quotes',)``) has one record, shared by every
+session, holding the status and progress of its latest run and the result
+of its last successful one. A page renders that result right away, with
+its age, while a newer one is computed.
+
+Submitting a key that is already queued or running for the same
+``version`` joins that run, so concurrent reruns and sessions cost one job.
+A submission for another version while a run is in flight is queued to
+start after it; only the newest such submission is kept.
+
+The pool uses threads rather than processes: the jobs wait on the network,
+SQLite and pandas/numpy, which release the GIL, and they share the process's
+connection pool and read caches.
+
+Code running inside a job reports progress with ``report``; elsewhere that
+is a no-op.
+"""
+import contextvars
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+MAX_WORKERS = 4
+# A run that failed is retried by ``latest`` after this many seconds
+RETRY_SECONDS = 60
+
+QUEUED, RUNNING, DONE, FAILED = 'queued', 'running', 'done', 'failed'
+
+_executor = None
+_jobs = {}  # key -> record; keys starting with '_' are internal
+_lock = threading.Lock()
+_changed = threading.Condition(_lock)
+_current = contextvars.ContextVar('job', default=None)
+_log = logging.getLogger(__name__)
+
+def _pool():
+    # Called with _lock held
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix='job')
+    return _executor
+
+def _snapshot(job):
+    return {k: v for k, v in job.items() if not k.startswith('_')}
+
+def _new_record(key):
+    return {
+        'key': key, 'status': None, 'version': None, 'progress': None, 'message': None,
+        'result': None, 'result_version': None, 'result_at': None, 'error': None,
+        'submitted_at': None, 'started_at': None, 'finished_at': None,
+    }
+
+def _run(key):
+    with _lock:
+        job = _jobs[key]
+        func, args, kwargs = job.pop('_call')
+        version = job['version']
+        job.update(status=RUNNING, started_at=time.time(), progress=None, message=None)
+        _changed.notify_all()
+
+    token = _current.set(key)
+    try:
+        result = func(*args, **kwargs)
+        outcome = dict(status=DONE, error=None, result=result, result_version=version, result_at=time.time())
+    except Exception as e:
+        _log.exception("Job %r failed", key)
+        outcome = dict(status=FAILED, error=f"{type(e).__name__}: {e}")
+    finally:
+        _current.reset(token)
+
+    with _lock:
+        job.update(outcome, finished_at=time.time())
+        if '_next' in job:
+            job['_call'], job['version'] = job.pop('_next')
+            job.update(status=QUEUED, submitted_at=time.time())
+            _pool().submit(_run, key)
+        _changed.notify_all()
+
+def submit(key, func, *args, version=None, **kwargs):
+    """
+    Run ``func(*args, **kwargs)`` in the background as job ``key``.
+
+    Joins the queued or running job for ``key`` if it has the same
+    ``version``; otherwise the call runs once that job is done.
+
+    Parameters
+    ----------
+    key: hashable
+        Job identity, e.g. ``('prices.quotes',)``.
+    func: callable
+        The work; its return value becomes the job's result.
+    version: hashable, optional
+        Identifies the inputs, e.g. a fingerprint of the data to compute on.
+
+    Returns
+    -------
+    dict
+        Snapshot of the job record (see ``status``).
+    """
+    call = (func, args, kwargs)
+    with _lock:
+        job = _jobs.setdefault(key, _new_record(key))
+        if job['status'] == QUEUED:
+            # Not started yet: run the newest call instead
+            job['_call'], job['version'] = call, version
+        elif job['status'] == RUNNING:
+            if job['version'] == version:
+                job.pop('_next', None)
+            else:
+                job['_next'] = (call, version)
+        else:
+            job.update(status=QUEUED, version=version, submitted_at=time.time(), _call=call)
+            _pool().submit(_run, key)
+        return _snapshot(job)
+
+def status(key):
+    """
+    Snapshot of job ``key``, or None if it was never submitted.
+
+    The snapshot has the run's ``status`` (queued, running, done or failed),
+    ``progress`` (0-1, or None if not reported), ``message`` and ``error``,
+    and the ``result`` of the last successful run with its ``result_at``
+    time and ``result_version``. Results are shared: treat them as
+    read-only.
+    """
+    with _lock:
+        job = _jobs.get(key)
+        return None if job is None else _snapshot(job)
+
+def wait(key, timeout=None):
+    """Block until job ``key`` is neither queued nor running (or ``timeout`` seconds passed)."""
+    with _changed:
+        _changed.wait_for(lambda: key not in _jobs or _jobs[key]['status'] not in (QUEUED, RUNNING), timeout)
+        return None if key not in _jobs else _snapshot(_jobs[key])
+
+def latest(key, func, *args, version=None, max_age=None, wait_first=0, **kwargs):
+    """
+    Last good result of job ``key``, refreshing it in the background if needed.
+
+    A new run is submitted unless the last result was computed for
+    ``version`` and is at most ``max_age`` seconds old. A run that failed
+    for the same version is retried after RETRY_SECONDS.
+
+    Parameters
+    ----------
+    key, func, version:
+        As for ``submit``.
+    max_age: float, optional
+        Seconds a result stays fresh; by default it only goes stale when
+        ``version`` changes.
+    wait_first: float
+        Seconds to wait for the run when there is no result at all yet.
+
+    Returns
+    -------
+    dict
+        Job snapshot (see ``status``) with an added ``fresh`` flag.
+    """
+    job = status(key)
+    if not _is_fresh(job, version, max_age):
+        failed_recently = (job is not None and job['status'] == FAILED and job['version'] == version
+                           and time.time() - job['finished_at'] < RETRY_SECONDS)
+        if not failed_recently:
+            job = submit(key, func, *args, version=version, **kwargs)
+        if job['result_at'] is None and wait_first:
+            job = wait(key, wait_first)
+    return dict(job, fresh=_is_fresh(job, version, max_age))
+
+def _is_fresh(job, version, max_age):
+    return (job is not None and job['result_at'] is not None and job['result_version'] == version
+            and (max_age is None or time.time() - job['result_at'] <= max_age))
+
+def report(done, total=None, message=None):
+    """
+    Report the progress of the job running in this thread.
+
+    Parameters
+    ----------
+    done: float
+        Work done: a fraction, or a count out of ``total``.
+    total: float, optional
+        Total amount of work.
+    message: str, optional
+        What the job is doing.
+    """
+    key = _current.get()
+    if key is None:
+        return
+    with _lock:
+        job = _jobs[key]
+        job['progress'] = min(done / total, 1.0) if total else done
+        job['message'] = message
@@ -1,43 +1,46 @@
 import streamlit as st
 import pandas as pd
-import plotly.express as px
 from datetime import date, datetime
 import database as db
-from modules import utils
+from modules import utils, tracing, charts
+
+def monthly_totals(summary):
+    """Income, expenses and net amount per month, newest first.
+    
+    Parameters
+    ----------
+    summary: pandas.DataFrame
+        Output of database.get_monthly_summary (year_month, type, total, ...).
+    
+    Returns
+    -------
+    pandas.DataFrame
+        Columns: 月份, 收入, 支出, 淨額.
+    """
+    totals = summary.pivot_table(index='year_month', columns='type', values='total',
+                                 aggfunc='sum', fill_value=0)
+    income = totals['Income'] if 'Income' in totals.columns else 0.0
+    expenses = totals['Expense'] if 'Expense' in totals.columns else 0.0
+    
+    return pd.DataFrame({
+        '月份': totals.index,
+        '收入': income,
+        '支出': expenses,
+        '淨額': income - expenses
+    }).sort_values('月份', ascending=False).reset_index(drop=True)
 
 def view():
     st.header("每月收支統計")
     
-    # Fetch all transactions
-    df_tx = db.get_all_transactions()
+    # Fetch pre-aggregated monthly totals
+    summary = db.get_monthly_summary()
     
-    if df_tx.empty:
+    if summary.empty:
         st.info("尚無交易資料。")
         return
     
-    # Convert date to datetime
-    df_tx['date'] = pd.to_datetime(df_tx['date'])
-    
-    # Group by month
-    df_tx['year_month'] = df_tx['date'].dt.to_period('M').astype(str)
-    
     # Calculate monthly income and expenses
-    monthly_data = []
-    for month in sorted(df_tx['year_month'].unique(), reverse=True):
-        month_df = df_tx[df_tx['year_month'] == month]
-        
-        income = month_df[month_df['type'] == 'Income']['amount'].sum()
-        expenses = month_df[month_df['type'] == 'Expense']['amount'].sum()
-        net = income - expenses
-        
-        monthly_data.append({
-            '月份': month,
-            '收入': income,
-            '支出': expenses,
-            '淨額': net
-        })
-    
-    monthly_df = pd.DataFrame(monthly_data)
+    monthly_df = monthly_totals(summary)
     
     # Display summary metrics
     if not monthly_df.empty:
@@ -53,9 +56,7 @@ def view():
     
     # Format the dataframe for display
     display_df = monthly_df.copy()
-    display_df['收入'] = display_df['收入'].apply(lambda x: utils.format_currency(x))
-    display_df['支出'] = display_df['支出'].apply(lambda x: utils.format_currency(x))
-    display_df['淨額'] = display_df['淨額'].apply(lambda x: utils.format_currency(x))
+    display_df[['收入', '支出', '淨額']] = utils.format_currencies(display_df[['收入', '支出', '淨額']], na_rep="0")
     
     st.dataframe(display_df, use_container_width=True, hide_index=True)
     
@@ -64,42 +65,45 @@ def view():
     col1, col2 = st.columns(2)
     
     # Monthly income and expenses line chart
-    fig_trend = px.line(
-        monthly_df, 
-        x='月份', 
-        y=['收入', '支出', '淨額'],
-        title='每月收支趨勢',
-        labels={'value': '金額', 'variable': '類型'},
-        markers=True
-    )
-    fig_trend.update_layout(legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1))
-    col1.plotly_chart(fig_trend, use_container_width=True)
+    with tracing.span('chart.monthly_trend', rows=len(monthly_df)):
+        fig_trend = charts.line(
+            monthly_df,
+            x='月份',
+            y=['收入', '支出', '淨額'],
+            title='每月收支趨勢',
+            labels={'value': '金額', 'variable': '類型'},
+            markers=True,
+            layout=dict(legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1))
+        )
+        col1.plotly_chart(fig_trend, use_container_width=True)
     
     # Monthly comparison bar chart
-    fig_bar = px.bar(
-        monthly_df,
-        x='月份',
-        y=['收入', '支出'],
-        title='每月收入與支出比較',
-        labels={'value': '金額', 'variable': '類型'},
-        barmode='group'
-    )
-    fig_bar.update_layout(legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1))
-    col2.plotly_chart(fig_bar, use_container_width=True)
+    with tracing.span('chart.monthly_comparison', rows=len(monthly_df)):
+        fig_bar = charts.bar(
+            monthly_df,
+            x='月份',
+            y=['收入', '支出'],
+            title='每月收入與支出比較',
+            labels={'value': '金額', 'variable': '類型'},
+            barmode='group',
+            layout=dict(legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1))
+        )
+        col2.plotly_chart(fig_bar, use_container_width=True)
     
     # Monthly net amount bar chart
     st.subheader("每月淨額")
-    fig_net = px.bar(
-        monthly_df,
-        x='月份',
-        y='淨額',
-        title='每月淨額（收入 - 支出）',
-        labels={'淨額': '淨額', '月份': '月份'},
-        color='淨額',
-        color_continuous_scale=['red', 'yellow', 'green']
-    )
-    fig_net.update_layout(showlegend=False)
-    st.plotly_chart(fig_net, use_container_width=True)
+    with tracing.span('chart.monthly_net', rows=len(monthly_df)):
+        fig_net = charts.bar(
+            monthly_df,
+            x='月份',
+            y='淨額',
+            title='每月淨額（收入 - 支出）',
+            labels={'淨額': '淨額', '月份': '月份'},
+            color='淨額',
+            color_continuous_scale=['red', 'yellow', 'green'],
+            layout=dict(showlegend=False)
+        )
+        st.plotly_chart(fig_net, use_container_width=True)
     
     # Detailed view for selected month
     st.subheader("月份詳細資料")
@@ -107,7 +111,12 @@ def view():
         selected_month = st.selectbox("選擇月份", monthly_df['月份'].tolist())
         
         if selected_month:
-            month_tx = df_tx[df_tx['year_month'] == selected_month].copy()
+            # Only the selected month touches raw rows, via the date index
+            month_start = pd.Period(selected_month, freq='M')
+            month_tx = db.load_transactions(
+                month_start.start_time.date(), (month_start + 1).start_time.date()
+            ).assign(amount=lambda d: d['amount_cents'] / 100)
+            month_summary = summary[summary['year_month'] == selected_month]
             
             # Income breakdown
             st.write(f"**{selected_month} 收入明細**")
@@ -115,13 +124,13 @@ def view():
             income_df['date'] = income_df['date'].dt.strftime('%Y-%m-%d')
             income_df = income_df.sort_values('date', ascending=False)
             if not income_df.empty:
-                income_df['amount'] = income_df['amount'].apply(lambda x: utils.format_currency(x))
+                income_df['amount'] = utils.format_currencies(income_df['amount'], na_rep="0")
                 st.dataframe(income_df, use_container_width=True, hide_index=True)
                 
                 # Income by category
-                income_by_cat = month_tx[month_tx['type'] == 'Income'].groupby('category')['amount'].sum().reset_index()
+                income_by_cat = month_summary[month_summary['type'] == 'Income'].groupby('category')['total'].sum().reset_index()
                 income_by_cat.columns = ['類別', '金額']
-                income_by_cat['金額'] = income_by_cat['金額'].apply(lambda x: utils.format_currency(x))
+                income_by_cat['金額'] = utils.format_currencies(income_by_cat['金額'], na_rep="0")
                 st.dataframe(income_by_cat, use_container_width=True, hide_index=True)
             else:
                 st.info("該月份無收入記錄。")
@@ -132,17 +141,14 @@ def view():
             expense_df['date'] = expense_df['date'].dt.strftime('%Y-%m-%d')
             expense_df = expense_df.sort_values('date', ascending=False)
             if not expense_df.empty:
-                expense_df['amount'] = expense_df['amount'].apply(lambda x: utils.format_currency(x))
+                expense_df['amount'] = utils.format_currencies(expense_df['amount'], na_rep="0")
                 st.dataframe(expense_df, use_container_width=True, hide_index=True)
                 
                 # Expenses by category
-                expense_by_cat = month_tx[month_tx['type'] == 'Expense'].groupby('category')['amount'].sum().reset_index()
+                expense_by_cat = month_summary[month_summary['type'] == 'Expense'].groupby('category')['total'].sum().reset_index()
                 expense_by_cat.columns = ['類別', '金額']
                 expense_by_cat = expense_by_cat.sort_values('金額', ascending=False)
-                expense_by_cat['金額'] = expense_by_cat['金額'].apply(lambda x: utils.format_currency(x))
+                expense_by_cat['金額'] = utils.format_currencies(expense_by_cat['金額'], na_rep="0")
                 st.dataframe(expense_by_cat, use_container_width=True, hide_index=True)
             else:
                 st.info("該月份無支出記錄。")
-
-
-
@@ -0,0 +1,296 @@
+"""
+Stock price service: batched fetching with a SQLite quote cache, plus a
+local daily price history for valuing holdings over time.
+
+Quotes younger than QUOTE_TTL_SECONDS are served from the ``quotes`` table.
+Stale quotes are returned immediately and refreshed by the QUOTES_JOB
+background job; symbols that have never been quoted are fetched before
+returning, unless the caller asks not to wait.
+
+The provider is pluggable: any callable taking a list of symbols and
+returning ``{symbol: price}`` can be installed with ``set_provider`` (e.g. a
+local fake in tests, so no network is needed).
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from typing import Callable, Dict, Iterable, List
+
+import pandas as pd
+
+import database as db
+from modules import jobs, tracing
+
+QUOTE_TTL_SECONDS = 15 * 60
+MAX_FETCH_WORKERS = 8
+
+# Background job keys (see modules.jobs)
+QUOTES_JOB = ('prices.quotes',)
+HISTORY_JOB = ('prices.history',)
+
+PriceProvider = Callable[[List[str]], Dict[str, float]]
+# (symbol, start, end) -> DataFrame with date and close columns, end inclusive
+HistoryProvider = Callable[[str, date, date], pd.DataFrame]
+
+def _fetch_one_yfinance(symbol: str):
+    import yfinance as yf
+    try:
+        history = yf.Ticker(symbol).history(period="1d")
+        if not history.empty:
+            return history['Close'].iloc[-1]
+    except Exception:
+        pass
+    return None
+
+@tracing.traced('prices.yfinance_provider')
+def yfinance_provider(symbols: List[str]) -> Dict[str, float]:
+    """Fetch last closes with one multi-ticker download.
+
+    Falls back to per-symbol requests on a bounded thread pool for anything
+    the batch download did not return.
+    """
+    import yfinance as yf
+
+    prices = {}
+    try:
+        data = yf.download(symbols, period="5d", interval="1d", progress=False,
+                           threads=True, auto_adjust=False)
+        if not data.empty:
+            close = data['Close']
+            if close.ndim == 1:
+                close = close.to_frame(symbols[0])
+            last = close.ffill().iloc[-1].dropna()
+            prices = {sym: float(price) for sym, price in last.items() if sym in symbols}
+    except Exception as e:
+        print(f"Batch price download failed: {e}")
+
+    missing = [sym for sym in symbols if sym not in prices]
+    if missing:
+        with ThreadPoolExecutor(max_workers=min(MAX_FETCH_WORKERS, len(missing))) as pool:
+            for sym, price in zip(missing, pool.map(_fetch_one_yfinance, missing)):
+                if price is not None:
+                    prices[sym] = float(price)
+    return prices
+
+@tracing.traced('prices.yfinance_history_provider')
+def yfinance_history_provider(symbol: str, start: date, end: date) -> pd.DataFrame:
+    """Fetch daily closes for ``start <= date <= end``."""
+    import yfinance as yf
+
+    history = yf.Ticker(symbol).history(start=start, end=end + timedelta(days=1), auto_adjust=False)
+    if history.empty:
+        return pd.DataFrame(columns=['date', 'close'])
+    return pd.DataFrame({
+        'date': history.index.strftime('%Y-%m-%d'),
+        'close': history['Close'].to_numpy()
+    })
+
+_provider: PriceProvider = yfinance_provider
+_history_provider: HistoryProvider = yfinance_history_provider
+
+def set_provider(provider: PriceProvider):
+    """Install the callable used to fetch prices."""
+    global _provider
+    _provider = provider
+
+def set_history_provider(provider: HistoryProvider):
+    """Install the callable used to fetch daily price history."""
+    global _history_provider
+    _history_provider = provider
+
+@tracing.traced('prices.fetch_prices')
+def fetch_prices(symbols: Iterable[str]) -> Dict[str, float]:
+    """Fetch prices from the provider and store them in the quote cache."""
+    symbols = list(dict.fromkeys(symbols))
+    if not symbols:
+        return {}
+    try:
+        prices = _provider(symbols)
+    except Exception as e:
+        print(f"Price provider failed: {e}")
+        return {}
+    if prices:
+        db.save_quotes(prices, time.time())
+    return prices
+
+def _refresh_in_background(symbols: List[str]):
+    # Concurrent reruns and sessions asking for the same symbols share one run
+    return jobs.submit(QUOTES_JOB, fetch_prices, symbols, version=tuple(sorted(symbols)))
+
+def get_prices(symbols: Iterable[str], ttl: float = None, wait: bool = True) -> Dict[str, float]:
+    """Get current prices, serving cached quotes where possible.
+
+    Parameters
+    ----------
+    symbols : iterable of str
+        Stock symbols.
+    ttl : float, optional
+        Maximum quote age in seconds (defaults to QUOTE_TTL_SECONDS).
+    wait : bool
+        Fetch never-quoted symbols before returning; if False they are
+        fetched in the background too and left out of the result.
+
+    Returns
+    -------
+    dict
+        symbol -> price for every symbol a price is known for.
+    """
+    ttl = QUOTE_TTL_SECONDS if ttl is None else ttl
+    symbols = list(dict.fromkeys(symbols))
+    quotes = db.get_quotes(symbols)
+
+    now = time.time()
+    prices = {sym: price for sym, (price, _) in quotes.items()}
+    stale = [sym for sym, (_, fetched_at) in quotes.items() if now - fetched_at > ttl]
+    missing = [sym for sym in symbols if sym not in quotes]
+
+    if not wait:
+        stale += missing
+    elif missing:
+        prices.update(fetch_prices(missing))
+    if stale:
+        _refresh_in_background(stale)
+    return prices
+
+def stale_symbols(symbols: Iterable[str], ttl: float = None) -> List[str]:
+    """Symbols whose cached quote is missing or older than ``ttl``."""
+    ttl = QUOTE_TTL_SECONDS if ttl is None else ttl
+    symbols = list(symbols)
+    quotes = db.get_quotes(symbols)
+    now = time.time()
+    return [sym for sym in symbols if sym not in quotes or now - quotes[sym][1] > ttl]
+
+def quotes_fetched_at(symbols: Iterable[str]):
+    """Unix time of the oldest cached quote among ``symbols``, or None if none is cached."""
+    quotes = db.get_quotes(list(symbols))
+    return min((fetched_at for _, fetched_at in quotes.values()), default=None)
+
+def _missing_ranges(start: date, end: date, stored):
+    """Date ranges within [start, end] not covered by the stored (first, last) span."""
+    if stored is None:
+        return [(start, end)] if start <= end else []
+    first, last = date.fromisoformat(stored[0]), date.fromisoformat(stored[1])
+    ranges = []
+    if start < first:
+        ranges.append((start, first - timedelta(days=1)))
+    if last < end:
+        ranges.append((max(start, last + timedelta(days=1)), end))
+    return [(lo, hi) for lo, hi in ranges if lo <= hi]
+
+@tracing.traced('prices.update_price_history')
+def update_price_history(starts: Dict[str, date], end: date = None) -> int:
+    """Fetch only the history each symbol is missing and store it.
+
+    Parameters
+    ----------
+    starts : dict
+        symbol -> first date needed (e.g. the earliest buy date).
+    end : datetime.date, optional
+        Last date needed (defaults to today).
+
+    Returns
+    -------
+    int
+        Number of rows stored.
+    """
+    end = end or date.today()
+    stored = db.get_price_history_ranges(starts.keys())
+    requests = [
+        (symbol, lo, hi)
+        for symbol, start in starts.items()
+        for lo, hi in _missing_ranges(pd.Timestamp(start).date(), end, stored.get(symbol))
+    ]
+    if not requests:
+        return 0
+
+    def fetch(request):
+        symbol, lo, hi = request
+        try:
+            return _history_provider(symbol, lo, hi).assign(symbol=symbol)
+        except Exception as e:
+            print(f"Price history fetch failed for {symbol} {lo}..{hi}: {e}")
+            return None
+
+    frames = []
+    with ThreadPoolExecutor(max_workers=min(MAX_FETCH_WORKERS, len(requests))) as pool:
+        for done, df in enumerate(pool.map(fetch, requests), 1):
+            # Progress of the HISTORY_JOB run, when called from one
+            jobs.report(done, len(requests), f"{done}/{len(requests)}")
+            if df is not None and not df.empty:
+                frames.append(df)
+    if not frames:
+        return 0
+    history = pd.concat(frames, ignore_index=True).dropna(subset=['close'])
+    db.save_price_history(history)
+    return len(history)
+
+def update_portfolio_history(df_stocks: pd.DataFrame, end: date = None) -> int:
+    """Update price history for every held symbol from its first buy date."""
+    if df_stocks.empty:
+        return 0
+    starts = pd.to_datetime(df_stocks['buy_date']).groupby(df_stocks['symbol']).min().dropna()
+    return update_price_history({sym: ts.date() for sym, ts in starts.items()}, end)
+
+def update_history_in_background(df_stocks: pd.DataFrame):
+    """Run update_portfolio_history as the HISTORY_JOB background job."""
+    return jobs.submit(HISTORY_JOB, update_portfolio_history, df_stocks,
+                       version=tuple(sorted(df_stocks['symbol'].unique())))
+
+# Accepted header spellings for bulk CSV loads
+_HISTORY_COLUMNS = {
+    'symbol': 'symbol', 'ticker': 'symbol', '代號': 'symbol',
+    'date': 'date', '日期': 'date',
+    'close': 'close', 'adj close': 'close', '收盤價': 'close',
+}
+
+def load_price_history_csv(path_or_buffer, symbol: str = None, chunksize: int = 100_000) -> int:
+    """Bulk-load daily closes from a CSV file.
+
+    Parameters
+    ----------
+    path_or_buffer : str or file-like
+        CSV with date and close columns, plus a symbol column unless
+        ``symbol`` is given.
+    symbol : str, optional
+        Symbol for every row (for single-symbol exports).
+    chunksize : int
+        Rows parsed and inserted per batch.
+
+    Returns
+    -------
+    int
+        Number of rows stored.
+    """
+    total = 0
+    for chunk in pd.read_csv(path_or_buffer, chunksize=chunksize):
+        renamed = {}
+        for col in chunk.columns:
+            target = _HISTORY_COLUMNS.get(col.strip().lower())
+            # First match wins, so Yahoo exports use Close rather than Adj Close
+            if target and target not in renamed.values():
+                renamed[col] = target
+        chunk = chunk.rename(columns=renamed)
+        if symbol:
+            chunk['symbol'] = symbol
+        chunk['date'] = pd.to_datetime(chunk['date'], errors='coerce').dt.strftime('%Y-%m-%d')
+        chunk['close'] = pd.to_numeric(chunk['close'], errors='coerce')
+        chunk = chunk.dropna(subset=['symbol', 'date', 'close'])
+        db.save_price_history(chunk)
+        total += len(chunk)
+    return total
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Stock price history maintenance")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("update-history", help="fetch missing history for held stocks")
+    load = subparsers.add_parser("load-csv", help="bulk-load daily closes from a CSV file")
+    load.add_argument("path")
+    load.add_argument("--symbol", help="symbol for every row, if the file has no symbol column")
+    args = parser.parse_args()
+
+    if args.command == "update-history":
+        print(f"Stored {update_portfolio_history(db.get_stocks())} rows.")
+    elif args.command == "load-csv":
+        print(f"Stored {load_price_history_csv(args.path, args.symbol)} rows.")
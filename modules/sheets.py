@@ -2,21 +2,34 @@
 Google Sheets integration module for reading data from Google Sheets.
 """
 import pandas as pd
+import csv
+import functools
+import importlib.util
+import io
 import os
-from typing import Optional
+import threading
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
 
-try:
-    import gspread
-    from google.oauth2.service_account import Credentials
-    GSPREAD_AVAILABLE = True
-except ImportError:
-    GSPREAD_AVAILABLE = False
+from pandas.tseries.api import guess_datetime_format
+
+from modules import tracing
+
+# gspread and google-auth are slow to import and only needed for
+# authenticated access, so they are imported in _authorize
+GSPREAD_AVAILABLE = all(importlib.util.find_spec(name) is not None for name in ('gspread', 'google.auth'))
+if not GSPREAD_AVAILABLE:
     print("Warning: gspread not available. Install with: pip install gspread google-auth")
 
 # Google Sheets configuration
 SPREADSHEET_ID = "1i1hT5FTRsNTBBVvDyGY26Zz2YKOD8Z3m-UwV-ljHREA"
 SHEET_GID = "893494942"  # The specific sheet tab ID
 
+# Public CSV export endpoint; point it at a local server to test without Google
+CSV_EXPORT_URL = "https://docs.google.com/spreadsheets/d/{spreadsheet_id}/gviz/tq?tqx=out:csv&sheet={sheet_name}"
+
 # Sheet names mapping (adjust based on your actual sheet structure)
 SHEET_NAMES = {
     'transactions': '消費紀錄',  # or use index 0, 1, 2, etc.
@@ -26,6 +39,7 @@ SHEET_NAMES = {
     'budgets': 'Budgets'
 }
 
+@tracing.traced('sheets.get_sheet_data_public')
 def get_sheet_data_public(sheet_name: str, use_headers: bool = True) -> pd.DataFrame:
     """
     Read data from Google Sheets using public CSV export (no authentication required).
@@ -44,16 +58,8 @@ def get_sheet_data_public(sheet_name: str, use_headers: bool = True) -> pd.DataF
         DataFrame with sheet data
     """
     try:
-        import urllib.parse
-        # URL encode the sheet name
-        encoded_sheet_name = urllib.parse.quote(sheet_name)
-        
-        # Construct CSV export URL
-        # Format: https://docs.google.com/spreadsheets/d/{SPREADSHEET_ID}/gviz/tq?tqx=out:csv&sheet={SHEET_NAME}
-        csv_url = f"https://docs.google.com/spreadsheets/d/{SPREADSHEET_ID}/gviz/tq?tqx=out:csv&sheet={encoded_sheet_name}"
-        
         # Read CSV directly into pandas
-        df = pd.read_csv(csv_url)
+        df = pd.read_csv(io.BytesIO(fetch_sheet_csv(sheet_name)))
         
         if df.empty:
             return pd.DataFrame()
@@ -66,13 +72,57 @@ def get_sheet_data_public(sheet_name: str, use_headers: bool = True) -> pd.DataF
         print(f"Error reading public sheet '{sheet_name}': {e}")
         return pd.DataFrame()
 
+@tracing.traced('sheets.fetch_sheet_csv')
+def fetch_sheet_csv(sheet_name: str) -> bytes:
+    """Download the raw public CSV export of a sheet tab."""
+    # URL encode the sheet name
+    csv_url = CSV_EXPORT_URL.format(spreadsheet_id=SPREADSHEET_ID, sheet_name=urllib.parse.quote(sheet_name))
+    with urllib.request.urlopen(csv_url, timeout=30) as response:
+        return response.read()
+
+# Authenticated client, spreadsheet handle and worksheets, kept for the life
+# of the process so credentials are read and authorized only once
+_client = None
+_spreadsheet = None
+_worksheets = {}
+_client_lock = threading.Lock()
+
 def get_sheet_client():
+    """
+    Get the process-wide Google Sheets client, authorizing on first use.
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = _authorize()
+        return _client
+
+def get_spreadsheet():
+    """Get the process-wide handle to SPREADSHEET_ID."""
+    global _spreadsheet
+    client = get_sheet_client()
+    with _client_lock:
+        if _spreadsheet is None:
+            _spreadsheet = client.open_by_key(SPREADSHEET_ID)
+        return _spreadsheet
+
+def reset_sheet_client():
+    """Forget the cached client and handles (e.g. after credentials change)."""
+    global _client, _spreadsheet
+    with _client_lock:
+        _client = None
+        _spreadsheet = None
+        _worksheets.clear()
+
+def _authorize():
     """
     Get Google Sheets client using gspread (requires authentication). 
     Tries service account first.
     """
     if not GSPREAD_AVAILABLE:
         raise Exception("gspread is not installed. Install with: pip install gspread google-auth")
+    import gspread
+    from google.oauth2.service_account import Credentials
     
     # Try to use service account credentials from file
     creds_paths = [
@@ -104,6 +154,7 @@ def get_sheet_client():
                   "2. Set GOOGLE_APPLICATION_CREDENTIALS environment variable\n"
                   "3. Share the Google Sheet publicly and use the public URL method")
 
+@tracing.traced('sheets.get_sheet_data')
 def get_sheet_data(sheet_name: str, use_headers: bool = True, use_public: bool = True) -> pd.DataFrame:
     """
     Read data from a specific sheet tab.
@@ -135,47 +186,13 @@ def get_sheet_data(sheet_name: str, use_headers: bool = True, use_public: bool =
     # Fallback to authenticated gspread method
     if GSPREAD_AVAILABLE:
         try:
-            client = get_sheet_client()
-            
-            # Open the spreadsheet
-            spreadsheet = client.open_by_key(SPREADSHEET_ID)
-            
-            # Get the specific sheet
-            worksheet = None
-            try:
-                # Try by name first
-                worksheet = spreadsheet.worksheet(sheet_name)
-            except:
-                # Try by index if name fails
-                try:
-                    worksheet = spreadsheet.get_worksheet(int(sheet_name))
-                except:
-                    # Try by gid if available
-                    try:
-                        worksheet = spreadsheet.worksheet_by_id(int(SHEET_GID))
-                    except:
-                        # Fallback: get first worksheet
-                        worksheet = spreadsheet.sheet1
+            worksheet = _get_worksheet(sheet_name)
             
             if worksheet is None:
                 return pd.DataFrame()
             
             # Get all values
-            data = worksheet.get_all_values()
-            
-            if not data:
-                return pd.DataFrame()
-            
-            # Convert to DataFrame
-            if use_headers and len(data) > 1:
-                df = pd.DataFrame(data[1:], columns=data[0])
-            else:
-                df = pd.DataFrame(data)
-            
-            # Clean up empty rows
-            df = df.dropna(how='all')
-            
-            return df
+            return _values_to_frame(worksheet.get_all_values(), use_headers)
         
         except Exception as e:
             print(f"Error reading sheet '{sheet_name}' with gspread: {e}")
@@ -185,186 +202,329 @@ def get_sheet_data(sheet_name: str, use_headers: bool = True, use_public: bool =
     # If both methods fail, return empty DataFrame
     return pd.DataFrame()
 
-def get_transactions_sheet() -> pd.DataFrame:
-    """Get transactions data from Google Sheets."""
-    df = get_sheet_data(SHEET_NAMES.get('transactions', 'Transactions'))
+def _get_worksheet(sheet_name: str):
+    """Look up a worksheet once and reuse the handle afterwards."""
+    worksheet = _worksheets.get(sheet_name)
+    if worksheet is not None:
+        return worksheet
     
-    if df.empty:
-        return df
-    
-    # Ensure required columns exist and map to expected format
-    # Expected columns: id, date, type, category, amount, payment_method, description, account_id, account_name
-    required_cols = ['date', 'type', 'category', 'amount']
-    
-    # Check if columns exist (case-insensitive)
-    df.columns = df.columns.str.strip()
-    
-    # Map common column name variations
-    column_mapping = {
-        '日期': 'date',
-        'Date': 'date',
-        '類型': 'type',
-        'Type': 'type',
-        '類別': 'category',
-        'Category': 'category',
-        '金額': 'amount',
-        'Amount': 'amount',
-        '支付方式': 'payment_method',
-        'Payment Method': 'payment_method',
-        '備註': 'description',
-        'Description': 'description',
-        '帳戶': 'account_name',
-        'Account': 'account_name',
-        '帳戶ID': 'account_id',
-        'Account ID': 'account_id'
-    }
+    spreadsheet = get_spreadsheet()
     
-    # Rename columns if needed
-    for old_name, new_name in column_mapping.items():
-        if old_name in df.columns and new_name not in df.columns:
-            df.rename(columns={old_name: new_name}, inplace=True)
+    # Get the specific sheet
+    worksheet = None
+    try:
+        # Try by name first
+        worksheet = spreadsheet.worksheet(sheet_name)
+    except:
+        # Try by index if name fails
+        try:
+            worksheet = spreadsheet.get_worksheet(int(sheet_name))
+        except:
+            # Try by gid if available
+            try:
+                worksheet = spreadsheet.get_worksheet_by_id(int(SHEET_GID))
+            except:
+                # Fallback: get first worksheet
+                worksheet = spreadsheet.sheet1
     
-    # Ensure date is datetime
-    if 'date' in df.columns:
-        df['date'] = pd.to_datetime(df['date'], errors='coerce')
+    if worksheet is not None:
+        _worksheets[sheet_name] = worksheet
+    return worksheet
+
+def _values_to_frame(data: List[List[str]], use_headers: bool = True) -> pd.DataFrame:
+    """Convert a grid of cell values to a DataFrame."""
+    if not data:
+        return pd.DataFrame()
     
-    # Ensure amount is numeric
-    if 'amount' in df.columns:
-        df['amount'] = pd.to_numeric(df['amount'], errors='coerce')
+    # The values API trims trailing empty cells, so pad rows to equal width
+    width = max(len(row) for row in data)
+    data = [row + [''] * (width - len(row)) for row in data]
     
-    # Add id if missing
-    if 'id' not in df.columns:
-        df.insert(0, 'id', range(1, len(df) + 1))
+    # Convert to DataFrame
+    if use_headers and len(data) > 1:
+        df = pd.DataFrame(data[1:], columns=data[0])
+    else:
+        df = pd.DataFrame(data)
     
-    return df
+    # Clean up empty rows
+    return df.dropna(how='all')
 
-def get_accounts_sheet() -> pd.DataFrame:
-    """Get accounts data from Google Sheets."""
-    df = get_sheet_data(SHEET_NAMES.get('accounts', 'Accounts'))
+@tracing.traced('sheets.get_sheets_data_batch')
+def get_sheets_data_batch(sheet_names: List[str], use_headers: bool = True) -> Dict[str, pd.DataFrame]:
+    """
+    Read several sheet tabs with a single authenticated batch request.
     
-    if df.empty:
-        return df
+    Parameters
+    ----------
+    sheet_names : list of str
+        Names of the sheet tabs
+    use_headers : bool
+        Whether first row contains headers
     
-    # Map columns
-    column_mapping = {
-        '名稱': 'name',
-        'Name': 'name',
-        '類型': 'type',
-        'Type': 'type',
-        '初始餘額': 'initial_balance',
-        'Initial Balance': 'initial_balance'
+    Returns
+    -------
+    dict
+        sheet name -> DataFrame
+    """
+    # A bare quoted sheet name is an A1 range covering the whole tab
+    ranges = ["'" + name.replace("'", "''") + "'" for name in sheet_names]
+    response = get_spreadsheet().values_batch_get(ranges)
+    value_ranges = response.get('valueRanges', [])
+    return {
+        name: _values_to_frame(value_range.get('values', []), use_headers)
+        for name, value_range in zip(sheet_names, value_ranges)
     }
+
+@tracing.traced('sheets.fetch_sheets_csv')
+def fetch_sheets_csv(sheet_names: List[str], use_public: bool = True) -> Dict[str, Optional[bytes]]:
+    """
+    Fetch the raw CSV content of several tabs in one concurrent round.
     
-    df.columns = df.columns.str.strip()
-    for old_name, new_name in column_mapping.items():
-        if old_name in df.columns and new_name not in df.columns:
-            df.rename(columns={old_name: new_name}, inplace=True)
+    Public CSV exports are downloaded in parallel; tabs that fail are then
+    read with one authenticated batch request.
     
-    # Add id if missing
-    if 'id' not in df.columns:
-        df.insert(0, 'id', range(1, len(df) + 1))
+    Returns
+    -------
+    dict
+        sheet name -> CSV bytes, or None if the tab could not be read
+    """
+    results = {}
+    if use_public and sheet_names:
+        with ThreadPoolExecutor(max_workers=len(sheet_names)) as pool:
+            futures = {name: pool.submit(fetch_sheet_csv, name) for name in sheet_names}
+        for name, future in futures.items():
+            try:
+                results[name] = future.result()
+            except Exception as e:
+                print(f"Public CSV download of '{name}' failed, trying authenticated method: {e}")
     
-    # Ensure initial_balance is numeric
-    if 'initial_balance' in df.columns:
-        df['initial_balance'] = pd.to_numeric(df['initial_balance'], errors='coerce').fillna(0)
+    missing = [name for name in sheet_names if name not in results]
+    if missing and GSPREAD_AVAILABLE:
+        try:
+            for name, df in get_sheets_data_batch(missing).items():
+                if not df.empty:
+                    results[name] = df.to_csv(index=False).encode('utf-8')
+        except Exception as e:
+            print(f"Error batch reading sheets {missing} with gspread: {e}")
     
-    return df
+    return {name: results.get(name) for name in sheet_names}
 
-def get_stocks_sheet() -> pd.DataFrame:
-    """Get stocks data from Google Sheets."""
-    df = get_sheet_data(SHEET_NAMES.get('stocks', 'Stocks'))
-    
-    if df.empty:
+# Tab schemas: column -> (header aliases, kind, fill value for missing numbers).
+# A header matching the column name itself or one of its aliases is renamed
+# to the column name. Kinds:
+#   date      parsed with the tab's detected date format
+#   number    float; ``fill`` replaces blanks and unparsable values
+#   category  repeated labels, stored dictionary-encoded
+#   string    free text
+# Columns not listed are kept as read.
+SCHEMAS = {
+    'transactions': {
+        'date': (('日期', 'Date'), 'date', None),
+        'type': (('類型', 'Type'), 'category', None),
+        'category': (('類別', 'Category'), 'category', None),
+        'amount': (('金額', 'Amount'), 'number', None),
+        'payment_method': (('支付方式', 'Payment Method'), 'category', None),
+        'description': (('備註', 'Description'), 'string', None),
+        'account_name': (('帳戶', 'Account'), 'category', None),
+        'account_id': (('帳戶ID', 'Account ID'), 'number', None),
+    },
+    'accounts': {
+        'name': (('名稱', 'Name'), 'string', None),
+        'type': (('類型', 'Type'), 'category', None),
+        'initial_balance': (('初始餘額', 'Initial Balance'), 'number', 0),
+    },
+    'stocks': {
+        'symbol': (('代號', 'Symbol'), 'category', None),
+        'buy_date': (('購買日期', 'Buy Date'), 'string', None),
+        'buy_price': (('買入價格', 'Buy Price'), 'number', 0),
+        'quantity': (('數量', 'Quantity'), 'number', 0),
+        'broker_fee': (('手續費', 'Broker Fee'), 'number', 0),
+        'transaction_fee': (('交易費', 'Transaction Fee'), 'number', 0),
+        'status': (('狀態', 'Status'), 'category', None),
+    },
+    'categories': {
+        'name': (('名稱', 'Name'), 'string', None),
+        'type': (('類型', 'Type'), 'category', None),
+    },
+    'budgets': {
+        'month': (('月份', 'Month'), 'string', None),
+        'amount': (('金額', 'Amount'), 'number', 0),
+    },
+}
+
+# pyarrow's CSV reader is several times faster than the default pandas
+# engine and reads straight into typed columns; without it the C engine is used
+PYARROW_AVAILABLE = importlib.util.find_spec('pyarrow') is not None
+
+# (tab, column) -> strptime format detected on an earlier parse
+_date_formats: Dict[tuple, str] = {}
+
+def date_columns(tab: str) -> List[str]:
+    """Columns of ``tab`` holding dates."""
+    return [name for name, (_, kind, _) in SCHEMAS[tab].items() if kind == 'date']
+
+@functools.lru_cache(maxsize=64)
+def _resolve_columns(tab: str, headers: tuple) -> Dict[str, str]:
+    """Map a tab's sheet headers to column names; computed once per header row."""
+    stripped = {header: str(header).strip() for header in headers}
+    mapping = dict(stripped)
+    taken = set()
+    for name, (aliases, _, _) in SCHEMAS[tab].items():
+        # The column name itself wins over its aliases; the first alias present is used
+        for spelling in (name,) + aliases:
+            header = next((h for h in headers if stripped[h] == spelling and h not in taken), None)
+            if header is not None:
+                mapping[header] = name
+                taken.add(header)
+                break
+    return mapping
+
+def _read_header(raw: bytes) -> List[str]:
+    reader = csv.reader(io.TextIOWrapper(io.BytesIO(raw), encoding='utf-8-sig', newline=''))
+    return next(reader, [])
+
+def _present(values: pd.Series) -> pd.Series:
+    """Mask of the cells holding a value: neither missing nor blank."""
+    return values.notna() & (values.astype(str).str.strip() != '')
+
+def _detect_date_format(values: pd.Series) -> Optional[str]:
+    sample = values[_present(values)]
+    return guess_datetime_format(str(sample.iloc[0]).strip()) if not sample.empty else None
+
+def _to_datetime(tab: str, column: str, values: pd.Series) -> pd.Series:
+    """Parse dates with the tab's cached format, detecting it on first use or when it stops matching."""
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values
+    key = (tab, column)
+    fmt = _date_formats.get(key)
+    if fmt is not None:
+        parsed = pd.to_datetime(values, format=fmt, errors='coerce')
+        # Every non-blank cell parsed: the format still matches
+        if parsed.notna().sum() == _present(values).sum():
+            return parsed
+    fmt = _detect_date_format(values)
+    if fmt is None:
+        return pd.to_datetime(values, errors='coerce')
+    _date_formats[key] = fmt
+    return pd.to_datetime(values, format=fmt, errors='coerce')
+
+def _read_typed(tab: str, raw: bytes, mapping: Dict[str, str]) -> pd.DataFrame:
+    """Read CSV bytes with pyarrow, converting the schema's columns while parsing."""
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+
+    schema = SCHEMAS[tab]
+    column_types = {}
+    timestamp_parsers = []
+    for header, name in mapping.items():
+        if name not in schema:
+            continue
+        kind = schema[name][1]
+        if kind == 'number':
+            column_types[header] = pa.float64()
+        elif kind == 'category':
+            column_types[header] = pa.dictionary(pa.int32(), pa.string())
+        elif kind == 'string':
+            column_types[header] = pa.string()
+        elif kind == 'date':
+            # Read as text until this column's format is known
+            fmt = _date_formats.get((tab, name))
+            column_types[header] = pa.timestamp('us') if fmt else pa.string()
+            if fmt:
+                timestamp_parsers.append(fmt)
+    table = pa_csv.read_csv(io.BytesIO(raw), convert_options=pa_csv.ConvertOptions(
+        column_types=column_types, timestamp_parsers=timestamp_parsers or None, strings_can_be_null=True))
+    return table.to_pandas()
+
+@tracing.traced('sheets.parse_csv')
+def parse_csv(tab: str, raw: bytes) -> pd.DataFrame:
+    """
+    Parse a tab's raw CSV export into its normalized frame.
+
+    Parameters
+    ----------
+    tab : str
+        Tab key (a key of SCHEMAS)
+    raw : bytes
+        CSV content, header row first
+
+    Returns
+    -------
+    pd.DataFrame
+        Columns renamed and typed per SCHEMAS[tab]
+    """
+    if not raw or not raw.strip():
+        return pd.DataFrame()
+
+    df = None
+    if PYARROW_AVAILABLE:
+        import pyarrow as pa
+        try:
+            df = _read_typed(tab, raw, _resolve_columns(tab, tuple(_read_header(raw))))
+        except (pa.ArrowInvalid, UnicodeDecodeError):
+            # A value that does not fit its column type (e.g. text in an
+            # amount, a changed date format): read as text and coerce below
+            df = None
+    if df is None:
+        df = pd.read_csv(io.BytesIO(raw), dtype=str)
+    return prepare(tab, df.dropna(how='all'))
+
+def prepare(tab: str, df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Normalize a frame read from a tab to the database column names and types.
+
+    Columns already of the right type (from ``parse_csv``) are left as is.
+    """
+    if not len(df.columns):
         return df
-    
-    # Map columns
-    column_mapping = {
-        '代號': 'symbol',
-        'Symbol': 'symbol',
-        '購買日期': 'buy_date',
-        'Buy Date': 'buy_date',
-        '買入價格': 'buy_price',
-        'Buy Price': 'buy_price',
-        '數量': 'quantity',
-        'Quantity': 'quantity',
-        '手續費': 'broker_fee',
-        'Broker Fee': 'broker_fee',
-        '交易費': 'transaction_fee',
-        'Transaction Fee': 'transaction_fee',
-        '狀態': 'status',
-        'Status': 'status'
-    }
-    
-    df.columns = df.columns.str.strip()
-    for old_name, new_name in column_mapping.items():
-        if old_name in df.columns and new_name not in df.columns:
-            df.rename(columns={old_name: new_name}, inplace=True)
-    
+
+    df = df.rename(columns=_resolve_columns(tab, tuple(df.columns)))
+    for name, (_, kind, fill) in SCHEMAS[tab].items():
+        if name not in df.columns:
+            continue
+        values = df[name]
+        if kind == 'date':
+            df[name] = _to_datetime(tab, name, values)
+        elif kind == 'number':
+            if not pd.api.types.is_float_dtype(values):
+                values = pd.to_numeric(values, errors='coerce').astype(float)
+            df[name] = values if fill is None else values.fillna(fill)
+        elif kind == 'category' and not isinstance(values.dtype, pd.CategoricalDtype):
+            df[name] = values.astype('category')
+
     # Add id if missing
     if 'id' not in df.columns:
         df.insert(0, 'id', range(1, len(df) + 1))
-    
-    # Ensure numeric columns
-    numeric_cols = ['buy_price', 'quantity', 'broker_fee', 'transaction_fee']
-    for col in numeric_cols:
-        if col in df.columns:
-            df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
-    
-    # Filter by status if exists
-    if 'status' in df.columns:
-        df = df[df['status'].str.upper().isin(['HELD', '持有', '']) | df['status'].isna()]
-    
+
+    if tab == 'stocks' and 'status' in df.columns:
+        # Only lots still held
+        status = df['status'].astype('string')
+        df = df[status.str.upper().isin(['HELD', '持有', '']) | status.isna()]
     return df
 
+@tracing.traced('sheets.get_tab')
+def get_tab(tab: str) -> pd.DataFrame:
+    """Download and parse one tab (public export first, then gspread)."""
+    name = SHEET_NAMES.get(tab, tab.capitalize())
+    raw = fetch_sheets_csv([name])[name]
+    return parse_csv(tab, raw) if raw else pd.DataFrame()
+
+def get_transactions_sheet() -> pd.DataFrame:
+    """Get transactions data from Google Sheets."""
+    return get_tab('transactions')
+
+def get_accounts_sheet() -> pd.DataFrame:
+    """Get accounts data from Google Sheets."""
+    return get_tab('accounts')
+
+def get_stocks_sheet() -> pd.DataFrame:
+    """Get stocks data from Google Sheets."""
+    return get_tab('stocks')
+
 def get_categories_sheet() -> pd.DataFrame:
     """Get categories data from Google Sheets."""
-    df = get_sheet_data(SHEET_NAMES.get('categories', 'Categories'))
-    
-    if df.empty:
-        return df
-    
-    # Map columns
-    column_mapping = {
-        '名稱': 'name',
-        'Name': 'name',
-        '類型': 'type',
-        'Type': 'type'
-    }
-    
-    df.columns = df.columns.str.strip()
-    for old_name, new_name in column_mapping.items():
-        if old_name in df.columns and new_name not in df.columns:
-            df.rename(columns={old_name: new_name}, inplace=True)
-    
-    # Add id if missing
-    if 'id' not in df.columns:
-        df.insert(0, 'id', range(1, len(df) + 1))
-    
-    return df
+    return get_tab('categories')
 
 def get_budgets_sheet() -> pd.DataFrame:
     """Get budgets data from Google Sheets."""
-    df = get_sheet_data(SHEET_NAMES.get('budgets', 'Budgets'))
-    
-    if df.empty:
-        return df
-    
-    # Map columns
-    column_mapping = {
-        '月份': 'month',
-        'Month': 'month',
-        '金額': 'amount',
-        'Amount': 'amount'
-    }
-    
-    df.columns = df.columns.str.strip()
-    for old_name, new_name in column_mapping.items():
-        if old_name in df.columns and new_name not in df.columns:
-            df.rename(columns={old_name: new_name}, inplace=True)
-    
-    # Ensure amount is numeric
-    if 'amount' in df.columns:
-        df['amount'] = pd.to_numeric(df['amount'], errors='coerce').fillna(0)
-    
-    return df
-
+    return get_tab('budgets')
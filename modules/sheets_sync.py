@@ -0,0 +1,132 @@
+"""
+Incremental Google Sheets sync into local SQLite.
+
+Each tab is downloaded at most once per SYNC_INTERVAL_SECONDS, and all due
+tabs are downloaded together in one concurrent round. The raw
+content is hashed and only re-parsed and re-ingested into its local
+``sheet_<tab>`` mirror table when the hash changed. All Sheets-mode reads
+are served from these mirrors; once a mirror exists, due syncs run as the
+SYNC_JOB background job and reads don't wait for them.
+
+To test against a local HTTP stand-in, point ``sheets.CSV_EXPORT_URL`` at a
+server that serves CSV fixtures, e.g. ``"http://127.0.0.1:8000/{sheet_name}.csv"``.
+"""
+import hashlib
+import threading
+import time
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+from modules import jobs, sheets, tracing
+
+SYNC_INTERVAL_SECONDS = 60
+# Longest reads of never-synced tabs wait for the first sync; after that
+# it renders the empty mirror and the sidebar status reruns the page once
+# the sync finishes
+FIRST_SYNC_TIMEOUT_SECONDS = 15
+
+# Background job key (see modules.jobs)
+SYNC_JOB = ('sheets.sync',)
+
+# Tab keys; their columns and types are declared in sheets.SCHEMAS
+TABS = list(sheets.SCHEMAS)
+
+_tab_locks = {tab: threading.Lock() for tab in TABS}
+
+def _sheet_name(tab: str) -> str:
+    return sheets.SHEET_NAMES.get(tab, tab.capitalize())
+
+def fetch_tab(tab: str) -> Optional[bytes]:
+    """Raw CSV content of a tab: public export first, then gspread."""
+    return sheets.fetch_sheets_csv([_sheet_name(tab)])[_sheet_name(tab)]
+
+@tracing.traced('sheets.parse_tab')
+def parse_tab(tab: str, raw: bytes) -> pd.DataFrame:
+    """Parse raw CSV content into the normalized frame for ``tab``."""
+    return sheets.parse_csv(tab, raw)
+
+def _is_due(state, now: float) -> bool:
+    return state is None or now - state['checked_at'] >= SYNC_INTERVAL_SECONDS
+
+def _ingest(tab: str, raw: Optional[bytes], state, now: float) -> bool:
+    import database as db
+
+    if raw is None:
+        # Keep serving the last good mirror; try again next interval
+        db.mark_sheet_checked(tab, now)
+        return False
+
+    content_hash = hashlib.sha256(raw).hexdigest()
+    if state and state['content_hash'] == content_hash:
+        db.mark_sheet_checked(tab, now)
+        return False
+
+    db.save_sheet_mirror(tab, parse_tab(tab, raw), content_hash, now)
+    return True
+
+@tracing.traced('sheets.sync_tabs')
+def sync_tabs(tabs: List[str], force: bool = False) -> Dict[str, bool]:
+    """Bring the mirrors of ``tabs`` up to date.
+
+    All tabs that are due (or every tab, with ``force``) are downloaded in
+    one concurrent round.
+
+    Returns
+    -------
+    dict
+        tab -> True if its content changed and was re-ingested.
+    """
+    import database as db
+
+    changed = {tab: False for tab in tabs}
+    locks = [_tab_locks[tab] for tab in sorted(tabs)]
+    for lock in locks:
+        lock.acquire()
+    try:
+        now = time.time()
+        states = {tab: db.get_sheet_sync_state(tab) for tab in tabs}
+        due = [tab for tab in tabs if force or _is_due(states[tab], now)]
+        if not due:
+            return changed
+
+        raws = sheets.fetch_sheets_csv([_sheet_name(tab) for tab in due])
+        for tab in due:
+            changed[tab] = _ingest(tab, raws[_sheet_name(tab)], states[tab], now)
+        return changed
+    finally:
+        for lock in reversed(locks):
+            lock.release()
+
+def sync_tab(tab: str, force: bool = False) -> bool:
+    """Bring one tab's mirror up to date; True if it changed."""
+    return sync_tabs([tab], force)[tab]
+
+def sync_all(force: bool = False) -> Dict[str, bool]:
+    """Sync every tab in one concurrent round; returns tab -> whether it changed."""
+    return sync_tabs(list(TABS), force)
+
+def sync_in_background(force: bool = False):
+    """Run sync_all as the SYNC_JOB background job, joining one already running."""
+    return jobs.submit(SYNC_JOB, sync_all, force, version=force)
+
+def read_tab(tab: str) -> pd.DataFrame:
+    """Read a tab from its local mirror, syncing in the background if the check is due.
+
+    A due check refreshes every due tab at once, so a cold load costs one
+    concurrent round instead of one download per tab. Only a tab that was
+    never synced waits for it, and for at most FIRST_SYNC_TIMEOUT_SECONDS;
+    otherwise the current (possibly still empty) mirror is returned and the
+    new content shows up on a later read.
+    """
+    import database as db
+
+    state = db.get_sheet_sync_state(tab)
+    if _is_due(state, time.time()):
+        job = sync_in_background()
+        if state is None:
+            # Counted from the run's submission, so the tabs of one page
+            # share a single timeout
+            waited = time.time() - job['submitted_at']
+            jobs.wait(SYNC_JOB, max(FIRST_SYNC_TIMEOUT_SECONDS - waited, 0))
+    return db.read_sheet_mirror(tab, sheets.date_columns(tab))
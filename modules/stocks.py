@@ -1,18 +1,10 @@
 import streamlit as st
 import pandas as pd
-import yfinance as yf
 import database as db
-from modules import utils
+from modules import utils, prices, jobs
 
 def get_current_price(symbol):
-    try:
-        ticker = yf.Ticker(symbol)
-        history = ticker.history(period="1d")
-        if not history.empty:
-            return history['Close'].iloc[-1]
-    except Exception:
-        pass
-    return None
+    return prices.get_prices([symbol]).get(symbol)
 
 def view():
     st.header("股票投資組合")
@@ -47,17 +39,15 @@ def view():
         df['total_cost'] = (df['buy_price'] * df['quantity']) + df['broker_fee'] + df['transaction_fee']
         df['avg_cost'] = df['total_cost'] / df['quantity']
         
-        # Fetch current prices
-        unique_symbols = df['symbol'].unique()
+        # Fetch current prices (cached quotes are served immediately; stale
+        # and missing ones are fetched in the background and shown once ready)
+        unique_symbols = df['symbol'].unique().tolist()
         current_prices = {}
         
-        # Show a progress bar for fetching prices if there are many
         if len(unique_symbols) > 0:
-            with st.spinner('正在取得目前股價...'):
-                for sym in unique_symbols:
-                    price = get_current_price(sym)
-                    if price:
-                        current_prices[sym] = price
+            current_prices = prices.get_prices(unique_symbols, wait=False)
+            utils.job_status(jobs.status(prices.QUOTES_JOB), "股價",
+                             updated_at=prices.quotes_fetched_at(unique_symbols))
         
         df['current_price'] = df['symbol'].map(current_prices)
         df['market_value'] = df['current_price'] * df['quantity']
@@ -71,10 +61,8 @@ def view():
         
         # Format columns
         display_df['數量'] = display_df['數量'].apply(lambda x: f"{x:.2f}")
-        display_df['平均成本'] = display_df['平均成本'].apply(lambda x: utils.format_currency(x) if pd.notna(x) and isinstance(x, (int, float)) else "N/A")
-        display_df['目前價格'] = display_df['目前價格'].apply(lambda x: utils.format_currency(x) if pd.notna(x) and isinstance(x, (int, float)) else "N/A")
-        display_df['市值'] = display_df['市值'].apply(lambda x: utils.format_currency(x) if pd.notna(x) and isinstance(x, (int, float)) else "N/A")
-        display_df['損益'] = display_df['損益'].apply(lambda x: utils.format_currency(x) if pd.notna(x) and isinstance(x, (int, float)) else "N/A")
+        money_cols = ['平均成本', '目前價格', '市值', '損益']
+        display_df[money_cols] = utils.format_currencies(display_df[money_cols])
         display_df['報酬率'] = display_df['報酬率'].apply(lambda x: f"{x:.2f}%" if pd.notna(x) and isinstance(x, (int, float)) else "N/A")
         
         st.dataframe(display_df, use_container_width=True)
@@ -88,6 +76,20 @@ def view():
         col1.metric("總投資金額", utils.format_currency(total_invested))
         col2.metric("目前市值", utils.format_currency(total_value), delta=utils.format_currency(total_pl))
         col3.metric("總報酬率", f"{(total_pl/total_invested)*100:.2f}%" if total_invested > 0 else "0%")
-        
+
+        # Price history used by the dashboard asset trend
+        with st.expander("歷史股價"):
+            if st.button("更新歷史股價"):
+                prices.update_history_in_background(df)
+            history_job = jobs.status(prices.HISTORY_JOB)
+            utils.job_status(history_job, "歷史股價")
+            if history_job and history_job['status'] == jobs.DONE:
+                st.caption(f"上次更新新增 {history_job['result']} 筆歷史股價。")
+
+            uploaded = st.file_uploader("匯入歷史股價 CSV（欄位：symbol, date, close）", type="csv")
+            if uploaded is not None and st.button("匯入"):
+                rows = prices.load_price_history_csv(uploaded)
+                st.success(f"已匯入 {rows} 筆歷史股價。")
+
     else:
         st.info("投資組合中沒有股票。")
@@ -0,0 +1,219 @@
+"""
+Lightweight tracing of page renders.
+
+A span times one piece of work (a database call, a Sheets download, a
+price fetch, building a chart) and records how many rows it returned.
+Spans nest: a span started while another is open becomes its child.
+
+Spans are only recorded while something is listening:
+
+* ``collect()`` gathers the spans of one Streamlit rerun (the sidebar
+  performance panel);
+* setting the ``LEDGER_TRACE_FILE`` environment variable appends every
+  span to that file as one JSON object per line.
+
+With neither active, a ``traced`` function costs one extra call and a
+context variable lookup, and ``span`` yields a throwaway dict.
+"""
+import contextvars
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from functools import wraps
+
+import pandas as pd
+
+TRACE_FILE_ENV = "LEDGER_TRACE_FILE"
+
+# Span kinds, by name prefix, for the per-kind breakdown
+KINDS = {'db': 'SQLite', 'analytics': 'DuckDB', 'sheets': 'Google Sheets', 'prices': '股價下載', 'chart': '圖表'}
+
+_spans = contextvars.ContextVar('tracing_spans', default=None)    # list collecting the current rerun
+_context = contextvars.ContextVar('tracing_context', default=None)  # {'trace': id, 'page': name}
+_parent = contextvars.ContextVar('tracing_parent', default=None)   # innermost open span
+
+_trace_file = os.environ.get(TRACE_FILE_ENV) or None
+_file = None
+_file_lock = threading.Lock()
+
+def set_trace_file(path):
+    """Append spans to ``path`` as JSON lines (None stops writing)."""
+    global _trace_file, _file
+    with _file_lock:
+        if _file is not None:
+            _file.close()
+            _file = None
+        _trace_file = path or None
+
+def enabled():
+    """Whether spans started now would be recorded."""
+    return _trace_file is not None or _spans.get() is not None
+
+def _kind(name):
+    return name.split('.', 1)[0]
+
+def _rows(result):
+    if isinstance(result, (pd.DataFrame, pd.Series, list, tuple, dict)):
+        return len(result)
+    return None
+
+def _write(record):
+    global _file
+    line = json.dumps({k: v for k, v in record.items() if not k.startswith('_')},
+                      ensure_ascii=False, default=str)
+    with _file_lock:
+        if _trace_file is None:
+            return
+        if _file is None:
+            _file = open(_trace_file, 'a', encoding='utf-8')
+        _file.write(line + '\n')
+        _file.flush()
+
+@contextmanager
+def span(name, **attrs):
+    """
+    Time the enclosed block as a span called ``name``.
+
+    Yields the span's record; set ``record['rows']`` (or any other key) to
+    attach it. When tracing is off the record is a throwaway dict.
+
+    Parameters
+    ----------
+    name: str
+        Dotted name; the part before the first dot is the kind
+        (db, sheets, prices, chart, page).
+    attrs:
+        Extra fields stored with the span.
+    """
+    spans = _spans.get()
+    if spans is None and _trace_file is None:
+        yield {}
+        return
+
+    parent = _parent.get()
+    kinds = (parent['_kinds'] if parent else frozenset()) | {_kind(name)}
+    record = {
+        'name': name,
+        'depth': parent['depth'] + 1 if parent else 0,
+        'rows': None,
+        **(_context.get() or {}),
+        **attrs,
+        # Outermost span of its kind; nested spans of the same kind are
+        # already included in its time
+        '_outer': parent is None or _kind(name) not in parent['_kinds'],
+        '_kinds': kinds,
+    }
+    token = _parent.set(record)
+    record['start'] = time.time()
+    started = time.perf_counter()
+    try:
+        yield record
+    except BaseException as e:
+        record['error'] = type(e).__name__
+        raise
+    finally:
+        record['duration_ms'] = (time.perf_counter() - started) * 1000
+        _parent.reset(token)
+        if spans is not None:
+            spans.append(record)
+        if _trace_file is not None:
+            _write(record)
+
+def traced(name=None):
+    """Record every call of the decorated function as a span.
+
+    The span's row count is the length of the returned DataFrame, Series,
+    list, tuple or dict.
+    """
+    def decorator(func):
+        label = name or f"{func.__module__}.{func.__qualname__}"
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if _trace_file is None and _spans.get() is None:
+                return func(*args, **kwargs)
+            with span(label) as record:
+                result = func(*args, **kwargs)
+                record['rows'] = _rows(result)
+                return result
+        return wrapper
+    return decorator
+
+def instrument(namespace, prefix, exclude=()):
+    """Wrap every public function defined in a module namespace with ``traced``.
+
+    Parameters
+    ----------
+    namespace: dict
+        The module's ``globals()``.
+    prefix: str
+        Span name prefix, e.g. 'db' for 'db.get_accounts'.
+    exclude: iterable of str
+        Names to leave alone (per-row helpers, context managers).
+    """
+    module = namespace['__name__']
+    for attr, value in list(namespace.items()):
+        if (attr.startswith('_') or attr in exclude or not callable(value) or isinstance(value, type)
+                or getattr(value, '__module__', None) != module):
+            continue
+        namespace[attr] = traced(f"{prefix}.{attr}")(value)
+
+@contextmanager
+def collect(page=None, keep=True):
+    """
+    Treat the enclosed block as one traced rerun.
+
+    Spans started inside are tagged with a new trace id and ``page``.
+
+    Parameters
+    ----------
+    page: str, optional
+        Page being rendered.
+    keep: bool
+        Gather the spans into the yielded list (for the sidebar panel).
+        Without it spans still go to the trace file when one is set.
+
+    Yields
+    ------
+    list
+        The finished span records, in the order they ended.
+    """
+    spans = []
+    tokens = [(_context, _context.set({'trace': uuid.uuid4().hex[:12], 'page': page}))]
+    if keep:
+        tokens.append((_spans, _spans.set(spans)))
+    try:
+        yield spans
+    finally:
+        for var, token in reversed(tokens):
+            var.reset(token)
+
+def summarize(spans):
+    """
+    Per-span table and per-kind totals of a collected rerun.
+
+    Returns
+    -------
+    tuple of pandas.DataFrame
+        (spans in start order with name, depth, duration_ms and rows;
+        totals per kind in ms, where 'other' is the time of the top-level
+        spans not covered by any kind, i.e. pandas and Streamlit work)
+    """
+    columns = ['name', 'depth', 'duration_ms', 'rows']
+    if not spans:
+        return pd.DataFrame(columns=columns), pd.DataFrame(columns=['kind', 'duration_ms', 'count'])
+
+    table = pd.DataFrame(spans).sort_values('start', kind='stable')
+    kinds = table['name'].map(_kind)
+    outer = table['_outer'] & kinds.isin(list(KINDS))
+    totals = (table[outer].assign(kind=kinds[outer].map(KINDS))
+              .groupby('kind', sort=False)['duration_ms'].agg(['sum', 'count'])
+              .rename(columns={'sum': 'duration_ms'}).reset_index())
+    top = table.loc[table['depth'] == 0, 'duration_ms'].sum()
+    other = top - totals['duration_ms'].sum()
+    totals = pd.concat([totals, pd.DataFrame([{'kind': 'other', 'duration_ms': max(other, 0.0), 'count': None}])],
+                       ignore_index=True).astype({'count': 'Int64'})
+    return table[columns].reset_index(drop=True), totals
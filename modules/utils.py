@@ -1,3 +1,9 @@
+import math
+import numbers
+import time
+
+import numpy as np
+import pandas as pd
 import streamlit as st
 
 # Legacy hardcoded categories - kept for reference but not used
@@ -27,14 +33,105 @@ PAYMENT_METHODS = [
     "現金", "信用卡", "Go Card", "Cube Card", "iLeo Card", "Line Bank", "Richart", "金融卡", "銀行轉帳"
 ]
 
+CURRENCY_PREFIX = "NT$"
+_CURRENCY_FORMAT = (CURRENCY_PREFIX + "{:,.2f}").format
+
 def format_currency(amount):
-    # if amount is float or int, return the formatted currency
-    if isinstance(amount, float) or isinstance(amount, int):
-        return f"NT${amount:,.2f}"
-    # if amount is NaN, return 0
+    # numbers.Real covers numpy scalars (np.int64, np.float32, ...) as well
+    if isinstance(amount, numbers.Real) and not isinstance(amount, bool) and math.isfinite(amount):
+        return _CURRENCY_FORMAT(float(amount))
+    # if amount is NaN or not a number, return 0
     return "0"
 
+def format_currencies(values, na_rep="N/A"):
+    """Format a whole Series or DataFrame of amounts at once.
+    
+    Produces the same text as format_currency, but converts the column to a
+    float array once and masks missing values with numpy instead of calling
+    a Python function on every cell through ``apply``.
+    
+    Parameters
+    ----------
+    values: pandas.Series or pandas.DataFrame
+        Amounts of any numeric dtype (numpy, nullable or object); cells that
+        are not numbers count as missing.
+    na_rep: str
+        Text for missing, infinite or non-numeric values.
+    
+    Returns
+    -------
+    pandas.Series or pandas.DataFrame
+        Formatted strings, with the same shape and index as ``values``.
+    """
+    if isinstance(values, pd.DataFrame):
+        return values.apply(format_currencies, na_rep=na_rep)
+    
+    series = pd.Series(values)
+    numeric = pd.to_numeric(series, errors='coerce').to_numpy(dtype=float, na_value=np.nan)
+    valid = np.isfinite(numeric)
+    formatted = np.full(len(numeric), na_rep, dtype=object)
+    formatted[valid] = [_CURRENCY_FORMAT(x) for x in numeric[valid].tolist()]
+    return pd.Series(formatted, index=series.index, name=series.name)
+
 def load_css(file_name):
     with open(file_name) as f:
         st.markdown(f'<style>{f.read()}</style>', unsafe_allow_html=True)
 
+
+# Seconds between status checks while a background job is running
+JOB_POLL_SECONDS = 1.0
+
+def format_age(seconds):
+    """Elapsed time in words, e.g. '3 分鐘前'."""
+    if seconds < 60:
+        return "剛剛"
+    if seconds < 3600:
+        return f"{int(seconds // 60)} 分鐘前"
+    if seconds < 86400:
+        return f"{int(seconds // 3600)} 小時前"
+    return f"{int(seconds // 86400)} 天前"
+
+def job_status(job, label, updated_at=None):
+    """Show how fresh a background job's result is, and its progress while it runs.
+    
+    While the job is queued or running, its progress is polled every
+    JOB_POLL_SECONDS and the page reruns once it finishes, so the new result
+    replaces the one on screen.
+    
+    Parameters
+    ----------
+    job: dict or None
+        Snapshot from modules.jobs (status, latest or submit).
+    label: str
+        What the job produces, e.g. '股價'.
+    updated_at: float, optional
+        Unix time the data on screen dates from, when it wasn't produced by
+        a job in this process (e.g. quotes read from the database).
+    """
+    from modules import jobs
+
+    result_at = job['result_at'] if job and job['result_at'] else updated_at
+    if job and job['status'] in (jobs.QUEUED, jobs.RUNNING):
+        _job_progress(job['key'], label, result_at)
+    elif job and job['status'] == jobs.FAILED:
+        shown = f"，目前顯示 {format_age(time.time() - result_at)}的資料" if result_at else ""
+        st.caption(f"⚠️ {label}更新失敗：{job['error']}{shown}")
+    elif result_at:
+        st.caption(f"{label}更新於 {format_age(time.time() - result_at)}")
+
+@st.fragment(run_every=JOB_POLL_SECONDS)
+def _job_progress(key, label, result_at):
+    from modules import jobs
+
+    job = jobs.status(key)
+    if job is None or job['status'] not in (jobs.QUEUED, jobs.RUNNING):
+        st.rerun()
+    text = f"{label}更新中…"
+    if result_at:
+        text += f"（目前顯示 {format_age(time.time() - result_at)}的資料）"
+    if job['message']:
+        text += f" {job['message']}"
+    if job['progress'] is not None:
+        st.progress(job['progress'], text=text)
+    else:
+        st.caption(text)
@@ -0,0 +1,20 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+@pytest.fixture
+def temp_db(tmp_path, monkeypatch):
+    """A fresh SQLite ledger in ``tmp_path``, set as database.DB_FILE."""
+    import database as db
+
+    db.close_connections()
+    monkeypatch.setattr(db, 'USE_GOOGLE_SHEETS', False)
+    monkeypatch.setattr(db, 'DB_FILE', str(tmp_path / 'money.db'))
+    db.init_db()
+    yield db
+    db.close_connections()
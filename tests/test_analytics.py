@@ -0,0 +1,59 @@
+import pandas as pd
+import pytest
+
+from modules import analytics, cache
+
+pytest.importorskip('duckdb')
+
+ROWS = [
+    ('2024-12-30', 'Expense', 'Food', 120.5, '現金', 'Lunch', 1),
+    ('2024-12-31 20:15:00', 'Income', 'Salary', 50000.0, '現金', None, 1),
+    ('2025-01-03', 'Expense', 'Food', 80.25, '信用卡', 'Dinner', 2),
+    ('2025-01-03', 'Expense', 'Transport', 30.0, '現金', 'Bus', None),
+    ('2025-02-14', 'Expense', 'Food', 999.99, '信用卡', 'Gift', 2),
+]
+
+REPORTS = {
+    'daily': lambda db: db.get_daily_totals(),
+    'daily_range': lambda db: db.get_daily_totals('2025-01-01', '2025-02-01'),
+    'categories': lambda db: db.get_category_totals(),
+    'expense_categories': lambda db: db.get_category_totals('Expense', '2024-12-31', '2025-03-01'),
+}
+
+def _reports(db, monkeypatch, engine):
+    """Every report, read through DuckDB when ``engine`` is true and through SQLite otherwise."""
+    with monkeypatch.context() as m:
+        if not engine:
+            m.setattr(db, '_analytics', lambda: None)
+        cache.clear()
+        frames = {name: report(db) for name, report in REPORTS.items()}
+    cache.clear()
+    # Row order within equal totals is unspecified
+    return {name: df.astype({'type': str} if 'type' in df else {})
+                    .sort_values(list(df.columns)[:3], ignore_index=True)
+            for name, df in frames.items()}
+
+def assert_engines_agree(db, monkeypatch):
+    duckdb_reports = _reports(db, monkeypatch, engine=True)
+    sqlite_reports = _reports(db, monkeypatch, engine=False)
+    for name in REPORTS:
+        pd.testing.assert_frame_equal(duckdb_reports[name], sqlite_reports[name], check_dtype=False, obj=name)
+    return sqlite_reports
+
+def test_reports_match_sqlite_after_a_write(temp_db, monkeypatch):
+    db = temp_db
+    for row in ROWS:
+        db.add_transaction(*row)
+
+    reports = assert_engines_agree(db, monkeypatch)
+    assert reports['daily']['amount_cents'].sum() == 5123074
+    assert sorted(p.name for p in analytics.parquet_dir().glob('year=*')) == ['year=2024', 'year=2025']
+    assert analytics.refresh() == []
+
+    # A write only marks its own year stale, and both engines see it
+    db.add_transaction('2025-01-03', 'Expense', 'Food', 19.75, '現金', 'Snack', 1)
+    assert analytics.refresh() == ['2025']
+    reports = assert_engines_agree(db, monkeypatch)
+    food = reports['categories'].set_index('category').loc['Food']
+    assert food['total'] == pytest.approx(1220.49)
+    assert food['count'] == 4
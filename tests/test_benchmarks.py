@@ -0,0 +1,28 @@
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+
+def _run(*args):
+    return subprocess.run([sys.executable, '-m', 'benchmarks.run', '--sizes', '2000', '--repeat', '1', *args],
+                          cwd=REPO_DIR, capture_output=True, text=True, timeout=600)
+
+def test_run_end_to_end(tmp_path):
+    base = tmp_path / 'base.json'
+    first = _run('--data-dir', str(tmp_path), '--output', str(base))
+    assert first.returncode == 0, first.stderr
+
+    results = json.loads(base.read_text())
+    timings = results['results']['2000']
+    assert set(timings) >= {'get_all_transactions', 'calculate_monthly_assets', 'cold_start_dashboard'}
+    assert timings['get_all_transactions']['result_rows'] == 2000
+    assert all(len(timing['runs']) == 1 and timing['min'] > 0 for timing in timings.values())
+    assert (tmp_path / 'ledger-2000-seed0.db').exists()
+
+    # Against itself with a generous threshold: every benchmark compared, none flagged
+    second = _run('--data-dir', str(tmp_path), '--benchmarks', 'daily_totals', 'category_totals',
+                  '--compare', str(base), '--threshold', '100')
+    assert second.returncode == 0, second.stderr
+    assert 'daily_totals' in second.stdout and 'REGRESSION' not in second.stdout
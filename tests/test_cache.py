@@ -0,0 +1,51 @@
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from modules import cache
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+
+def test_write_from_another_process_invalidates(temp_db):
+    db = temp_db
+    db.add_transaction('2025-01-03', 'Expense', 'Food', 120.0, '現金', 'Lunch')
+    assert len(db.get_all_transactions()) == 1
+
+    script = ("import sys, database as db; db.DB_FILE = sys.argv[1]; "
+              "db.add_transaction('2025-01-04', 'Expense', 'Food', 80.0, '現金', 'Dinner')")
+    subprocess.run([sys.executable, '-c', script, db.DB_FILE], cwd=REPO_DIR, check=True)
+
+    assert len(db.get_all_transactions()) == 2
+
+@pytest.mark.parametrize('write', [
+    lambda db: db.save_quotes({'0050.TW': 150.0}, time.time()),
+    lambda db: db.mark_sheet_checked('transactions', time.time()),
+], ids=['save_quotes', 'mark_sheet_checked'])
+def test_quote_and_sync_writes_keep_cached_reads(temp_db, write):
+    db = temp_db
+    db.add_transaction('2025-01-03', 'Expense', 'Food', 120.0, '現金', 'Lunch')
+    db.get_all_transactions()
+    db.get_account_balances()
+    assert cache.stats()['entries'] == 2
+
+    write(db)
+    # A flush would leave only the entry this read stores again
+    db.get_all_transactions()
+    assert cache.stats()['entries'] == 2
+
+def test_changing_a_returned_frame_leaves_the_cache_intact(temp_db):
+    db = temp_db
+    db.add_transaction('2025-01-03', 'Expense', 'Food', 120.0, '現金', 'Lunch')
+    expected = db.get_all_transactions()
+
+    df = db.get_all_transactions()
+    df.loc[df.index[0], 'amount'] = -1.0
+    df['category'] = df['category'].str.upper()
+    df['extra'] = 1
+    df.drop(columns=['description'], inplace=True)
+
+    pd.testing.assert_frame_equal(db.get_all_transactions(), expected)
@@ -0,0 +1,82 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from modules import charts
+from modules.dashboard import calculate_monthly_assets
+
+def _daily_assets(n):
+    days = pd.period_range('2023-01-01', periods=n, freq='D')
+    values = np.linspace(1000, 2000, n)
+    values[n // 2] = 10_000  # a spike LTTB must keep
+    return pd.DataFrame({'month': days.astype(str), 'total_assets': values})
+
+def test_lttb_keeps_endpoints_and_spike():
+    y = np.zeros(1000)
+    y[437] = 50
+    kept = charts.lttb(np.arange(1000), y, 100)
+    assert len(kept) == 100
+    assert kept[0] == 0 and kept[-1] == 999
+    assert 437 in kept
+    assert (np.diff(kept) > 0).all()
+
+@pytest.mark.parametrize('n', [401, 601, 2000])
+def test_line_downsamples_long_series_with_string_labels(n):
+    df = _daily_assets(n)
+    fig = charts.line(df, x='month', y='total_assets', markers=True)
+
+    x = list(fig.data[0].x)
+    assert len(x) <= charts.MAX_POINTS
+    assert x[0] == '2023-01-01' and x[-1] == df['month'].iloc[-1]
+    assert set(x) <= set(df['month'])
+    assert 10_000 in fig.data[0].y
+
+def test_downsample_weekly_period_labels_by_position():
+    weeks = pd.period_range('2015-01-05', periods=600, freq='W').astype(str)
+    df = pd.DataFrame({'month': weeks, 'total_assets': np.arange(600.0)})
+    thinned = charts.downsample(df, 'month', 'total_assets')
+    assert len(thinned) <= charts.MAX_POINTS
+    assert thinned['month'].is_monotonic_increasing
+    assert thinned['month'].iloc[0] == weeks[0]
+
+@pytest.mark.parametrize('freq', ['D', 'W'])
+def test_asset_trend_over_long_range_charts(freq):
+    # What the dashboard plots: calculate_monthly_assets over a ledger with
+    # activity every day for about eleven years
+    days = pd.date_range('2014-01-01', '2024-12-31', freq='D')
+    df_tx = pd.DataFrame({
+        'date': days,
+        'type': np.where(np.arange(len(days)) % 30 == 0, 'Income', 'Expense'),
+        'account_id': pd.array(np.ones(len(days), dtype=int), dtype='Int64'),
+        'amount_cents': np.where(np.arange(len(days)) % 30 == 0, 5_000_000, 12_300),
+    })
+    accounts = pd.DataFrame({'id': [1], 'name': ['現金'], 'type': ['General'], 'initial_balance': [0.0], 'balance': [4877.0]})
+    stocks = pd.DataFrame(columns=['symbol', 'buy_date', 'buy_price', 'quantity'])
+    trend = calculate_monthly_assets(df_tx, accounts, stocks, pd.Timestamp('2025-01-01').date(), freq=freq)
+    assert len(trend) > charts.MAX_POINTS
+
+    fig = charts.line(trend, x='month', y='total_assets')
+    assert len(fig.data[0].x) <= charts.MAX_POINTS
+
+def test_bar_resamples_long_daily_series():
+    days = pd.date_range('2020-01-01', '2024-12-31', freq='D')
+    df = pd.DataFrame({'date': days, 'amount': 1.0})
+    fig = charts.bar(df, x='date', y='amount', title='{period}支出趨勢')
+    assert len(fig.data[0].x) <= charts.MAX_BARS
+    assert fig.layout.title.text == '每月支出趨勢'
+    assert sum(fig.data[0].y) == len(days)
+
+def test_pie_folds_small_slices():
+    df = pd.DataFrame({'category': [f'c{i}' for i in range(20)] * 2, 'amount': list(range(1, 21)) * 2})
+    fig = charts.pie(df, values='amount', names='category')
+    labels = list(fig.data[0].labels)
+    assert len(labels) == charts.MAX_SLICES
+    assert labels[-1] == charts.OTHER_LABEL
+    assert sum(fig.data[0].values) == df['amount'].sum()
+
+def test_figures_are_cached_by_data():
+    df = _daily_assets(50)
+    first = charts.line(df, x='month', y='total_assets')
+    assert charts.line(df.copy(), x='month', y='total_assets') is first
+    changed = df.assign(total_assets=df['total_assets'] + 1)
+    assert charts.line(changed, x='month', y='total_assets') is not first
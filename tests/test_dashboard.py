@@ -0,0 +1,71 @@
+from datetime import date
+
+import pandas as pd
+import pytest
+
+from modules import dashboard
+
+ACCOUNTS = pd.DataFrame({'id': [1, 2], 'initial_balance': [1000.0, 500.0]})
+
+TRANSACTIONS = pd.DataFrame([
+    ('2025-01-10', 'Income', 1, 3000.0),
+    ('2025-01-20', 'Expense', 2, 200.0),
+    ('2025-01-31', 'Expense', 1, 100.0),
+    # February has no transactions
+    ('2025-03-05', 'Expense', 1, 50.0),
+    # Unknown accounts and other types never move the balance
+    ('2025-03-06', 'Expense', 99, 999.0),
+    ('2025-03-07', 'Transfer', 1, 10.0),
+], columns=['date', 'type', 'account_id', 'amount'])
+
+STOCKS = pd.DataFrame([
+    ('AAA', '2025-01-15', 10.0, 10.0),
+    ('AAA', '2025-03-01', 12.0, 5.0),
+    # Never priced: always valued at cost
+    ('BBB', '2025-01-05', 20.0, 2.0),
+], columns=['symbol', 'buy_date', 'buy_price', 'quantity'])
+
+PRICE_HISTORY = pd.DataFrame({'symbol': 'AAA', 'date': ['2025-01-30', '2025-03-20'], 'close': [11.0, 15.0]})
+
+@pytest.mark.parametrize('freq, end_date, expected', [
+    ('M', date(2025, 4, 15), {
+        '2025-01': 4200 + 10 * 11 + 40,
+        '2025-03': 4150 + 15 * 15 + 40,
+        # No transactions this month: carried over
+        '2025-04': 4150 + 15 * 15 + 40,
+    }),
+    ('W', date(2025, 4, 15), {
+        '2025-01-06/2025-01-12': 4500 + 40,
+        # No AAA close yet: valued at cost
+        '2025-01-20/2025-01-26': 4300 + 100 + 40,
+        '2025-01-27/2025-02-02': 4200 + 10 * 11 + 40,
+        '2025-03-03/2025-03-09': 4150 + 15 * 11 + 40,
+        '2025-04-14/2025-04-20': 4150 + 15 * 15 + 40,
+    }),
+    ('D', date(2025, 3, 7), {
+        '2025-01-10': 4500 + 40,
+        '2025-01-20': 4300 + 100 + 40,
+        '2025-01-31': 4200 + 10 * 11 + 40,
+        '2025-03-05': 4150 + 15 * 11 + 40,
+        '2025-03-06': 4150 + 15 * 11 + 40,
+        '2025-03-07': 4150 + 15 * 11 + 40,
+    }),
+])
+def test_calculate_monthly_assets(freq, end_date, expected):
+    assets = dashboard.calculate_monthly_assets(TRANSACTIONS, ACCOUNTS, STOCKS, end_date, freq, PRICE_HISTORY)
+    assert dict(zip(assets['month'], assets['total_assets'])) == expected
+
+    # Daily totals in cents, as the dashboard passes them, give the same result
+    daily = (TRANSACTIONS.assign(date=pd.to_datetime(TRANSACTIONS['date']), amount_cents=TRANSACTIONS['amount'] * 100)
+             .groupby(['date', 'type', 'account_id'], as_index=False)['amount_cents'].sum())
+    from_totals = dashboard.calculate_monthly_assets(daily, ACCOUNTS, STOCKS, end_date, freq, PRICE_HISTORY)
+    pd.testing.assert_frame_equal(from_totals, assets)
+
+def test_assets_without_price_history_use_cost():
+    assets = dashboard.calculate_monthly_assets(TRANSACTIONS, ACCOUNTS, STOCKS, date(2025, 4, 15))
+    assert assets['total_assets'].tolist() == [4200 + 100 + 40, 4150 + 160 + 40, 4150 + 160 + 40]
+
+def test_assets_without_transactions():
+    empty = TRANSACTIONS.head(0)
+    assets = dashboard.calculate_monthly_assets(empty, ACCOUNTS, STOCKS.head(0), date(2025, 4, 15))
+    assert assets.to_dict('list') == {'month': ['2025-04'], 'total_assets': [1500.0]}
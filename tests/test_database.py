@@ -0,0 +1,287 @@
+import sqlite3
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from modules import cache, expenses, utils
+
+def test_seeded_card_accounts_match_the_old_card_list(temp_db):
+    db = temp_db
+    accounts = db.get_accounts().set_index('name')['type']
+    # What the card page showed before it read accounts.type
+    old_cards = {m for m in utils.PAYMENT_METHODS if "Card" in m or m in ["Line Bank", "Richart"]}
+
+    assert set(accounts[accounts == 'Credit Card'].index) == old_cards
+    assert accounts['信用卡'] == 'General'
+
+def test_reassign_to_missing_category_changes_nothing(temp_db):
+    db = temp_db
+    db.add_transaction('2025-01-03', 'Expense', 'Food', 120.0, '現金', 'Lunch')
+    categories = db.get_categories().set_index('name')['id']
+    food, missing = int(categories['Food']), int(categories.max()) + 1
+
+    assert db.reassign_category(food, missing) is None
+    assert db.merge_categories(food, missing) is None
+    assert 'Food' in set(db.get_categories()['name'])
+    assert db.get_all_transactions()['category'].tolist() == ['Food']
+
+    assert db.merge_categories(food, int(categories['Transport'])) == 1
+    assert db.get_all_transactions()['category'].tolist() == ['Transport']
+
+def _schema(db):
+    with db.get_connection() as conn:
+        return conn.execute("SELECT type, name, sql FROM sqlite_master ORDER BY name").fetchall()
+
+def assert_rollups_match(db):
+    """The trigger-maintained tables agree with a recomputation from transactions."""
+    assert db.verify_account_balances().empty
+    with db.get_connection() as conn:
+        stored = conn.execute("""
+            SELECT year_month, type, category, account_id, total_cents, count FROM monthly_summary
+            WHERE count != 0 ORDER BY 1, 2, 3, 4
+        """).fetchall()
+        expected = conn.execute("""
+            SELECT substr(date, 1, 7), type, category, COALESCE(account_id, 0), SUM(amount_cents), COUNT(*)
+            FROM transactions GROUP BY 1, 2, 3, 4 ORDER BY 1, 2, 3, 4
+        """).fetchall()
+        assert stored == expected
+        # Raises if the search index doesn't match the transactions it indexes
+        conn.execute("INSERT INTO transactions_fts (transactions_fts) VALUES ('integrity-check')")
+        years = {year for year, in conn.execute("SELECT year FROM transaction_years")}
+        assert years >= {year for year, in conn.execute("SELECT DISTINCT substr(date, 1, 4) FROM transactions")}
+
+def _ledger_frame(n, account_id):
+    days = pd.date_range('2024-11-01', periods=n, freq='6h')
+    return pd.DataFrame({
+        'date': days.strftime('%Y-%m-%d'),
+        'type': np.where(np.arange(n) % 7 == 0, 'Income', 'Expense'),
+        'category': np.where(np.arange(n) % 3 == 0, 'Food', 'Transport'),
+        'amount': (np.arange(n) % 50 + 1) * 10.25,
+        'payment_method': '現金',
+        'description': [f'Bulk row {i}' for i in range(n)],
+        'account_id': np.where(np.arange(n) % 5 == 0, None, account_id),
+    })
+
+def test_bulk_insert_keeps_the_schema_and_the_rollups(temp_db):
+    db = temp_db
+    account_id = int(db.get_accounts().set_index('name').loc['現金', 'id'])
+    db.add_transaction('2024-10-31', 'Expense', 'Food', 5.0, '現金', 'Before', account_id)
+    schema = _schema(db)
+    with db.get_connection() as conn:
+        guarded = {name for name, in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'trigger' AND instr(sql, 'bulk_load_guard')")}
+    assert guarded == set(db._BULK_INSERT_STATEMENTS)
+
+    n = db.BULK_INSERT_THRESHOLD + 500
+    assert db.add_transactions(_ledger_frame(n, account_id)) == n
+    assert _schema(db) == schema
+    with db.get_connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM bulk_load_guard").fetchone()[0] == 0
+    assert_rollups_match(db)
+    assert len(db.search_transactions('Bulk row 1499')) == 1
+
+    # Single-row writes after a bulk load keep firing the triggers
+    db.add_transaction('2025-03-01', 'Income', 'Salary', 100.0, '現金', 'After', account_id)
+    assert_rollups_match(db)
+
+def test_rollups_follow_mixed_writes(temp_db):
+    db = temp_db
+    accounts = db.get_accounts().set_index('name')['id']
+    cash, card = int(accounts['現金']), int(accounts['Go Card'])
+    db.add_transaction('2025-01-31', 'Expense', 'Food', 120.5, '現金', 'Lunch', cash)
+    db.add_transaction('2025-01-31', 'Income', 'Salary', 50000.0, '現金', 'Pay', cash)
+    db.add_transaction('2025-02-01', 'Expense', 'Transport', 0.005, 'Go Card', 'Taxi', card)
+    db.add_transaction('2025-02-02', 'Expense', 'Food', 35.0, '現金', 'No account')
+    assert db.add_transactions(_ledger_frame(db.BULK_INSERT_THRESHOLD + 10, cash)) == db.BULK_INSERT_THRESHOLD + 10
+    assert db.add_transactions(_ledger_frame(20, card)) == 20
+    assert_rollups_match(db)
+
+    ids = db.get_all_transactions().sort_values('id')['id'].tolist()
+    # Change month, type, category and account at once; drop an account; add one
+    db.update_transaction(ids[0], '2025-03-15', 'Income', 'Bonus', 99.99, 'Go Card', 'Moved', card)
+    db.update_transaction(ids[2], '2025-02-01', 'Expense', 'Transport', 12.34, '現金', 'Taxi', None)
+    db.update_transaction(ids[3], '2025-02-02', 'Expense', 'Food', 35.0, '現金', 'Now on cash', cash)
+    # Bulk-loaded rows too
+    db.update_transaction(ids[10], '2024-12-25', 'Expense', 'Shopping', 1.0, 'Go Card', 'Gift', card)
+    db.delete_transaction(ids[1])
+    db.delete_transactions(ids[20:400])
+    db.reassign_account(card, cash)
+    db.merge_categories(int(db.get_categories().set_index('name').loc['Transport', 'id']),
+                        int(db.get_categories().set_index('name').loc['Food', 'id']))
+    assert_rollups_match(db)
+
+    with db.get_connection() as conn:
+        summary = conn.execute("SELECT SUM(total_cents), SUM(count) FROM monthly_summary").fetchone()
+        totals = conn.execute("SELECT SUM(amount_cents), COUNT(*) FROM transactions").fetchone()
+        balances = conn.execute("SELECT SUM(income_cents - expense_cents) FROM account_balances").fetchone()
+        expected = conn.execute("""SELECT SUM(CASE type WHEN 'Income' THEN amount_cents ELSE -amount_cents END)
+                                   FROM transactions WHERE account_id IS NOT NULL""").fetchone()
+    assert summary == totals
+    assert balances == expected
+
+def _database_at_version(path, version):
+    """An open sqlite3 connection to a new database migrated to ``version`` only."""
+    import database as db
+
+    conn = sqlite3.connect(path)
+    for step in db.MIGRATIONS[:version]:
+        step(conn.cursor())
+    conn.execute(f"PRAGMA user_version = {version}")
+    return conn
+
+def _upgrade(path, monkeypatch):
+    """Make ``path`` the ledger and migrate it to the latest version."""
+    import database as db
+
+    db.close_connections()
+    monkeypatch.setattr(db, 'USE_GOOGLE_SHEETS', False)
+    monkeypatch.setattr(db, 'DB_FILE', str(path))
+    db.init_db()
+    with db.get_connection() as conn:
+        assert db.get_schema_version(conn) == db.SCHEMA_VERSION
+
+def test_migrates_real_amounts_from_version_11(tmp_path, monkeypatch):
+    import database as db
+
+
+    # A ledger as the app left it before _migrate_integer_cents
+    path = tmp_path / 'v11.db'
+    conn = _database_at_version(path, 11)
+    accounts = dict(conn.execute("SELECT name, id FROM accounts"))
+    rows = [
+        (3, '2024-12-31', 'Expense', 'Food', 0.005, '現金', 'Coffee half cent', accounts['現金']),
+        (7, '2025-01-02', 'Income', 'Other', -0.005, '現金', 'Refund reversal', accounts['現金']),
+        (8, '2025-01-02', 'Expense', 'Transport', 10.1 + 20.2, 'Go Card', 'Taxi to airport', accounts['Go Card']),
+        (12, '2025-01-15', 'Income', 'Salary', 50000.0, '現金', None, accounts['現金']),
+        (20, '2025-02-01', 'Expense', 'Food', 99.995, '現金', 'Coffee beans', None),
+    ]
+    conn.executemany("""
+        INSERT INTO transactions (id, date, type, category, amount, payment_method, description, account_id, dedupe_key)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, [row + (db.transaction_key(row[1], row[4], row[7], row[6]),) for row in rows])
+    conn.commit()
+    conn.close()
+
+    _upgrade(path, monkeypatch)
+    try:
+        with db.get_connection() as conn:
+            migrated = conn.execute("SELECT id, amount_cents FROM transactions ORDER BY id").fetchall()
+        # Half a cent rounds away from zero on both sides, like to_cents
+        assert migrated == [(row[0], db.to_cents(row[4])) for row in rows]
+        assert [cents for _, cents in migrated] == [1, -1, 3030, 5000000, 10000]
+
+        assert_rollups_match(db)
+        with db.get_connection() as conn:
+            balances = dict(conn.execute("SELECT account_id, income_cents - expense_cents FROM account_balances"))
+        assert balances == {accounts['現金']: 5000000 - 1 - 1, accounts['Go Card']: -3030}
+
+        assert sorted(db.search_transactions('Coffee')['id']) == [3, 20]
+        assert db.search_transactions('airport')['id'].tolist() == [8]
+    finally:
+        db.close_connections()
+
+def test_foreign_key_migration_repairs_references(tmp_path, monkeypatch):
+    import database as db
+
+    # A ledger as the app left it before _migrate_foreign_keys
+    path = tmp_path / 'v13.db'
+    conn = _database_at_version(path, 13)
+    cash = conn.execute("SELECT id FROM accounts WHERE name = '現金'").fetchone()[0]
+    rows = [
+        (1, '2025-01-03', 'Expense', 'Food', 12050, '現金', 'Lunch', cash),
+        # Account 999 was deleted before deletes were checked
+        (2, '2025-01-04', 'Expense', 'Pets', 30000, 'Old Card', 'Vet', 999),
+        (3, '2025-01-05', 'Expense', 'Gifts', 5000, '現金', 'Flowers', None),
+        (4, '2025-01-06', 'Income', 'Gifts', 20000, '現金', 'Red envelope', cash),
+    ]
+    conn.executemany("""
+        INSERT INTO transactions (id, date, type, category, amount_cents, payment_method, description, account_id, dedupe_key)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, [row + (db.transaction_key(row[1], row[4] / 100, row[7], row[6]),) for row in rows])
+    conn.commit()
+    conn.close()
+
+    _upgrade(path, monkeypatch)
+    try:
+        with db.get_connection() as conn:
+            migrated = conn.execute("""
+                SELECT t.id, t.account_id, t.dedupe_key, c.name, c.type
+                FROM transactions t LEFT JOIN categories c ON c.id = t.category_id ORDER BY t.id
+            """).fetchall()
+            assert conn.execute("PRAGMA foreign_key_check").fetchall() == []
+        assert [row[1] for row in migrated] == [cash, None, None, cash]
+        # The cleared row hashes like one entered without an account
+        assert migrated[1][2] == db.transaction_key('2025-01-04', 300.0, None, 'Vet')
+        assert [row[3:] for row in migrated] == [('Food', 'Expense'), ('Pets', 'Expense'),
+                                                 ('Gifts', 'Both'), ('Gifts', 'Both')]
+        assert_rollups_match(db)
+
+        categories = db.get_categories().set_index('name')['id']
+        assert not db.delete_category(int(categories['Pets']))
+        assert not db.delete_account(cash)
+        assert db.delete_category(int(categories['Health']))
+
+        db.add_account('Wallet', 'Cash', 100)
+        db.add_account('Spare', 'Cash', 50)
+        ids = db.get_accounts().set_index('name')['id']
+        wallet, spare = int(ids['Wallet']), int(ids['Spare'])
+        db.add_transaction('2025-01-07', 'Expense', 'Food', 20.0, 'Wallet', 'Snack', wallet)
+        db.add_transaction('2025-01-08', 'Income', 'Other', 5.0, 'Spare', 'Found', spare)
+        before = db.get_account_balances().set_index('name')
+        assert not db.delete_account(spare)
+
+        assert db.merge_accounts(spare, wallet) == 1
+        after = db.get_account_balances().set_index('name')
+        assert 'Spare' not in after.index
+        assert after.loc['Wallet', 'initial_balance'] == 150
+        assert after.loc['Wallet', 'balance'] == before.loc[['Wallet', 'Spare'], 'balance'].sum() == 135
+        assert not db.delete_account(wallet)
+        assert_rollups_match(db)
+    finally:
+        db.close_connections()
+
+def _add(db, date, description, category='Food', account_id=None):
+    db.add_transaction(date, 'Expense', category, 10.0, '現金', description, account_id)
+
+def test_keyset_pages_cover_equal_dates_exactly_once(temp_db):
+    db = temp_db
+    _add(db, '2025-01-04', 'Later')
+    for i in range(2 * expenses.PAGE_SIZE + 5):
+        _add(db, '2025-01-03', f'Same day {i}')
+    _add(db, '2025-01-02', 'Earlier')
+
+    # Walk the pages the way the transactions page does
+    cursors, seen = [None], []
+    while True:
+        page = db.get_transactions_page(cursors[-1], expenses.PAGE_SIZE + 1)
+        rows = page.head(expenses.PAGE_SIZE)
+        seen += rows['id'].tolist()
+        if len(page) <= expenses.PAGE_SIZE:
+            break
+        last = rows.iloc[-1]
+        cursors.append((last['date'], int(last['id'])))
+
+    expected = db.get_all_transactions().sort_values(['date', 'id'], ascending=False)['id'].tolist()
+    assert seen == expected
+    assert len(cursors) == 3
+
+DESCRIPTIONS = ['Coffee shop', '咖啡豆', '冰咖啡', 'coffee BEANS', '50% off_sale', 'Taxi', None]
+
+@pytest.mark.parametrize('query', ['咖啡', 'co', 'ee', 'Coffee', '咖啡豆', '0%', '_s', 'coffee 咖', 'Fo'])
+def test_short_terms_find_what_the_index_finds(temp_db, monkeypatch, query):
+    db = temp_db
+    for i, description in enumerate(DESCRIPTIONS):
+        _add(db, f'2025-01-{i + 1:02d}', description, category='Food' if i % 2 else 'Transport')
+
+    found = set(db.search_transactions(query)['id'])
+    # Every term as a case-insensitive substring of the description or category
+    texts = {row.id: f"{row.description or ''} {row.category}".casefold()
+             for row in db.get_all_transactions().itertuples()}
+    assert found == {tx_id for tx_id, text in texts.items()
+                     if all(term.casefold() in text for term in query.split())}
+
+    # Without the index every term goes through LIKE, with the same result
+    monkeypatch.setattr(db, '_fts_tokenizer', lambda conn: None)
+    cache.clear()
+    assert set(db.search_transactions(query)['id']) == found
@@ -0,0 +1,61 @@
+import pandas as pd
+
+from modules import dedupe
+
+def _transactions(rows):
+    return pd.DataFrame(rows, columns=['id', 'date', 'type', 'amount', 'account_id', 'account_name', 'description'])
+
+def test_pair_across_buckets_keeps_columns_with_their_ids():
+    # With window_days=3, 2025-01-04 and 2025-01-06 fall into different buckets
+    # and the pair is first found with the later, lower id on the _a side
+    df = _transactions([
+        (1, '2025-01-06', 'Expense', 120.0, 1, '現金', 'Coffee shop'),
+        (2, '2025-01-04', 'Expense', 120.0, 1, '現金', 'coffee  shop'),
+    ])
+    pairs = dedupe.find_near_duplicates(df, window_days=3)
+
+    assert len(pairs) == 1
+    pair = pairs.iloc[0]
+    assert (pair['id_a'], pair['id_b']) == (1, 2)
+    assert pair['date_a'] == pd.Timestamp('2025-01-06')
+    assert pair['date_b'] == pd.Timestamp('2025-01-04')
+    assert pair['description_a'] == 'Coffee shop'
+    assert pair['description_b'] == 'coffee  shop'
+    assert pair['days_apart'] == 2
+
+def test_pair_within_bucket():
+    df = _transactions([
+        (5, '2025-01-07', 'Expense', 80.0, 2, 'Line Bank', 'Lunch'),
+        (3, '2025-01-07', 'Expense', 80.0, 2, 'Line Bank', 'lunch'),
+        (4, '2025-01-07', 'Expense', 81.0, 2, 'Line Bank', 'Lunch'),
+    ])
+    pairs = dedupe.find_near_duplicates(df, window_days=3)
+
+    assert pairs[['id_a', 'id_b', 'description_a', 'description_b']].values.tolist() == [[3, 5, 'lunch', 'Lunch']]
+
+def test_rows_further_apart_than_window_are_not_paired():
+    df = _transactions([
+        (1, '2025-01-01', 'Expense', 50.0, 1, '現金', 'Taxi'),
+        (2, '2025-01-05', 'Expense', 50.0, 1, '現金', 'Taxi'),
+    ])
+    assert dedupe.find_near_duplicates(df, window_days=3).empty
+
+def test_stored_candidates_give_the_same_pairs_as_the_full_ledger(temp_db):
+    db = temp_db
+    for row in [
+        ('2025-01-04', 'Expense', 'Food', 120.0, '現金', 'Coffee shop', 1),
+        ('2025-01-06', 'Expense', 'Food', 120.0, '現金', 'coffee  shop', 1),
+        ('2025-01-05', 'Expense', 'Food', 120.0, '現金', 'Coffee shop', 2),
+        ('2025-01-05', 'Income', 'Food', 120.0, '現金', 'Coffee shop', 1),
+        ('2025-01-07', 'Expense', 'Food', 35.5, '現金', 'Bus', None),
+        ('2025-01-08', 'Expense', 'Food', 35.5, '現金', 'bus', None),
+        ('2025-01-08', 'Expense', 'Food', 35.51, '現金', 'bus', None),
+    ]:
+        db.add_transaction(*row)
+
+    candidates = db.get_near_duplicate_candidates()
+    # Rows alone in their (account, type, amount) group are never loaded
+    assert candidates['id'].tolist() == [5, 6, 1, 2]
+    pairs = dedupe.find_near_duplicates(window_days=3)
+    pd.testing.assert_frame_equal(pairs, dedupe.find_near_duplicates(db.get_all_transactions(), window_days=3))
+    assert pairs[['id_a', 'id_b']].values.tolist() == [[5, 6], [1, 2]]
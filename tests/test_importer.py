@@ -0,0 +1,50 @@
+import io
+
+import numpy as np
+import pandas as pd
+
+from modules import importer
+
+CSV = """Date,Type,Category,Amount,Payment Method,Description,Account
+2025-01-03,Expense,Food,120.5,現金,Coffee  shop,現金
+2025-01-03,Expense,Food,120.5,現金,Coffee  shop,現金
+2025-01-04,Income,Salary,50000,現金,,現金
+2025-01-05,Expense,NoSuchCategory,10.25,現金,Taxi,現金
+"""
+
+def test_vectorized_keys_match_transaction_key(temp_db):
+    db = temp_db
+    dates = ['2025-01-03', '2025-01-03 10:00:00', pd.Timestamp('2025-01-04'), '2025-01-05', '2025-01-06']
+    amounts = [120.5, -0.005, 9.995, 1e6 + 0.015, 0.0]
+    accounts = [1, None, 3.0, np.nan, 2]
+    descriptions = ['Coffee  shop', None, '　早餐　店 ', np.nan, 'CAFÉ\tLatte']
+
+    cents = db.to_cents_array(amounts)
+    assert cents.tolist() == [db.to_cents(a) for a in amounts]
+    keys = db.transaction_keys(dates, cents, accounts, descriptions)
+    expected = [
+        db.transaction_key(d, a, None if pd.isna(acc) else acc, None if pd.isna(desc) else desc)
+        for d, a, acc, desc in zip(dates, amounts, accounts, descriptions)
+    ]
+    assert keys == expected
+
+def test_import_csv_resolves_categories_and_skips_reimports(temp_db):
+    db = temp_db
+    db.add_account('現金', 'Cash', 0)
+
+    assert importer.import_csv(io.StringIO(CSV)) == 4
+    # Identical rows within one file are both kept, and nothing is re-added
+    assert importer.import_csv(io.StringIO(CSV)) == 0
+
+    with db.get_connection() as conn:
+        rows = conn.execute("""
+            SELECT t.category, t.amount_cents, t.account_id, t.category_id, c.name, t.dedupe_key
+            FROM transactions t LEFT JOIN categories c ON c.id = t.category_id ORDER BY t.id
+        """).fetchall()
+    account_id = int(db.get_accounts().set_index('name').loc['現金', 'id'])
+    assert [row[1] for row in rows] == [12050, 12050, 5000000, 1025]
+    assert all(row[2] == account_id for row in rows)
+    # Known names get their id, unknown ones stay NULL like single inserts
+    assert [row[4] for row in rows] == ['Food', 'Food', 'Salary', None]
+    assert rows[3][3] is None
+    assert rows[0][5] == db.transaction_key('2025-01-03', 120.5, account_id, 'Coffee shop')
@@ -0,0 +1,18 @@
+import logging
+
+from modules import jobs
+
+def _fail():
+    raise ValueError("no quotes")
+
+def test_failed_job_is_logged_with_its_traceback(caplog):
+    key = ('tests.failing',)
+    with caplog.at_level(logging.ERROR, logger=jobs.__name__):
+        jobs.submit(key, _fail)
+        jobs.wait(key, 10)
+
+    assert jobs.status(key)['status'] == jobs.FAILED
+    assert jobs.status(key)['error'] == "ValueError: no quotes"
+    [record] = caplog.records
+    assert record.getMessage() == f"Job {key!r} failed"
+    assert record.exc_info[0] is ValueError
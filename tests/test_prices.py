@@ -0,0 +1,95 @@
+import time
+from datetime import date, timedelta
+
+import pandas as pd
+import pytest
+
+from modules import jobs, prices
+
+class FakeProvider:
+    """Quote and history provider serving fixed prices and recording every request."""
+
+    def __init__(self, quotes):
+        self.quotes = dict(quotes)
+        self.calls = []
+        self.history_calls = []
+
+    def __call__(self, symbols):
+        self.calls.append(sorted(symbols))
+        return {sym: self.quotes[sym] for sym in symbols if sym in self.quotes}
+
+    def history(self, symbol, start, end):
+        self.history_calls.append((symbol, start, end))
+        days = pd.date_range(start, end, freq='D')
+        return pd.DataFrame({'date': days.strftime('%Y-%m-%d'), 'close': 100.0})
+
+@pytest.fixture
+def provider(temp_db):
+    fake = FakeProvider({'AAA': 10.0, 'BBB': 20.0})
+    prices.set_provider(fake)
+    prices.set_history_provider(fake.history)
+    yield fake
+    jobs.wait(prices.QUOTES_JOB, 10)
+    prices.set_provider(prices.yfinance_provider)
+    prices.set_history_provider(prices.yfinance_history_provider)
+
+def test_fresh_quotes_are_served_from_the_cache(provider):
+    assert prices.get_prices(['AAA', 'BBB']) == {'AAA': 10.0, 'BBB': 20.0}
+    provider.quotes['AAA'] = 11.0
+
+    assert prices.get_prices(['AAA', 'BBB']) == {'AAA': 10.0, 'BBB': 20.0}
+    assert provider.calls == [['AAA', 'BBB']]
+
+def test_stale_quotes_are_returned_and_refreshed_in_background(provider, temp_db):
+    temp_db.save_quotes({'AAA': 9.0}, time.time() - prices.QUOTE_TTL_SECONDS - 1)
+
+    assert prices.get_prices(['AAA']) == {'AAA': 9.0}
+    jobs.wait(prices.QUOTES_JOB, 10)
+    assert provider.calls == [['AAA']]
+    assert prices.get_prices(['AAA']) == {'AAA': 10.0}
+    assert prices.stale_symbols(['AAA']) == []
+
+def test_missing_symbols(provider):
+    # Never quoted: fetched before returning, or in the background without wait
+    assert prices.get_prices(['AAA']) == {'AAA': 10.0}
+    assert prices.get_prices(['BBB'], wait=False) == {}
+    jobs.wait(prices.QUOTES_JOB, 10)
+    assert prices.get_prices(['BBB'], wait=False) == {'BBB': 20.0}
+
+    # Unknown to the provider: left out and asked for again next time
+    assert prices.get_prices(['ZZZ']) == {}
+    assert prices.stale_symbols(['AAA', 'ZZZ']) == ['ZZZ']
+    assert provider.calls.count(['ZZZ']) == 1
+
+@pytest.mark.parametrize('start, end, stored, expected', [
+    ('2025-01-01', '2025-01-31', None, [('2025-01-01', '2025-01-31')]),
+    ('2025-01-01', '2025-01-31', ('2025-01-01', '2025-01-31'), []),
+    ('2025-01-01', '2025-01-31', ('2025-01-10', '2025-01-20'),
+     [('2025-01-01', '2025-01-09'), ('2025-01-21', '2025-01-31')]),
+    ('2025-01-15', '2025-01-31', ('2025-01-01', '2025-01-20'), [('2025-01-21', '2025-01-31')]),
+    ('2025-02-01', '2025-02-10', ('2025-01-01', '2025-01-20'), [('2025-02-01', '2025-02-10')]),
+    ('2025-01-31', '2025-01-01', None, []),
+])
+def test_missing_ranges(start, end, stored, expected):
+    ranges = prices._missing_ranges(date.fromisoformat(start), date.fromisoformat(end), stored)
+    assert ranges == [(date.fromisoformat(lo), date.fromisoformat(hi)) for lo, hi in expected]
+
+def test_update_price_history_fetches_only_missing_days(provider, temp_db):
+    jan1, jan10 = date(2025, 1, 1), date(2025, 1, 10)
+    assert prices.update_price_history({'AAA': jan1}, end=jan10) == 10
+    assert provider.history_calls == [('AAA', jan1, jan10)]
+
+    # Already covered: nothing is fetched
+    assert prices.update_price_history({'AAA': jan1}, end=jan10) == 0
+    assert len(provider.history_calls) == 1
+
+    # An earlier start and a later end fetch just the two new edges
+    provider.history_calls.clear()
+    dec29, jan12 = date(2024, 12, 29), date(2025, 1, 12)
+    assert prices.update_price_history({'AAA': dec29}, end=jan12) == 5
+    assert sorted(provider.history_calls) == [
+        ('AAA', dec29, jan1 - timedelta(days=1)),
+        ('AAA', jan10 + timedelta(days=1), jan12),
+    ]
+    history = temp_db.get_price_history(('AAA',))
+    assert history['date'].tolist() == pd.date_range(dec29, jan12).strftime('%Y-%m-%d').tolist()
@@ -0,0 +1,48 @@
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from modules import sheets
+
+@pytest.fixture
+def date_formats(monkeypatch):
+    """Empty date-format cache, plus a count of format detections."""
+    monkeypatch.setattr(sheets, '_date_formats', {})
+    detected = []
+    detect = sheets._detect_date_format
+    monkeypatch.setattr(sheets, '_detect_date_format', lambda values: detected.append(1) or detect(values))
+    return detected
+
+def test_date_format_is_detected_once_for_a_column_with_blanks(date_formats):
+    values = pd.Series(['2024/01/02', '', '2024/01/03', None, '  '])
+    for _ in range(3):
+        parsed = sheets._to_datetime('transactions', 'date', values)
+
+    assert len(date_formats) == 1
+    assert parsed.tolist() == [pd.Timestamp('2024-01-02'), pd.NaT, pd.Timestamp('2024-01-03'), pd.NaT, pd.NaT]
+
+def test_date_format_is_detected_again_when_it_stops_matching(date_formats):
+    sheets._to_datetime('transactions', 'date', pd.Series(['2024/01/02', '']))
+    parsed = sheets._to_datetime('transactions', 'date', pd.Series(['2024-01-02 08:30', '']))
+
+    assert len(date_formats) == 2
+    assert parsed.iloc[0] == pd.Timestamp('2024-01-02 08:30')
+
+def test_pyarrow_parse_matches_the_pandas_fallback(date_formats, monkeypatch):
+    pytest.importorskip('pyarrow')
+    raw = (Path(__file__).parent / 'data' / 'sheet_transactions.csv').read_bytes()
+
+    monkeypatch.setattr(sheets, 'PYARROW_AVAILABLE', False)
+    expected = sheets.parse_csv('transactions', raw)
+    monkeypatch.setattr(sheets, 'PYARROW_AVAILABLE', True)
+    # Fail instead of silently falling back to pandas
+    monkeypatch.setattr(sheets.pd, 'read_csv', None)
+    # The second parse reads the dates with the format cached by the first
+    for _ in range(2):
+        df = sheets.parse_csv('transactions', raw)
+        pd.testing.assert_frame_equal(df, expected, check_categorical=False)
+
+    assert list(expected.columns[:3]) == ['id', 'date', 'type']
+    assert expected['amount'].isna().tolist() == [False, False, False, True, False]
+    assert expected['date'].isna().sum() == 1
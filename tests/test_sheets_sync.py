@@ -0,0 +1,105 @@
+import functools
+import threading
+import time
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+import pandas as pd
+import pytest
+
+from modules import jobs, sheets, sheets_sync
+
+TRANSACTIONS_CSV = """Date,Type,Category,Amount,Payment Method,Description,Account ID,Account
+2025-01-03,Expense,Food,120.0,現金,Lunch,1,現金
+2025-01-04,Income,Salary,50000.0,現金,,1,現金
+"""
+
+class _QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+@pytest.fixture
+def sheet_server(tmp_path, monkeypatch):
+    """Serve CSV fixtures from a directory as the public Sheets export; yields the directory."""
+    fixtures = tmp_path / 'sheets'
+    fixtures.mkdir()
+    server = ThreadingHTTPServer(('127.0.0.1', 0), functools.partial(_QuietHandler, directory=str(fixtures)))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setattr(sheets, 'CSV_EXPORT_URL', f"http://127.0.0.1:{server.server_port}/{{sheet_name}}.csv")
+    # A failed public download must not fall back to real credentials
+    monkeypatch.setattr(sheets, 'GSPREAD_AVAILABLE', False)
+    yield fixtures
+    server.shutdown()
+    server.server_close()
+
+def test_ingest_skips_reingests_and_keeps_the_last_mirror(temp_db, sheet_server, monkeypatch):
+    db = temp_db
+    parsed = []
+    parse_tab = sheets_sync.parse_tab
+    monkeypatch.setattr(sheets_sync, 'parse_tab', lambda tab, raw: parsed.append(tab) or parse_tab(tab, raw))
+    path = sheet_server / f"{sheets.SHEET_NAMES['transactions']}.csv"
+    path.write_text(TRANSACTIONS_CSV, encoding='utf-8')
+
+    assert sheets_sync.sync_tab('transactions', force=True)
+    first = db.get_sheet_sync_state('transactions')
+    assert len(db.read_sheet_mirror('transactions')) == 2
+
+    # Same content: only the check time moves, nothing is parsed
+    assert not sheets_sync.sync_tab('transactions', force=True)
+    state = db.get_sheet_sync_state('transactions')
+    assert state['content_hash'] == first['content_hash']
+    assert state['changed_at'] == first['changed_at']
+    assert state['checked_at'] >= first['checked_at']
+    assert parsed == ['transactions']
+
+    # Changed content: parsed and re-ingested
+    path.write_text(TRANSACTIONS_CSV + "2025-01-05,Expense,Transport,30.0,現金,Bus,1,現金\n", encoding='utf-8')
+    assert sheets_sync.sync_tab('transactions', force=True)
+    changed = db.get_sheet_sync_state('transactions')
+    assert changed['content_hash'] != first['content_hash']
+    assert changed['row_count'] == 3
+    mirror = db.read_sheet_mirror('transactions', sheets.date_columns('transactions'))
+    assert mirror['date'].dt.strftime('%Y-%m-%d').tolist() == ['2025-01-03', '2025-01-04', '2025-01-05']
+
+    # Failed download: the last mirror stays and is retried next interval
+    path.unlink()
+    assert not sheets_sync.sync_tab('transactions', force=True)
+    failed = db.get_sheet_sync_state('transactions')
+    assert failed['content_hash'] == changed['content_hash']
+    assert failed['checked_at'] >= changed['checked_at']
+    assert len(db.read_sheet_mirror('transactions')) == 3
+    assert parsed == ['transactions', 'transactions']
+
+def test_first_read_gives_up_after_timeout(temp_db, monkeypatch):
+    release = threading.Event()
+    monkeypatch.setattr(sheets_sync, 'sync_all', lambda force=False: release.wait(10))
+    monkeypatch.setattr(sheets_sync, 'FIRST_SYNC_TIMEOUT_SECONDS', 0.2)
+    try:
+        start = time.perf_counter()
+        assert sheets_sync.read_tab('transactions').empty
+        # The page's other tabs share the same timeout
+        assert sheets_sync.read_tab('accounts').empty
+        assert time.perf_counter() - start < 2
+        assert jobs.status(sheets_sync.SYNC_JOB)['status'] == jobs.RUNNING
+    finally:
+        release.set()
+        jobs.wait(sheets_sync.SYNC_JOB, 10)
+
+def test_failed_mirror_write_keeps_the_last_mirror(temp_db):
+    db = temp_db
+    good = pd.DataFrame({'date': ['2025-01-03'], 'amount': [120.0]})
+    db.save_sheet_mirror('transactions', good, 'good', 1.0)
+
+    # sqlite3 cannot store a dict, so the write fails part way through
+    bad = pd.DataFrame({'date': ['2025-01-04', '2025-01-05'], 'amount': [1.0, {'x': 1}]})
+    with pytest.raises(pd.errors.DatabaseError):
+        db.save_sheet_mirror('transactions', bad, 'bad', 2.0)
+    pd.testing.assert_frame_equal(db.read_sheet_mirror('transactions'), good)
+    state = db.get_sheet_sync_state('transactions')
+    assert (state['content_hash'], state['row_count'], state['changed_at']) == ('good', 1, 1.0)
+
+    # The next good write replaces it, leftovers included
+    db.save_sheet_mirror('transactions', good.assign(amount=80.0), 'next', 3.0)
+    assert db.read_sheet_mirror('transactions')['amount'].tolist() == [80.0]
+    with db.get_connection() as conn:
+        tables = {name for name, in conn.execute("SELECT name FROM sqlite_master WHERE name LIKE 'sheet_transactions%'")}
+    assert tables == {'sheet_transactions'}